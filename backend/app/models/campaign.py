@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from typing import List, Optional, Literal, Dict
 
 class CampaignRequest(BaseModel):
     product_name: str = Field(..., description="Name of the product or service")
@@ -7,6 +7,8 @@ class CampaignRequest(BaseModel):
     target_audience: str = Field(..., description="Description of the target audience")
     platforms: List[str] = Field(..., description="List of platforms to generate content for (e.g., LinkedIn, Twitter, Instagram)")
     tone: str = Field("Professional", description="Desired tone of the campaign")
+    cache: Literal["bypass", "prefer", "only"] = Field("bypass", description="Response cache mode: bypass, prefer a cached generation, or only serve from cache")
+    timeout: Optional[float] = Field(None, gt=0, description="Seconds the client will wait; tightens an X-Request-Timeout header, else the server default applies")
 
 class ContentItem(BaseModel):
     platform: str
@@ -14,9 +16,45 @@ class ContentItem(BaseModel):
     hashtags: List[str]
     visual_prompt: str = Field(..., description="Prompt for generating visuals")
     media_url: Optional[str] = Field(None, description="URL of generated media (if available)")
+    media_status: Optional[str] = Field(None, description="ready, pending (fetch later from /{campaign_id}/media), failed or none")
     xai_explanation: str = Field(..., description="Explainable AI: Why this content/tone/visual was chosen")
 
 class CampaignResponse(BaseModel):
     campaign_id: str
     generated_content: List[ContentItem]
     strategy_explanation: str = Field(..., description="Overall strategy explanation")
+    skipped_stages: List[str] = Field(default_factory=list, description="Stages skipped or cut short to meet the request deadline: fallback models ('provider:model'), 'llm', 'media'")
+
+class CampaignJobRequest(CampaignRequest):
+    priority: int = Field(5, ge=0, le=9, description="Job priority, higher runs first")
+
+class CampaignJobStatus(BaseModel):
+    job_id: str
+    status: str = Field(..., description="queued, running, succeeded, failed or cancelled")
+    priority: int
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[CampaignResponse] = None
+    error: Optional[str] = None
+
+class CampaignMediaItem(BaseModel):
+    index: int = Field(..., description="Position of the item in generated_content")
+    platform: str
+    media_status: str = Field(..., description="ready, pending, failed or none")
+    media_url: Optional[str] = None
+
+class CampaignMediaResponse(BaseModel):
+    campaign_id: str
+    complete: bool = Field(..., description="True once no item is pending")
+    items: List[CampaignMediaItem]
+
+class CampaignRecord(BaseModel):
+    id: str = Field(..., description="The campaign_id")
+    created_at: float
+    request: CampaignRequest
+    response: CampaignResponse
+
+class CampaignHistoryPage(BaseModel):
+    items: List[CampaignRecord] = Field(..., description="Newest first")
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` for the next page; null on the last page")
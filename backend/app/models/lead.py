@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Literal
 
 class LeadRequest(BaseModel):
     name: str = Field(..., description="Lead Name")
@@ -8,6 +8,9 @@ class LeadRequest(BaseModel):
     urgency: str = Field("Medium", description="Urgency level (Low/Medium/High)")
     needs: str = Field(..., description="Specific business needs")
     notes: Optional[str] = Field(None, description="Additional context")
+    cache: Literal["bypass", "prefer", "only"] = Field("bypass", description="Response cache mode: bypass, prefer a cached generation, or only serve from cache")
+    rescore: bool = Field(False, description="Run a full analysis even if this lead's stored score is still current")
+    timeout: Optional[float] = Field(None, gt=0, description="Seconds the client will wait; tightens an X-Request-Timeout header, else the server default applies")
 
 class LeadScoreResponse(BaseModel):
     lead_id: str
@@ -17,3 +20,34 @@ class LeadScoreResponse(BaseModel):
     qualification_summary: str = Field(..., description="Summary of qualification")
     recommended_actions: List[str] = Field(..., description="Next steps")
     xai_explanation: str = Field(..., description="Why this score was assigned")
+    skipped_stages: List[str] = Field(default_factory=list, description="Stages skipped or cut short to meet the request deadline: fallback models ('provider:model'), 'llm'")
+
+class LeadBatchRequest(BaseModel):
+    leads: List[LeadRequest] = Field(..., description="Leads to score")
+    max_concurrency: Optional[int] = Field(None, ge=1, le=32, description="Override for how many packed chunks run at once")
+    timeout: Optional[float] = Field(None, gt=0, description="Seconds the client will wait for the whole batch; tightens an X-Request-Timeout header. No deadline without either")
+
+class LeadBatchStats(BaseModel):
+    total_leads: int
+    reused: int = Field(0, description="Leads whose stored score was returned because none of their scored fields changed")
+    local_scored: int = Field(..., description="Leads scored confidently by the local model without an LLM call")
+    chunks: int = Field(..., description="Number of packed prompts sent to the LLM")
+    llm_calls: int = Field(..., description="LLM calls made, including single-lead retries")
+    retried: int = Field(..., description="Leads re-scored on their own after a malformed batch result")
+    failed: int = Field(..., description="Leads that could not be scored")
+    elapsed_ms: float
+    leads_per_second: float
+
+class LeadBatchResponse(BaseModel):
+    results: List[LeadScoreResponse] = Field(..., description="Scores in the same order as the request")
+    stats: LeadBatchStats
+
+class LeadRecord(BaseModel):
+    id: str = Field(..., description="The lead_id")
+    created_at: float
+    request: LeadRequest
+    response: LeadScoreResponse
+
+class LeadHistoryPage(BaseModel):
+    items: List[LeadRecord] = Field(..., description="Newest first")
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` for the next page; null on the last page")
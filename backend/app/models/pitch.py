@@ -1,5 +1,8 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Literal
+
+PitchVariantType = Literal["Cold Email", "LinkedIn Message", "Elevator Pitch"]
+PITCH_VARIANTS: List[PitchVariantType] = ["Cold Email", "LinkedIn Message", "Elevator Pitch"]
 
 class PitchRequest(BaseModel):
     product_name: str = Field(..., description="Name of the product")
@@ -7,6 +10,10 @@ class PitchRequest(BaseModel):
     persona: str = Field(..., description="Target persona (e.g., CTO, Marketing Manager)")
     industry: str = Field(..., description="Industry of the target")
     tone: str = Field("Professional", description="Tone of the pitch")
+    variants: List[PitchVariantType] = Field(default_factory=lambda: list(PITCH_VARIANTS), min_length=1, description="Variants to generate; each is its own concurrent LLM call")
+    strategy: bool = Field(True, description="Also generate strategy_explanation (one more concurrent call); empty when false")
+    cache: Literal["bypass", "prefer", "only"] = Field("bypass", description="Response cache mode: bypass, prefer a cached generation, or only serve from cache")
+    timeout: Optional[float] = Field(None, gt=0, description="Seconds the client will wait; tightens an X-Request-Timeout header, else the server default applies")
 
 class PitchVariant(BaseModel):
     variant_type: str = Field(..., description="Type of pitch (e.g., Email, LinkedIn Message, Elevator Pitch)")
@@ -18,3 +25,14 @@ class PitchResponse(BaseModel):
     pitch_id: str
     variants: List[PitchVariant]
     strategy_explanation: str = Field(..., description="Overall persuasion strategy")
+    skipped_stages: List[str] = Field(default_factory=list, description="Stages skipped or cut short to meet the request deadline: fallback models ('provider:model'), 'llm', 'variant:<type>', 'strategy'")
+
+class PitchRecord(BaseModel):
+    id: str = Field(..., description="The pitch_id")
+    created_at: float
+    request: PitchRequest
+    response: PitchResponse
+
+class PitchHistoryPage(BaseModel):
+    items: List[PitchRecord] = Field(..., description="Newest first")
+    next_cursor: Optional[str] = Field(None, description="Pass as `cursor` for the next page; null on the last page")
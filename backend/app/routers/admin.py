@@ -0,0 +1,142 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter
+from app.utils.http_pool import http_pool
+from app.utils.model_health import model_health
+from app.utils.response_cache import response_cache
+from app.utils.semantic_cache import semantic_cache
+from app.utils.generation_store import generations
+from app.utils.rate_limiter import rate_limiters
+from app.utils.admission import admission
+from app.utils.hedging import hedge_policy
+from app.utils.model_catalog import model_catalog
+from app.services.campaign_service import campaign_flight, campaign_jobs
+from app.services.pitch_service import pitch_flight
+from app.services.lead_scorer import lead_scorer
+from app.services.lead_fingerprints import lead_fingerprints
+from app.services.media_service import media_resolver, media_registry
+
+router = APIRouter(
+    prefix="/api/v1/admin",
+    tags=["Admin"]
+)
+
+@router.get("/pool")
+async def pool_stats():
+    """
+    Connection pool usage of the shared provider HTTP client (in-use, idle, waits).
+    """
+    return http_pool.stats()
+
+@router.get("/models")
+async def model_health_status():
+    """
+    Circuit breaker state per provider model and the last known good model.
+    """
+    return model_health.snapshot()
+
+@router.post("/models/reset")
+async def reset_model_health(model: Optional[str] = None):
+    """
+    Closes the breaker for one model (or all models if none is given).
+    """
+    model_health.reset(model)
+    return model_health.snapshot()
+
+@router.get("/models/catalog")
+async def model_catalog_status():
+    """
+    Cached Gemini model catalog: size, age, and background refresh counts.
+    """
+    return model_catalog.stats()
+
+@router.get("/rate-limits")
+async def rate_limit_stats():
+    """
+    Per-provider limiter state: adaptive concurrency, queueing delay, throttles and per-key quota.
+    """
+    return {provider: await limiter.stats() for provider, limiter in rate_limiters.items()}
+
+@router.get("/admission")
+async def admission_stats():
+    """
+    Admission control per lane: calls in flight and queued, admitted, shed and timed out.
+    """
+    return admission.stats()
+
+@router.get("/hedging")
+async def hedging_stats():
+    """
+    Hedged requests: hedge rate, which provider won, and the learned hedge delay per provider.
+    """
+    return hedge_policy.stats()
+
+@router.get("/cache")
+async def cache_stats():
+    """
+    LLM response cache counters (hits, misses, evictions) for both tiers.
+    """
+    return response_cache.stats()
+
+@router.delete("/cache")
+async def clear_cache():
+    await response_cache.clear()
+    return response_cache.stats()
+
+@router.get("/semantic-cache")
+async def semantic_cache_stats():
+    """
+    Near-duplicate cache: hit rate, index size and training state.
+    """
+    return semantic_cache.stats()
+
+@router.delete("/semantic-cache")
+async def clear_semantic_cache():
+    semantic_cache.clear()
+    return semantic_cache.stats()
+
+@router.get("/generations")
+async def generation_store_stats():
+    """
+    Saved generations per kind and write counters for the history store.
+    """
+    return await asyncio.to_thread(generations.stats)
+
+@router.get("/coalescing")
+async def coalescing_stats():
+    """
+    Single-flight counters: how many identical in-flight requests shared one generation.
+    """
+    return {"campaign": campaign_flight.stats(), "pitch": pitch_flight.stats()}
+
+@router.get("/lead-model")
+async def lead_model_status():
+    """
+    Local lead-scoring model: weights, cascade thresholds, samples and local/LLM split.
+    """
+    return lead_scorer.stats()
+
+@router.post("/lead-model/fit")
+async def fit_lead_model():
+    """
+    Refits the local lead model from the LLM scores recorded so far.
+    """
+    return await asyncio.to_thread(lead_scorer.fit)
+
+@router.get("/lead-fingerprints")
+async def lead_fingerprint_stats():
+    """
+    Incremental lead re-scoring: stored leads and how many resubmissions were unchanged, delta or full.
+    """
+    return await asyncio.to_thread(lead_fingerprints.stats)
+
+@router.get("/jobs")
+async def job_queue_stats():
+    return {"campaign": campaign_jobs.stats()}
+
+@router.get("/media")
+async def media_stats():
+    """
+    Media resolver: prompt dedupe hits, background prefetches and the local asset cache.
+    """
+    return {**media_resolver.stats(), "pending_media": media_registry.stats()}
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
-from app.models.campaign import CampaignRequest, CampaignResponse
-from app.services.campaign_service import generate_campaign
+from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from app.models.campaign import CampaignRequest, CampaignResponse, CampaignJobRequest, CampaignJobStatus, CampaignMediaResponse, CampaignRecord, CampaignHistoryPage
+from app.services.campaign_service import generate_campaign, stream_campaign, campaign_jobs, job_status, submit_campaign_job, campaign_media
+from app.utils.response_cache import CacheMissError
+from app.utils.sse import SSE_HEADERS
+from app.utils.generation_store import generations
+from app.utils.conditional import conditional_json
 
 router = APIRouter(
     prefix="/api/v1/campaign",
@@ -17,5 +23,84 @@ async def create_campaign(request: CampaignRequest):
         if response.campaign_id == "error":
              raise HTTPException(status_code=500, detail=response.strategy_explanation)
         return response
+    except HTTPException:
+        raise
+    except CacheMissError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate/stream")
+async def create_campaign_stream(request: CampaignRequest):
+    """
+    Stream a campaign as server-sent events: one "item" event per ContentItem, then "done".
+    """
+    return StreamingResponse(stream_campaign(request), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/jobs", response_model=CampaignJobStatus, status_code=202)
+async def create_campaign_job(request: CampaignJobRequest):
+    """
+    Queue a campaign generation and return its job id immediately.
+    """
+    return await submit_campaign_job(request)
+
+@router.get("/jobs", response_model=List[CampaignJobStatus])
+async def list_campaign_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    return [job_status(job) for job in await campaign_jobs.list(status, limit)]
+
+@router.get("/jobs/{job_id}", response_model=CampaignJobStatus)
+async def get_campaign_job(job_id: str, wait: float = Query(0, ge=0, le=60, description="Long-poll up to this many seconds for completion")):
+    """
+    Job status and, once finished, the campaign. Pass `wait` to long-poll.
+    """
+    job = await campaign_jobs.wait(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+@router.delete("/jobs/{job_id}", response_model=CampaignJobStatus)
+async def cancel_campaign_job(job_id: str):
+    job = await campaign_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_status(job)
+
+@router.get("/{campaign_id}/media", response_model=CampaignMediaResponse)
+async def get_campaign_media(campaign_id: str):
+    """
+    Media for a recent campaign. Items returned as "pending" by /generate are filled in
+    here once they resolve; poll until `complete` is true.
+    """
+    response = campaign_media(campaign_id)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired campaign")
+    return response
+
+@router.get("/history", response_model=CampaignHistoryPage)
+async def list_campaign_history(
+    request: Request,
+    product: Optional[str] = Query(None, description="Only records with this product_name"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Saved campaigns, newest first, without new LLM calls. Send the ETag back in
+    If-None-Match to get an empty 304 when the page has not changed.
+    """
+    try:
+        body, etag = await generations.page("campaign", limit, cursor, product=product)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional_json(request, body, etag)
+
+@router.get("/history/{record_id}", response_model=CampaignRecord)
+async def get_campaign_record(record_id: str, request: Request):
+    """
+    One saved campaign with the request that produced it. The record is rewritten once
+    its pending media resolves, and its ETag follows the stored content, so send it
+    back in If-None-Match to get a 304 only while the record is unchanged.
+    """
+    record = await generations.get("campaign", record_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return conditional_json(request, *record)
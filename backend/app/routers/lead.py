@@ -1,6 +1,15 @@
-from fastapi import APIRouter, HTTPException
-from app.models.lead import LeadRequest, LeadScoreResponse
-from app.services.lead_service import score_lead
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from app.models.lead import LeadRequest, LeadScoreResponse, LeadBatchRequest, LeadBatchResponse, LeadRecord, LeadHistoryPage
+from app.services.lead_service import score_lead, stream_lead
+from app.services.lead_batch_service import score_leads_batch
+from app.services.lead_import_service import import_and_score, LEAD_IMPORT_CONCURRENCY
+from app.utils.response_cache import CacheMissError
+from app.utils.sse import SSE_HEADERS
+from app.utils.streaming import DuplexStreamingResponse
+from app.utils.generation_store import generations
+from app.utils.conditional import conditional_json
 
 router = APIRouter(
     prefix="/api/v1/lead",
@@ -12,5 +21,80 @@ async def analyze_lead(request: LeadRequest):
     try:
         response = await score_lead(request)
         return response
+    except HTTPException:
+        raise
+    except CacheMissError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/score/stream")
+async def analyze_lead_stream(request: LeadRequest):
+    """
+    Stream a lead score as server-sent events: "action" events, then "done" with the full score.
+    """
+    return StreamingResponse(stream_lead(request), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.post("/score/batch", response_model=LeadBatchResponse)
+async def analyze_leads_batch(request: LeadBatchRequest):
+    """
+    Score many leads at once. Leads are packed into shared prompts up to a token
+    budget and the packed chunks run with bounded concurrency.
+    """
+    try:
+        return await score_leads_batch(request)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/score/import")
+async def import_leads(
+    request: Request,
+    format: Optional[Literal["csv", "jsonl"]] = Query(None, description="Input format; defaults from Content-Type"),
+    output: Literal["ndjson", "csv"] = Query("ndjson", description="Result format"),
+    start_row: int = Query(0, ge=0, description="Skip data rows before this index (resume after a crash)"),
+    concurrency: int = Query(LEAD_IMPORT_CONCURRENCY, ge=1, le=64),
+):
+    """
+    Streams a CSV or JSONL upload (raw request body) through lead scoring and streams
+    per-row results back while the upload is still being read. Memory stays flat
+    regardless of file size. Each result carries its row index for resuming.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "jsonl" if "json" in content_type else "csv"
+    media_type = "text/csv" if output == "csv" else "application/x-ndjson"
+    return DuplexStreamingResponse(
+        import_and_score(request.stream(), format, output, start_row, concurrency),
+        media_type=media_type,
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+@router.get("/history", response_model=LeadHistoryPage)
+async def list_lead_history(
+    request: Request,
+    company: Optional[str] = Query(None, description="Only records with this company"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Saved lead scores, newest first, without new LLM calls. Send the ETag back in
+    If-None-Match to get an empty 304 when the page has not changed.
+    """
+    try:
+        body, etag = await generations.page("lead", limit, cursor, company=company)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional_json(request, body, etag)
+
+@router.get("/history/{record_id}", response_model=LeadRecord)
+async def get_lead_record(record_id: str, request: Request):
+    """
+    One saved lead score with the request that produced it. Records never change, so a
+    matching If-None-Match always gets a 304.
+    """
+    record = await generations.get("lead", record_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Lead score not found")
+    return conditional_json(request, *record)
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from app.services.media_service import media_resolver
+
+router = APIRouter(
+    prefix="/media",
+    tags=["Media"]
+)
+
+@router.get("/{digest}")
+async def get_media(digest: str):
+    """
+    Serves a prefetched campaign asset from the local content-addressed cache.
+    The URL is the sha256 of the bytes, so it can be cached forever.
+    """
+    entry = media_resolver.disk.open(digest)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    path, content_type = entry
+    return FileResponse(path, media_type=content_type, headers={"Cache-Control": "public, max-age=31536000, immutable"})
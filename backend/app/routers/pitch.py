@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from app.models.pitch import PitchRequest, PitchResponse
-from app.services.pitch_service import generate_pitch
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import StreamingResponse
+from app.models.pitch import PitchRequest, PitchResponse, PitchRecord, PitchHistoryPage
+from app.services.pitch_service import generate_pitch, stream_pitch
+from app.utils.response_cache import CacheMissError
+from app.utils.sse import SSE_HEADERS
+from app.utils.generation_store import generations
+from app.utils.conditional import conditional_json
 
 router = APIRouter(
     prefix="/api/v1/pitch",
@@ -12,5 +18,45 @@ async def create_pitch(request: PitchRequest):
     try:
         response = await generate_pitch(request)
         return response
+    except HTTPException:
+        raise
+    except CacheMissError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate/stream")
+async def create_pitch_stream(request: PitchRequest):
+    """
+    Stream pitch variants as server-sent events: one "variant" event each, then "done".
+    """
+    return StreamingResponse(stream_pitch(request), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/history", response_model=PitchHistoryPage)
+async def list_pitch_history(
+    request: Request,
+    product: Optional[str] = Query(None, description="Only records with this product_name"),
+    persona: Optional[str] = Query(None, description="Only records with this persona"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Saved pitches, newest first, without new LLM calls. Send the ETag back in
+    If-None-Match to get an empty 304 when the page has not changed.
+    """
+    try:
+        body, etag = await generations.page("pitch", limit, cursor, product=product, persona=persona)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return conditional_json(request, body, etag)
+
+@router.get("/history/{record_id}", response_model=PitchRecord)
+async def get_pitch_record(record_id: str, request: Request):
+    """
+    One saved pitch with the request that produced it. Records never change, so a
+    matching If-None-Match always gets a 304.
+    """
+    record = await generations.get("pitch", record_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Pitch not found")
+    return conditional_json(request, *record)
@@ -1,21 +1,47 @@
-import os
-import httpx
-import json
 import asyncio
-from typing import List, Dict, Any
-from app.models.campaign import CampaignRequest, CampaignResponse, ContentItem
-from app.utils.llm_client import llm_client
+from typing import Callable, List, Dict, Any, AsyncIterator, Optional
+from app.models.campaign import CampaignRequest, CampaignResponse, ContentItem, CampaignJobRequest, CampaignJobStatus, CampaignMediaResponse, CampaignMediaItem
+from app.utils.llm_client import llm_client, ProviderUnavailable
+from app.services.media_service import media_resolver, media_registry, MEDIA_READY, MEDIA_PENDING, MEDIA_FAILED, MEDIA_NONE
+from app.utils.singleflight import SingleFlight, fingerprint
+from app.utils.json_stream import IncrementalJSONParser
+from app.utils.llm_output import parse_json, validate, with_defaults, items_with_defaults
+from app.utils.response_cache import CacheMissError
+from app.utils.admission import Overloaded, admission_lane, BULK
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded, no_deadline, request_deadline
+from app.utils.semantic_cache import semantic_key
+from app.utils.sse import sse_event
+from app.utils.job_queue import JobQueue, JobStore, JOBS_DB
+from app.utils.generation_store import generations, new_id
+from app.utils.config import env_float, env_int
+from app.utils.metrics import stage, track_request, note_tokens, note_tokens_saved
+from app.utils.prompt_builder import PromptBuilder, Section
+from app.utils.tokens import TokenUsage, estimate_tokens
+from app.utils.log import get_logger
+
+logger = get_logger("campaign")
+
+campaign_flight = SingleFlight("campaign")
+
+# Media fan-out: each item gets its own deadline from when it starts resolving, and the whole
+# fan-out a global budget. Items that miss either are returned as "pending" and keep
+# resolving in the background.
+CAMPAIGN_MEDIA_ITEM_TIMEOUT = env_float("CAMPAIGN_MEDIA_ITEM_TIMEOUT", 10.0)
+CAMPAIGN_MEDIA_BUDGET = env_float("CAMPAIGN_MEDIA_BUDGET", 15.0)
+CAMPAIGN_MEDIA_CONCURRENCY = env_int("CAMPAIGN_MEDIA_CONCURRENCY", 8)
 
 async def generate_campaign(request: CampaignRequest) -> CampaignResponse:
-    print(f"Received campaign request for: {request.product_name}")
-    
-    # Construct the prompt for the LLM
-    platforms_str = ", ".join(request.platforms)
-    
-    system_prompt = """
+    with request_deadline(request.timeout):
+        # Identical concurrent requests with about the same deadline share one generation
+        key = f"{fingerprint(request)}:{deadline.coalescing_key()}"
+        response = await campaign_flight.do(key, lambda: _generate_campaign(request))
+    return response.model_copy(deep=True)
+
+CAMPAIGN_PROMPT = PromptBuilder("""
     You are an expert Marketing Strategist and AI Content Generator for the MarketMind platform.
     Your goal is to generate high-quality, platform-specific marketing content and provide Explainable AI (XAI) reasoning for your choices.
-    
+
     You must output strictly in JSON format matching the following structure:
     {
         "strategy_explanation": "Overall strategy...",
@@ -29,119 +55,401 @@ async def generate_campaign(request: CampaignRequest) -> CampaignResponse:
             }
         ]
     }
+    """)
+
+# Guideline blocks by lower-cased platform name; only the requested platforms' blocks are sent
+PLATFORM_GUIDELINES = {
+    "instagram": "- Instagram: Focus on high-aesthetic visual storytelling. Captions should be engaging, professional, and invite interaction. Use line breaks for readability.",
+    "poster": "- Poster: Concepts for a vertical (9:16) or A3 print poster. Focus on a strong headline, minimal text, and striking visual key art.",
+    "linkedin": "- LinkedIn: Professional, industry-insight driven, value-first.",
+}
+POSTER_VISUAL_GUIDELINE = "- For Posters, describe the layout, typography style, and key art."
+SOCIAL_VISUAL_GUIDELINE = '- For Social, describe a highly aesthetic, premium image OR a short video concept (e.g., "Video: Time-lapse of...") that would perform well.'
+XAI_GUIDELINE = "For 'xai_explanation', be specific about why the copy length, emoji usage, and call-to-action were selected for that specific platform and audience."
+_ALL_GUIDELINE_TOKENS = sum(estimate_tokens(g) for g in (*PLATFORM_GUIDELINES.values(), POSTER_VISUAL_GUIDELINE, SOCIAL_VISUAL_GUIDELINE))
+
+def _platform_label(platform: str) -> str:
+    # Metric label: the known platforms, everything else is "other"
+    name = platform.strip().lower()
+    return name if name in PLATFORM_GUIDELINES else "other"
+
+def _build_messages(request: CampaignRequest) -> List[Dict[str, str]]:
+    # Construct the prompt for the LLM
+    platforms_str = ", ".join(request.platforms)
+    requested = list(dict.fromkeys(p.strip().lower() for p in request.platforms))
+    guidelines = [PLATFORM_GUIDELINES[p] for p in requested if p in PLATFORM_GUIDELINES]
+    visual = []
+    if "poster" in requested:
+        visual.append(POSTER_VISUAL_GUIDELINE)
+    if any(p != "poster" for p in requested):
+        visual.append(SOCIAL_VISUAL_GUIDELINE)
+    note_tokens_saved("platforms", _ALL_GUIDELINE_TOKENS - sum(estimate_tokens(g) for g in guidelines + visual))
+
+    # Trimmed first when over PROMPT_TOKEN_BUDGET: the XAI hint, then visual, then platform guidelines
+    return CAMPAIGN_PROMPT.build([
+        Section(
+            f"Product: {request.product_name}\n"
+            f"Description: {request.product_description}\n"
+            f"Target Audience: {request.target_audience}\n"
+            f"Tone: {request.tone}\n"
+            f"Platforms: {platforms_str}"
+        ),
+        Section("Platform-Specific Guidelines:\n" + "\n".join(guidelines) if guidelines else "", keep=3),
+        Section("For 'visual_prompt':\n" + "\n".join(visual) if visual else "", keep=2),
+        Section(XAI_GUIDELINE, keep=1),
+    ])
+
+def _note_usage(usage: TokenUsage, items: Optional[List[Dict[str, Any]]] = None):
+    """Records the generation's tokens, split across platforms by their share of the output."""
+    if usage.provider == "none":
+        return
+    shares: Dict[str, float] = {}
+    for item in items or ():
+        label = _platform_label(str(item.get("platform", "")))
+        shares[label] = shares.get(label, 0.0) + len(str(item.get("content", ""))) + len(str(item.get("visual_prompt", ""))) + 1
+    note_tokens(usage.provider, usage.prompt, usage.completion, shares or None)
+
+def _media_task(item: Dict[str, Any]):
+    """Returns the media resolution coroutine for one content item (resolves to None if no prompt)."""
+    # Identical visual prompts resolve once, within and across requests
+    return media_resolver.resolve(item.get("visual_prompt", ""), item.get("platform", ""))
+
+ITEM_DEFAULTS = {"platform": "Unknown", "content": "", "hashtags": [], "visual_prompt": "", "xai_explanation": ""}
+STRATEGY_DEFAULT = "Strategy generated based on best practices."
+# Free-text request fields matched by similarity in the semantic cache; the rest must be equal
+SEMANTIC_FIELDS = ("product_description", "target_audience")
+
+def _mock_campaign(request: CampaignRequest) -> CampaignResponse:
+    """Demo output when no provider answered; it is returned but never saved."""
+    return CampaignResponse(
+        campaign_id="mock_campaign",
+        generated_content=[],
+        strategy_explanation=f"DEMO MODE: Insights for {request.product_name}.",
+        skipped_stages=deadline.skipped()
+    )
+
+def _content_item(item_dict: Dict[str, Any]) -> ContentItem:
+    return validate(ContentItem, with_defaults(item_dict, ITEM_DEFAULTS))
+
+def _apply_media(item_dict: Dict[str, Any], task: asyncio.Task, index: int):
+    url = None
+    if task.cancelled():
+        logger.warning("Media Item %d cancelled", index)
+    elif task.exception() is not None:
+        logger.warning("Media Item %d failed: %s", index, task.exception())
+    else:
+        url = task.result()
+        logger.debug("Media Item %d success: %.50s...", index, url)
+    item_dict["media_url"] = url
+    item_dict["media_status"] = MEDIA_READY if url else MEDIA_FAILED
+
+class _MediaFanout:
     """
-    
-    user_prompt = f"""
-    Product: {request.product_name}
-    Description: {request.product_description}
-    Target Audience: {request.target_audience}
-    Tone: {request.tone}
-    Platforms: {platforms_str}
-    
-    Platform-Specific Guidelines:
-    - Instagram: Focus on high-aesthetic visual storytelling. Captions should be engaging, professional, and invite interaction. Use line breaks for readability.
-    - Poster: Concepts for a vertical (9:16) or A3 print poster. Focus on a strong headline, minimal text, and striking visual key art.
-    - LinkedIn: Professional, industry-insight driven, value-first.
-    
-    For 'visual_prompt':
-    - For Posters, describe the layout, typography style, and key art.
-    - For Social, describe a highly aesthetic, premium image OR a short video concept (e.g., "Video: Time-lapse of...") that would perform well.
-    For 'xai_explanation', be specific about why the copy length, emoji usage, and call-to-action were selected for that specific platform and audience.
+    Media resolution for a campaign's items, CAMPAIGN_MEDIA_CONCURRENCY at a time. Items can
+    be added while the campaign is still streaming; each is waited for up to
+    CAMPAIGN_MEDIA_ITEM_TIMEOUT from when its resolution starts.
     """
+
+    def __init__(self, items: List[Dict[str, Any]]):
+        self.items = items
+        self._semaphore = asyncio.Semaphore(max(1, CAMPAIGN_MEDIA_CONCURRENCY))
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._watchers: List[asyncio.Task] = []
+        self._applied: set = set()
+
+    async def _resolve(self, item_dict: Dict[str, Any], started: asyncio.Event):
+        async with self._semaphore:
+            started.set()
+            return await _media_task(item_dict)
+
+    @staticmethod
+    async def _watch(task: asyncio.Task, started: asyncio.Event):
+        # The item's own clock runs from its start, not from the fan-out's
+        await started.wait()
+        await asyncio.wait({task}, timeout=CAMPAIGN_MEDIA_ITEM_TIMEOUT)
+
+    def add(self, index: int):
+        """Starts resolving items[index]; its media_status is pending until it finishes ("none" without a prompt)."""
+        item_dict = self.items[index]
+        if not item_dict.get("visual_prompt"):
+            item_dict["media_status"] = MEDIA_NONE
+            return
+        item_dict["media_status"] = MEDIA_PENDING
+        started = asyncio.Event()
+        self._tasks[index] = asyncio.ensure_future(self._resolve(item_dict, started))
+        self._watchers.append(asyncio.ensure_future(self._watch(self._tasks[index], started)))
+
+    def collect(self) -> List[int]:
+        """Fills in media for items that finished since the last call and returns their indexes."""
+        finished = [i for i, t in self._tasks.items() if t.done() and i not in self._applied]
+        for index in finished:
+            _apply_media(self.items[index], self._tasks[index], index)
+            self._applied.add(index)
+        return finished
+
+    async def settle(self, budget: float) -> AsyncIterator[int]:
+        """
+        Yields item indexes as their media finishes, until every item is done or past its own
+        deadline, or `budget` seconds (capped by the request deadline) have passed. The request
+        deadline cutting the wait short is reported as the skipped stage "media".
+        """
+        loop = asyncio.get_running_loop()
+        wait = deadline.cap(budget)
+        until = loop.time() + wait
+        watching = {w for w in self._watchers if not w.done()}
+        while watching and loop.time() < until:
+            _, watching = await asyncio.wait(watching, timeout=until - loop.time(), return_when=asyncio.FIRST_COMPLETED)
+            for index in self.collect():
+                yield index
+        for index in self.collect():
+            yield index
+        if watching and wait < budget and self.late():
+            deadline.note_skipped("media")
+
+    def late(self) -> Dict[int, asyncio.Task]:
+        """Media still resolving, by item index, for the media registry."""
+        return {i: t for i, t in self._tasks.items() if not t.done()}
+
+    def close(self, cancel: bool = False):
+        """Stops the deadline watchers; with `cancel`, the resolutions too (nobody will collect them)."""
+        for watcher in self._watchers:
+            watcher.cancel()
+        if cancel:
+            for task in self._tasks.values():
+                task.cancel()
+
+async def _resolve_media(campaign_id: str, items: List[Dict[str, Any]]) -> Dict[int, asyncio.Task]:
+    """
+    Resolves media for the items, CAMPAIGN_MEDIA_CONCURRENCY at a time, and fills media_url /
+    media_status in place. Each item is waited for up to CAMPAIGN_MEDIA_ITEM_TIMEOUT from when
+    its resolution starts, and the whole fan-out up to CAMPAIGN_MEDIA_BUDGET; anything still
+    running then is marked pending and returned by item index, for the media registry. The
+    wait also ends at the request deadline, in which case "media" is reported as a skipped stage.
+    """
+    fanout = _MediaFanout(items)
+    for index in range(len(items)):
+        fanout.add(index)
+    try:
+        async for _ in fanout.settle(CAMPAIGN_MEDIA_BUDGET):
+            pass
+    except asyncio.CancelledError:
+        fanout.close(cancel=True)
+        raise
+    fanout.close()
+    late = fanout.late()
+    if late:
+        logger.info("Campaign %s: %d media items still pending", campaign_id, len(late))
+    return late
+
+def _save_campaign(request: CampaignRequest, response: CampaignResponse, created_at: Optional[float] = None) -> Dict[str, Any]:
+    return generations.row("campaign", response.campaign_id, request, response, created_at=created_at, product=request.product_name)
+
+def _resave_with_media(request: CampaignRequest, response: CampaignResponse, created_at: float) -> Callable[[List[Dict[str, Any]]], None]:
+    """Media registry callback: rewrites the stored campaign with its final media once none is pending."""
+    def on_done(media: List[Dict[str, Any]]):
+        updated = response.model_copy(deep=True)
+        for slot in media:
+            item = updated.generated_content[slot["index"]]
+            item.media_url = slot["media_url"]
+            item.media_status = slot["media_status"]
+        generations.save_later([_save_campaign(request, updated, created_at)])
+    return on_done
+
+async def _generate_campaign(request: CampaignRequest) -> CampaignResponse:
+    logger.info("Received campaign request for: %s", request.product_name)
+    with stage("prompt_build"):
+        messages = _build_messages(request)
     
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt}
-    ]
-    
-    print(f"Calling LLM for {request.product_name}...")
+    logger.debug("Calling LLM for %s...", request.product_name)
     try:
-        llm_response = await llm_client.generate(messages)
+        usage = TokenUsage()
+        llm_response = await llm_client.generate(messages, cache=request.cache, semantic=semantic_key("campaign", request, SEMANTIC_FIELDS), usage=usage, lane=BULK, mock=False)
+    except ProviderUnavailable:
+        logger.warning("No LLM provider answered; returning the demo campaign for %s", request.product_name)
+        return _mock_campaign(request)
     except Exception as e:
-        print(f"LLM Call Failed: {e}")
+        logger.error("LLM Call Failed: %s", e)
         raise e
         
-    print("LLM Response received. Parsing JSON...")
+    logger.debug("LLM Response received. Parsing JSON...")
     
+    generated_content_list = None
+    late: Dict[int, asyncio.Task] = {}
     try:
-        content_dict = json.loads(llm_response)
-        print("JSON Parsed successfully.")
-        
-        tasks = []
-        items_to_process = []
+        with stage("json_parse"):
+            content_dict = with_defaults(parse_json(llm_response), {"strategy_explanation": STRATEGY_DEFAULT})
+        logger.debug("JSON Parsed successfully.")
         
-        generated_content_list = content_dict.get("generated_content", [])
-        if not isinstance(generated_content_list, list):
-            generated_content_list = []
-
-        for item in generated_content_list:
-            visual_prompt = item.get("visual_prompt", "")
-            platform = item.get("platform", "").lower()
-            
-            aspect_ratio = "1:1"
-            is_video = False
-            
-            if "instagram" in platform or "poster" in platform:
-                aspect_ratio = "9:16"
-            
-            if "video" in visual_prompt.lower() or "reel" in platform or "tiktok" in platform:
-                is_video = True
-
-            items_to_process.append((item, is_video))
-            
-            if visual_prompt:
-                if is_video:
-                    tasks.append(llm_client.generate_video(visual_prompt, aspect_ratio))
-                else:
-                    tasks.append(llm_client.generate_image(visual_prompt, aspect_ratio))
-            else:
-                 async def no_op(): return None
-                 tasks.append(no_op())
-        
-        if tasks:
-            print(f"DEBUG: Starting parallel generation for {len(tasks)} items...")
-            
-            async def run_safe(task_coro, idx):
-                try:
-                    res = await task_coro
-                    print(f"DEBUG: Media Item {idx} success: {res[:50] if res else 'None'}...")
-                    return res
-                except Exception as e:
-                    print(f"DEBUG: Media Item {idx} failed: {e}")
-                    return None
-
-            wrapped_tasks = [run_safe(t, i) for i, t in enumerate(tasks)]
-            
-            try:
-                results = await asyncio.wait_for(asyncio.gather(*wrapped_tasks), timeout=45.0)
-                for (item_dict, _), result in zip(items_to_process, results):
-                    item_dict["media_url"] = result
-                    print(f"DEBUG: Assigned media_url: {result}")
-            except asyncio.TimeoutError:
-                print("CRITICAL: Media generation timed out after 45s.")
-            except Exception as e:
-                print(f"CRITICAL: Unexpected error in parallel generation: {e}")
-
-        content_items = []
-        for item_dict in generated_content_list:
-            content_items.append(ContentItem(
-                platform=item_dict.get("platform", "Unknown"),
-                content=item_dict.get("content", ""),
-                hashtags=item_dict.get("hashtags", []),
-                visual_prompt=item_dict.get("visual_prompt", ""),
-                xai_explanation=item_dict.get("xai_explanation", ""),
-                media_url=item_dict.get("media_url", None)
-            ))
-            
-        return CampaignResponse(
-            campaign_id="gen_" + os.urandom(4).hex(),
-            generated_content=content_items,
-            strategy_explanation=content_dict.get("strategy_explanation", "Strategy generated based on best practices.")
-        )
-        
-    except json.JSONDecodeError:
+        generated_content_list = items_with_defaults(content_dict.get("generated_content"), ITEM_DEFAULTS)
+        _note_usage(usage, generated_content_list)
+
+        # The id is needed up front so late media can be fetched under it
+        campaign_id = new_id("gen")
+        with stage("media_fanout"):
+            late = await _resolve_media(campaign_id, generated_content_list)
+
+        with stage("model_build"):
+            response = validate(CampaignResponse, {
+                "campaign_id": campaign_id,
+                "generated_content": generated_content_list,
+                "strategy_explanation": content_dict["strategy_explanation"],
+                "skipped_stages": deadline.skipped()
+            })
+    except ValueError:
+        if generated_content_list is None:
+            _note_usage(usage)
+        # Nobody can fetch media for a failed campaign
+        for task in late.values():
+            task.cancel()
         return CampaignResponse(
             campaign_id="error",
             generated_content=[],
-            strategy_explanation="Error parsing AI response. Please try again."
+            strategy_explanation="Error parsing AI response. Please try again.",
+            skipped_stages=deadline.skipped()
         )
+
+    # Saved as returned (media may still be pending), then rewritten once the late media is in;
+    # registering after the first write keeps the rewrite from racing it
+    row = _save_campaign(request, response)
+    await generations.save([row])
+    media_registry.register(campaign_id, generated_content_list, late,
+                            on_done=_resave_with_media(request, response, row["created_at"]))
+    return response
+
+async def stream_campaign(request: CampaignRequest) -> AsyncIterator[str]:
+    """
+    Server-sent events version of generate_campaign. Each ContentItem is sent as an
+    "item" event as soon as its object closes in the token stream, with media_status
+    "pending" while its media resolves in the background; a "media" event
+    (CampaignMediaItem) follows when it finishes. Media is waited for as in
+    generate_campaign; the final "done" event carries the campaign id,
+    strategy_explanation, the media still pending and the stages skipped to meet the
+    request deadline. The campaign is saved under that id as generate_campaign's is, and
+    rewritten when its pending media resolves; the demo campaign is not saved.
+    """
+    logger.info("Received streaming campaign request for: %s", request.product_name)
+    parser = IncrementalJSONParser({"generated_content"})
+    campaign_id = new_id("gen")
+    items: List[Dict[str, Any]] = []
+    fanout = _MediaFanout(items)
+    handed_over = False
+    budget_deadline = asyncio.get_running_loop().time() + CAMPAIGN_MEDIA_BUDGET
+
+    def media_event(index: int) -> str:
+        item_dict = items[index]
+        return sse_event("media", CampaignMediaItem(
+            index=index, platform=item_dict.get("platform", "Unknown"),
+            media_status=item_dict["media_status"], media_url=item_dict.get("media_url"),
+        ))
+
+    try:
+        with request_deadline(request.timeout):
+            with stage("prompt_build"):
+                messages = _build_messages(request)
+            try:
+                async for chunk in llm_client.generate_stream(messages, cache=request.cache, lane=BULK, mock=False):
+                    for _, item_dict in parser.feed(chunk):
+                        if not isinstance(item_dict, dict):
+                            continue
+                        items.append(item_dict)
+                        fanout.add(len(items) - 1)
+                        yield sse_event("item", _content_item(item_dict))
+                    # Media that finished meanwhile; the token stream is never held up for it
+                    for index in fanout.collect():
+                        yield media_event(index)
+            except ProviderUnavailable:
+                # As in generate_campaign: the demo campaign, not saved
+                logger.warning("No LLM provider answered; streaming the demo campaign for %s", request.product_name)
+                mock = _mock_campaign(request)
+                yield sse_event("done", {
+                    "campaign_id": mock.campaign_id,
+                    "pending_media": 0,
+                    "items": 0,
+                    "strategy_explanation": mock.strategy_explanation,
+                    "skipped_stages": mock.skipped_stages
+                })
+                return
+
+            budget = max(0.0, budget_deadline - asyncio.get_running_loop().time())
+            async for index in fanout.settle(budget):
+                yield media_event(index)
+            fanout.close()
+            late = fanout.late()
+
+            content_dict = parser.document()
+            with stage("model_build"):
+                response = CampaignResponse(
+                    campaign_id=campaign_id,
+                    generated_content=[_content_item(i) for i in items],
+                    strategy_explanation=content_dict.get("strategy_explanation") or STRATEGY_DEFAULT,
+                    skipped_stages=deadline.skipped()
+                )
+            row = _save_campaign(request, response)
+            await generations.save([row])
+            media_registry.register(campaign_id, items, late,
+                                    on_done=_resave_with_media(request, response, row["created_at"]))
+            handed_over = True
+            yield sse_event("done", {
+                "campaign_id": campaign_id,
+                "pending_media": len(late),
+                "items": len(items),
+                "strategy_explanation": response.strategy_explanation,
+                "skipped_stages": response.skipped_stages
+            })
+    except CacheMissError as e:
+        yield sse_event("error", {"status": 404, "detail": str(e)})
+    except DeadlineExceeded as e:
+        yield sse_event("error", {"status": 504, "detail": e.detail})
+    except Overloaded as e:
+        yield sse_event("error", {"status": 503, "detail": e.detail, "retry_after": e.retry_after})
+    except Exception as e:
+        logger.error("Campaign stream failed: %s", e)
+        yield sse_event("error", {"status": 500, "detail": str(e)})
+    finally:
+        # Media that was never handed to the registry has nobody to collect it
+        fanout.close(cancel=not handed_over)
+
+def campaign_media(campaign_id: str) -> Optional[CampaignMediaResponse]:
+    """Current media state of a recent campaign, including items that were pending."""
+    items = media_registry.get(campaign_id)
+    if items is None:
+        return None
+    return CampaignMediaResponse(
+        campaign_id=campaign_id,
+        complete=not any(i["media_status"] == MEDIA_PENDING for i in items),
+        items=[CampaignMediaItem(**i) for i in items]
+    )
+
+# --- Job mode ---
+
+async def _run_campaign_job(payload: Dict[str, Any]) -> Dict[str, Any]:
+    # Jobs are already queued, so they wait for an admission slot instead of being shed,
+    # and only run against a deadline if the request set one
+    with track_request("campaign_job"), admission_lane(BULK, shed=False), no_deadline():
+        response = await generate_campaign(CampaignRequest(**payload))
+    if response.campaign_id == "error":
+        raise RuntimeError(response.strategy_explanation)
+    return response.model_dump()
+
+campaign_jobs = JobQueue(
+    "campaign",
+    _run_campaign_job,
+    JobStore(JOBS_DB),
+    workers=env_int("CAMPAIGN_JOB_WORKERS", 2),
+)
+
+def job_status(job: Dict[str, Any]) -> CampaignJobStatus:
+    return CampaignJobStatus(
+        job_id=job["id"],
+        status=job["status"],
+        priority=job["priority"],
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        result=job["result"],
+        error=job["error"]
+    )
+
+async def submit_campaign_job(request: CampaignJobRequest) -> CampaignJobStatus:
+    payload = request.model_dump(exclude={"priority"})
+    return job_status(await campaign_jobs.submit(payload, request.priority))
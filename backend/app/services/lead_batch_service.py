@@ -0,0 +1,236 @@
+import time
+import asyncio
+from typing import List, Dict, Any, Optional, Tuple
+from app.models.lead import LeadRequest, LeadScoreResponse, LeadBatchRequest, LeadBatchResponse, LeadBatchStats
+from app.services.lead_service import save_scores, _score_with_llm, _score_response, _local_score, _error_score
+from app.services.lead_scorer import lead_scorer, featurize
+from app.services.lead_fingerprints import lead_fingerprints, UNCHANGED, FULL
+from app.utils.llm_client import llm_client, ProviderUnavailable
+from app.utils.admission import Overloaded, admission_lane, BULK
+from app.utils.deadline import DeadlineExceeded, request_deadline
+from app.utils.llm_output import parse_json
+from app.utils.generation_store import new_id
+from app.utils.tokens import estimate_tokens
+from app.utils.config import env_int
+from app.utils.metrics import stage
+from app.utils.log import get_logger
+
+logger = get_logger("lead_batch")
+
+# Rough prompt budget per packed chunk, in estimate_tokens() units
+LEAD_BATCH_TOKEN_BUDGET = env_int("LEAD_BATCH_TOKEN_BUDGET", 3000)
+LEAD_BATCH_MAX_LEADS = env_int("LEAD_BATCH_MAX_LEADS", 25)
+LEAD_BATCH_CONCURRENCY = env_int("LEAD_BATCH_CONCURRENCY", 4)
+# Leads per batch that may be re-scored on their own after a malformed chunk result
+LEAD_BATCH_MAX_RETRIES = env_int("LEAD_BATCH_MAX_RETRIES", 10)
+
+BATCH_SYSTEM_PROMPT = """
+    You are an AI Sales Operations Specialist.
+    Analyze EACH numbered lead and provide a lead score (0-100), priority, and qualification summary.
+    Use Explainable AI to justify every score based on BANT (Budget, Authority, Need, Timing).
+    Score every lead independently.
+
+    CRITICAL: You MUST respond with a VALID JSON object containing one result per lead,
+    keyed by the lead's index. Example format:
+    {
+        "results": [
+            {
+                "index": 0,
+                "score": 85,
+                "priority": "High",
+                "conversion_probability": "75%",
+                "qualification_summary": "...",
+                "recommended_actions": ["...", "..."],
+                "xai_explanation": "..."
+            }
+        ]
+    }
+    """
+
+
+def _lead_block(index: int, lead: LeadRequest) -> str:
+    return (
+        f"[{index}] Lead: {lead.name} ({lead.company})\n"
+        f"    Budget: {lead.budget}\n"
+        f"    Urgency: {lead.urgency}\n"
+        f"    Needs: {lead.needs}\n"
+        f"    Notes: {lead.notes}\n"
+    )
+
+
+def pack_leads(leads: List[LeadRequest], token_budget: int = LEAD_BATCH_TOKEN_BUDGET,
+               max_leads: int = LEAD_BATCH_MAX_LEADS) -> List[List[Tuple[int, str]]]:
+    """
+    Greedily packs leads into chunks of (request index, prompt block) that fit the token budget.
+    A lead that is larger than the budget on its own still gets a chunk to itself.
+    """
+    available = max(1, token_budget - estimate_tokens(BATCH_SYSTEM_PROMPT))
+    chunks: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    used = 0
+    for index, lead in enumerate(leads):
+        block = _lead_block(index, lead)
+        cost = estimate_tokens(block)
+        if current and (used + cost > available or len(current) >= max_leads):
+            chunks.append(current)
+            current, used = [], 0
+        current.append((index, block))
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _parse_results(response_text: str) -> Dict[int, Dict[str, Any]]:
+    data = parse_json(response_text)
+    items = data.get("results", []) if isinstance(data, dict) else data
+    results: Dict[int, Dict[str, Any]] = {}
+    for item in items if isinstance(items, list) else []:
+        if isinstance(item, dict) and isinstance(item.get("index"), int):
+            results[item["index"]] = item
+    return results
+
+
+async def _gather_or_cancel(aws) -> List[Any]:
+    """gather() that cancels the other tasks as soon as one fails, so none keep calling providers."""
+    tasks = [asyncio.ensure_future(a) for a in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _valid(item: Optional[Dict[str, Any]]) -> bool:
+    if not item:
+        return False
+    score = item.get("score")
+    return isinstance(score, (int, float)) and 0 <= score <= 100
+
+
+async def score_leads_batch(batch: LeadBatchRequest) -> LeadBatchResponse:
+    # Packed chunks and their retries queue behind interactive calls. A large batch can take
+    # far longer than REQUEST_TIMEOUT, so it only has a deadline if the client set one.
+    with admission_lane(BULK), request_deadline(batch.timeout, default=None):
+        return await _score_leads_batch(batch)
+
+async def _score_leads_batch(batch: LeadBatchRequest) -> LeadBatchResponse:
+    started = time.perf_counter()
+    leads = batch.leads
+    results: List[Optional[LeadScoreResponse]] = [None] * len(leads)
+    counters = {"llm_calls": 0, "retried": 0}
+    # Retried leads are saved by _score_with_llm; reused scores need no saving
+    skip_save = set()
+
+    # Leads that did not change since their stored score keep it, with one lookup for the batch
+    changed: List[int] = []
+    stored_scores = await lead_fingerprints.lookup(leads)
+    for index, (lead, stored) in enumerate(zip(leads, stored_scores)):
+        if lead_fingerprints.classify(lead, stored)[0] == UNCHANGED:
+            results[index] = stored.result
+        else:
+            changed.append(index)
+    reused = len(leads) - len(changed)
+    skip_save.update(i for i in range(len(leads)) if results[i] is not None)
+    lead_fingerprints.count(UNCHANGED, reused)
+
+    # Local first tier for the changed leads in one vectorized pass
+    X = featurize([leads[i] for i in changed])
+    scores, _, confident = lead_scorer.score_features(X)
+    pending: List[int] = []
+    for position, index in enumerate(changed):
+        if not llm_client.api_key or (lead_scorer.cascade_active and confident[position]):
+            results[index] = _local_score(leads[index], int(scores[position]), X[position])
+            if not llm_client.api_key:
+                # Demo-mode scores are not stored, as in score_lead
+                skip_save.add(index)
+        else:
+            pending.append(index)
+    local_scored = len(changed) - len(pending)
+    lead_scorer.local_hits += local_scored
+    lead_scorer.llm_fallbacks += len(pending)
+
+    chunks = []
+    if pending:
+        chunks = pack_leads([leads[i] for i in pending])
+        semaphore = asyncio.Semaphore(batch.max_concurrency or LEAD_BATCH_CONCURRENCY)
+        retry_budget = [LEAD_BATCH_MAX_RETRIES]
+
+        async def retry_lead(index: int) -> LeadScoreResponse:
+            # Straight to the LLM tier: the lead was already counted as a fallback above
+            lead, stored = leads[index], stored_scores[index]
+            async with semaphore:
+                with request_deadline(lead.timeout):
+                    return await _score_with_llm(lead, stored, *lead_fingerprints.classify(lead, stored))
+
+        async def run_chunk(chunk: List[Tuple[int, str]]):
+            async with semaphore:
+                with stage("prompt_build"):
+                    user_prompt = "\n    Leads:\n" + "\n".join(block for _, block in chunk)
+                    messages = [
+                        {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+                        {"role": "user", "content": user_prompt}
+                    ]
+                parsed: Dict[int, Dict[str, Any]] = {}
+                counters["llm_calls"] += 1
+                try:
+                    response_text = await llm_client.generate(messages, mock=False)
+                    with stage("json_parse"):
+                        parsed = _parse_results(response_text)
+                except (Overloaded, DeadlineExceeded):
+                    raise
+                except ProviderUnavailable:
+                    # Nothing to store or learn from: unsaved local estimates, and no per-lead retries
+                    logger.warning("No LLM provider answered; %d leads get unsaved local scores", len(chunk))
+                    for position, _ in chunk:
+                        index = pending[position]
+                        results[index] = _local_score(leads[index])
+                        skip_save.add(index)
+                    return
+                except Exception as e:
+                    logger.warning("Lead batch chunk of %d failed to parse: %s", len(chunk), e)
+
+                retry = []
+                for position, _ in chunk:
+                    index = pending[position]
+                    item = parsed.get(position)
+                    if _valid(item):
+                        results[index] = _score_response(item, new_id("gen_lead"))
+                        lead_scorer.record(leads[index], results[index].score)
+                    else:
+                        retry.append(index)
+
+            # Malformed or missing results are re-scored on their own, sharing the chunk
+            # concurrency, up to LEAD_BATCH_MAX_RETRIES per batch; the rest are marked failed
+            allowed = retry[:max(0, retry_budget[0])]
+            retry_budget[0] -= len(allowed)
+            for index in retry[len(allowed):]:
+                results[index] = _error_score("No usable result in the batch response; retry limit reached")
+            if allowed:
+                counters["retried"] += len(allowed)
+                skip_save.update(allowed)
+                counters["llm_calls"] += len(allowed)
+                retried = await _gather_or_cancel(retry_lead(i) for i in allowed)
+                for index, res in zip(allowed, retried):
+                    results[index] = res
+
+        # A chunk that was shed or ran out of time fails the batch
+        await _gather_or_cancel(run_chunk(chunk) for chunk in chunks)
+
+    elapsed = time.perf_counter() - started
+    # Retried leads were counted by _score_with_llm
+    lead_fingerprints.count(FULL, len(changed) - counters["retried"])
+    await save_scores([(leads[i], r) for i, r in enumerate(results) if r is not None and i not in skip_save])
+    final = [r for r in results if r is not None]
+    stats = LeadBatchStats(
+        total_leads=len(leads),
+        reused=reused,
+        local_scored=local_scored,
+        chunks=len(chunks),
+        llm_calls=counters["llm_calls"],
+        retried=counters["retried"],
+        failed=sum(1 for r in final if r.lead_id == "error"),
+        elapsed_ms=round(elapsed * 1000, 2),
+        leads_per_second=round(len(leads) / elapsed, 2) if elapsed > 0 else 0.0,
+    )
+    return LeadBatchResponse(results=final, stats=stats)
@@ -0,0 +1,196 @@
+import time
+import json
+import hashlib
+import asyncio
+import sqlite3
+import threading
+import difflib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.models.lead import LeadRequest, LeadScoreResponse
+from app.utils.config import env_bool, env_float, env_int, env_str
+from app.utils.generation_store import GENERATIONS_DB
+from app.utils.llm_output import dumps
+from app.utils.log import get_logger
+
+logger = get_logger("lead_fingerprints")
+
+# Fields whose changes can change a score; name and company identify the lead
+SCORED_FIELDS = ("budget", "urgency", "needs", "notes")
+# Free-text fields a delta prompt can adjust for; budget and urgency changes move the
+# score too much (BANT's B and T), so they always get a full analysis
+DELTA_FIELDS = ("needs", "notes")
+
+UNCHANGED = "unchanged"
+DELTA = "delta"
+FULL = "full"
+
+
+def _normalize(value: Optional[str]) -> str:
+    return " ".join((value or "").split()).casefold()
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def lead_key(lead: LeadRequest) -> str:
+    """Identity of a lead across submissions: normalized name and company."""
+    return _digest(_normalize(lead.name) + "\0" + _normalize(lead.company))
+
+
+def fingerprints(lead: LeadRequest) -> Dict[str, str]:
+    """Per-field fingerprints of the scored fields (whitespace and case do not count as changes)."""
+    return {f: _digest(_normalize(getattr(lead, f))) for f in SCORED_FIELDS}
+
+
+class StoredScore:
+    __slots__ = ("fingerprints", "values", "result", "updated_at")
+
+    def __init__(self, fingerprints: Dict[str, str], values: Dict[str, Optional[str]], result: LeadScoreResponse, updated_at: float):
+        self.fingerprints = fingerprints
+        self.values = values
+        self.result = result
+        self.updated_at = updated_at
+
+
+class LeadFingerprintStore:
+    """
+    Last score per lead with fingerprints of the fields it was scored on, in SQLite
+    (the generations database by default), so a nightly CRM resync only pays for the
+    leads that changed:
+      - no scored field changed: the stored score is returned as is
+      - a minor change: at most LEAD_DELTA_MAX_FIELDS of the DELTA_FIELDS changed, each
+        with at most LEAD_DELTA_MAX_CHANGE of its text rewritten; a short delta prompt
+        with the previous score and only the changed fields
+      - anything else (including any budget or urgency change), or a stored score older
+        than LEAD_SCORE_MAX_AGE: a full analysis
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.enabled = env_bool("LEAD_INCREMENTAL", True) and bool(path)
+        self.delta_max_fields = env_int("LEAD_DELTA_MAX_FIELDS", 1)
+        self.delta_max_change = env_float("LEAD_DELTA_MAX_CHANGE", 0.5)
+        self.max_age = env_float("LEAD_SCORE_MAX_AGE", 30 * 24 * 3600.0)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        if self.enabled:
+            try:
+                self._conn = sqlite3.connect(path, check_same_thread=False)
+                self._conn.execute("PRAGMA journal_mode=WAL")
+                self._conn.execute("PRAGMA synchronous=NORMAL")
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS lead_scores ("
+                    "lead_key TEXT PRIMARY KEY, fingerprints TEXT NOT NULL, field_values TEXT NOT NULL, "
+                    "result TEXT NOT NULL, updated_at REAL NOT NULL)"
+                )
+                self._conn.commit()
+            except Exception as e:
+                logger.warning("Incremental lead scoring disabled: %s", e)
+                self.enabled = False
+
+        self.outcomes = {UNCHANGED: 0, DELTA: 0, FULL: 0}
+
+    def _get_many(self, keys: Sequence[str]) -> Dict[str, StoredScore]:
+        found: Dict[str, StoredScore] = {}
+        with self._lock:
+            # Stay under SQLite's bound parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT lead_key, fingerprints, field_values, result, updated_at FROM lead_scores "
+                    f"WHERE lead_key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, fps, values, result, updated_at in rows:
+                    found[key] = StoredScore(
+                        json.loads(fps), json.loads(values), LeadScoreResponse.model_validate_json(result), updated_at
+                    )
+        return found
+
+    def _put_many(self, rows: Sequence[Tuple[str, str, str, str, float]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO lead_scores (lead_key, fingerprints, field_values, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def classify(self, lead: LeadRequest, stored: Optional[StoredScore]) -> Tuple[str, List[str]]:
+        """(UNCHANGED | DELTA | FULL, changed fields) for a lead against its stored score."""
+        if stored is None or lead.rescore or time.time() - stored.updated_at > self.max_age:
+            return FULL, list(SCORED_FIELDS)
+        current = fingerprints(lead)
+        changed = [f for f in SCORED_FIELDS if current[f] != stored.fingerprints.get(f)]
+        if not changed:
+            return UNCHANGED, changed
+        if len(changed) <= self.delta_max_fields and all(self._minor(lead, stored, f) for f in changed):
+            return DELTA, changed
+        return FULL, changed
+
+    def _minor(self, lead: LeadRequest, stored: StoredScore, field: str) -> bool:
+        """Whether a changed field is small enough for a delta prompt."""
+        if field not in DELTA_FIELDS or field not in stored.values:
+            return False
+        before, after = _normalize(stored.values[field]), _normalize(getattr(lead, field))
+        if not before or not after:
+            # Added or removed outright
+            return False
+        return 1.0 - difflib.SequenceMatcher(None, before, after).ratio() <= self.delta_max_change
+
+    async def lookup(self, leads: Sequence[LeadRequest]) -> List[Optional[StoredScore]]:
+        """Stored scores for these leads (None where there is none), in one query."""
+        if not self.enabled or not leads:
+            return [None] * len(leads)
+        keys = [lead_key(lead) for lead in leads]
+        try:
+            found = await asyncio.to_thread(self._get_many, keys)
+        except Exception as e:
+            logger.warning("Lead fingerprint lookup failed: %s", e)
+            return [None] * len(leads)
+        return [found.get(key) for key in keys]
+
+    async def remember(self, scored: Sequence[Tuple[LeadRequest, LeadScoreResponse]]):
+        """Stores the latest score and field fingerprints of each lead (failed scores are skipped)."""
+        if not self.enabled:
+            return
+        now = time.time()
+        rows = [
+            (
+                lead_key(lead),
+                dumps(fingerprints(lead)),
+                dumps({f: getattr(lead, f) for f in SCORED_FIELDS}),
+                result.model_dump_json(),
+                now,
+            )
+            for lead, result in scored if result.lead_id != "error"
+        ]
+        if not rows:
+            return
+        try:
+            await asyncio.to_thread(self._put_many, rows)
+        except Exception as e:
+            logger.warning("Saving %d lead fingerprints failed: %s", len(rows), e)
+
+    def count(self, outcome: str, n: int = 1):
+        self.outcomes[outcome] += n
+
+    def stats(self) -> Dict[str, Any]:
+        total = sum(self.outcomes.values())
+        stored = 0
+        if self.enabled:
+            with self._lock:
+                stored = self._conn.execute("SELECT COUNT(*) FROM lead_scores").fetchone()[0]
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "stored_leads": stored,
+            "delta_max_fields": self.delta_max_fields,
+            "delta_max_change": self.delta_max_change,
+            "max_age": self.max_age,
+            "outcomes": dict(self.outcomes),
+            "reuse_rate": round(self.outcomes[UNCHANGED] / total, 4) if total else 0.0,
+        }
+
+
+lead_fingerprints = LeadFingerprintStore(env_str("LEAD_FINGERPRINT_DB", GENERATIONS_DB))
@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import codecs
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Dict, Any, List, Optional, Tuple, Union
+from pydantic import ValidationError
+from app.models.lead import LeadRequest, LeadScoreResponse
+from app.services.lead_service import score_lead
+from app.utils.admission import admission_lane, BULK
+from app.utils.deadline import no_deadline
+from app.utils.config import env_int
+from app.utils.llm_output import dumps
+
+LEAD_IMPORT_CONCURRENCY = env_int("LEAD_IMPORT_CONCURRENCY", 8)
+
+CSV_COLUMNS = ["row", "lead_id", "score", "priority", "conversion_probability",
+               "qualification_summary", "recommended_actions", "xai_explanation", "error"]
+
+LEAD_FIELDS = set(LeadRequest.model_fields)
+
+RowResult = Tuple[int, Union[LeadScoreResponse, str]]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Splits a byte stream into text lines without holding more than one partial line."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending.strip():
+        yield pending.rstrip("\r")
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[Dict[str, str]]:
+    header: Optional[List[str]] = None
+    record = ""
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        # An odd number of quotes means a quoted field continues on the next line
+        if record.count('"') % 2 == 1:
+            continue
+        if not record.strip():
+            record = ""
+            continue
+        values = next(csv.reader([record]))
+        record = ""
+        if header is None:
+            header = [h.strip().lower() for h in values]
+            continue
+        yield dict(zip(header, values))
+
+
+async def iter_jsonl_records(lines: AsyncIterator[str]) -> AsyncIterator[Union[Dict[str, Any], str]]:
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+            yield data if isinstance(data, dict) else "Row is not a JSON object"
+        except ValueError as e:
+            yield f"Invalid JSON: {e}"
+
+
+async def iter_leads(chunks: AsyncIterator[bytes], fmt: str, start_row: int = 0) -> AsyncIterator[Tuple[int, Union[LeadRequest, str]]]:
+    """
+    Yields (row number, LeadRequest or validation error) for every data row.
+    Rows before `start_row` are read but not validated, so a crashed import can resume.
+    """
+    lines = iter_lines(chunks)
+    records = iter_csv_records(lines) if fmt == "csv" else iter_jsonl_records(lines)
+    row = -1
+    async for record in records:
+        row += 1
+        if row < start_row:
+            continue
+        if isinstance(record, str):
+            yield row, record
+            continue
+        data = {k.strip().lower(): v for k, v in record.items() if k}
+        data = {k: v for k, v in data.items() if k in LEAD_FIELDS and v not in (None, "")}
+        try:
+            yield row, LeadRequest.model_validate(data)
+        except ValidationError as e:
+            yield row, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+
+async def _score_row(lead: Union[LeadRequest, str]) -> Union[LeadScoreResponse, str]:
+    if isinstance(lead, str):
+        return lead
+    try:
+        # Rows are already paced by the import window, so they wait for a slot instead of being shed
+        with admission_lane(BULK, shed=False), no_deadline():
+            return await score_lead(lead)
+    except Exception as e:
+        return str(e)
+
+
+async def score_rows(leads: AsyncIterator[Tuple[int, Union[LeadRequest, str]]], concurrency: int = LEAD_IMPORT_CONCURRENCY) -> AsyncIterator[RowResult]:
+    """
+    Scores rows with at most `concurrency` in flight and yields results in row order.
+    The input is only pulled when a slot frees up, which is what keeps memory flat
+    and pushes back on the reader (and the client upload) when scoring is slower.
+    """
+    window: deque = deque()
+    try:
+        async for row, lead in leads:
+            window.append((row, asyncio.ensure_future(_score_row(lead))))
+            if len(window) >= max(1, concurrency):
+                head_row, task = window.popleft()
+                yield head_row, await task
+        while window:
+            head_row, task = window.popleft()
+            yield head_row, await task
+    finally:
+        for _, task in window:
+            task.cancel()
+
+
+def format_ndjson(row: int, result: Union[LeadScoreResponse, str]) -> str:
+    if isinstance(result, str):
+        return dumps({"row": row, "error": result}) + "\n"
+    return dumps({"row": row, "result": result.model_dump()}) + "\n"
+
+
+def csv_header() -> str:
+    return _csv_line(CSV_COLUMNS)
+
+
+def format_csv(row: int, result: Union[LeadScoreResponse, str]) -> str:
+    if isinstance(result, str):
+        return _csv_line([row, "", "", "", "", "", "", "", result])
+    return _csv_line([
+        row, result.lead_id, result.score, result.priority, result.conversion_probability,
+        result.qualification_summary, "; ".join(result.recommended_actions), result.xai_explanation, "",
+    ])
+
+
+def _csv_line(values: List[Any]) -> str:
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(values)
+    return buf.getvalue()
+
+
+async def import_and_score(chunks: AsyncIterator[bytes], fmt: str = "csv", output: str = "ndjson",
+                           start_row: int = 0, concurrency: int = LEAD_IMPORT_CONCURRENCY,
+                           header: bool = True) -> AsyncIterator[str]:
+    """Full pipeline: byte stream in, NDJSON or CSV lines out as soon as each row is scored."""
+    if output == "csv" and header:
+        yield csv_header()
+    formatter = format_csv if output == "csv" else format_ndjson
+    async for row, result in score_rows(iter_leads(chunks, fmt, start_row), concurrency):
+        yield formatter(row, result)
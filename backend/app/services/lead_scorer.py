@@ -0,0 +1,259 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+import numpy as np
+from app.models.lead import LeadRequest, LeadScoreResponse
+from app.utils.config import env_bool, env_float, env_int, env_str
+from app.utils.log import get_logger
+
+logger = get_logger("lead_scorer")
+
+FEATURE_NAMES = [
+    "bias",
+    "budget_size",
+    "budget_missing",
+    "urgency",
+    "needs_detail",
+    "needs_intent",
+    "notes_present",
+    "notes_positive",
+    "notes_negative",
+]
+
+# Hand-set starting weights so the engine is useful before it has been fitted
+DEFAULT_WEIGHTS = np.array([-1.6, 2.2, -0.8, 1.6, 0.5, 0.45, 0.2, 0.6, -1.2])
+
+INTENT_KEYWORDS = ["integrat", "replace", "migrat", "scale", "automat", "demo", "pilot", "contract", "purchase", "rollout", "roll out", "implement"]
+POSITIVE_KEYWORDS = ["decision maker", "approved", "ceo", "cto", "cfo", "vp", "director", "head of", "signed", "trial", "referral", "champion"]
+NEGATIVE_KEYWORDS = ["just browsing", "no budget", "student", "not interested", "next year", "competitor", "freeze", "unsubscribe", "tire kicker"]
+HIGH_URGENCY = ["high", "urgent", "asap", "immediate", "critical", "this week", "this month"]
+LOW_URGENCY = ["low", "no rush", "someday", "next year", "exploring"]
+
+_AMOUNT = re.compile(r"(\d+(?:[.,]\d+)*)\s*(thousand|million|billion|[kmb])?\b", re.IGNORECASE)
+_SCALE = {"k": 1e3, "thousand": 1e3, "m": 1e6, "million": 1e6, "b": 1e9, "billion": 1e9}
+
+
+@lru_cache(maxsize=65536)
+def parse_budget(budget: str) -> float:
+    """
+    Parses budget strings like "$50k", "50,000 USD", "$1.2M" or "$10k-$20k" (midpoint)
+    into a number. Returns NaN when no amount is present.
+    """
+    values = []
+    for number, suffix in _AMOUNT.findall(budget or ""):
+        try:
+            value = float(number.replace(",", ""))
+        except ValueError:
+            continue
+        if suffix:
+            value *= _SCALE[suffix.lower()]
+        values.append(value)
+    if not values:
+        return float("nan")
+    return sum(values[:2]) / len(values[:2])
+
+
+def _keyword_hits(texts: np.ndarray, keywords: List[str]) -> np.ndarray:
+    hits = np.zeros(len(texts), dtype=np.float64)
+    for kw in keywords:
+        hits += np.char.find(texts, kw.encode("utf-8")) >= 0
+    return hits
+
+
+def _lowered(texts: Sequence[Optional[str]]) -> np.ndarray:
+    # str.lower in a comprehension is several times faster than np.char.lower, and
+    # searching UTF-8 bytes ("S" dtype) is much cheaper than 4-byte unicode ("U")
+    return np.asarray([t.lower().encode("utf-8") if t else b"" for t in texts], dtype=bytes)
+
+
+def featurize_columns(budgets: Sequence[str], urgencies: Sequence[str], needs: Sequence[str], notes: Sequence[Optional[str]]) -> np.ndarray:
+    """Builds the (n, len(FEATURE_NAMES)) feature matrix from raw lead columns."""
+    n = len(budgets)
+    X = np.empty((n, len(FEATURE_NAMES)), dtype=np.float64)
+
+    amounts = np.fromiter((parse_budget(b) for b in budgets), dtype=np.float64, count=n)
+    missing = np.isnan(amounts)
+    X[:, 0] = 1.0
+    # log10 scale: $1k -> 0.3, $100k -> 0.83, $1M -> 1.0
+    X[:, 1] = np.where(missing, 0.0, np.clip(np.log10(np.maximum(amounts, 1.0)) / 6.0, 0.0, 1.5))
+    X[:, 2] = missing
+
+    # Urgency has few distinct values, so encode the uniques and broadcast back
+    levels, inverse = np.unique(_lowered(urgencies), return_inverse=True)
+    high = _keyword_hits(levels, HIGH_URGENCY) > 0
+    low = _keyword_hits(levels, LOW_URGENCY) > 0
+    X[:, 3] = np.where(high, 1.0, np.where(low, 0.0, 0.5))[inverse.reshape(-1)]
+
+    needs_arr = _lowered(needs)
+    X[:, 4] = np.minimum(np.log1p(np.char.str_len(needs_arr)) / math.log(400), 1.0)
+    X[:, 5] = np.minimum(_keyword_hits(needs_arr, INTENT_KEYWORDS), 3.0) / 3.0
+
+    notes_arr = _lowered(notes)
+    X[:, 6] = np.char.str_len(notes_arr) > 0
+    X[:, 7] = np.minimum(_keyword_hits(notes_arr, POSITIVE_KEYWORDS), 2.0) / 2.0
+    X[:, 8] = np.minimum(_keyword_hits(notes_arr, NEGATIVE_KEYWORDS), 2.0) / 2.0
+    return X
+
+
+def featurize(leads: Sequence[LeadRequest]) -> np.ndarray:
+    return featurize_columns(
+        [l.budget for l in leads],
+        [l.urgency for l in leads],
+        [l.needs for l in leads],
+        [l.notes for l in leads],
+    )
+
+
+class LocalLeadScorer:
+    """
+    Logistic-regression lead scorer used as the fast first tier in front of the LLM.
+
+    Scores are 100 * P(qualified). Once the model has been fitted (or loaded), leads whose
+    probability falls outside [LEAD_CASCADE_LOW, LEAD_CASCADE_HIGH] are confident enough
+    to skip the LLM; the hand-set starting weights never decide that on their own.
+    The model can be refitted from previously recorded LLM scores (used as soft labels).
+    """
+
+    def __init__(self):
+        self.weights = DEFAULT_WEIGHTS.copy()
+        self.fitted = False
+        self.cascade = env_bool("LEAD_CASCADE", True)
+        self.low = env_float("LEAD_CASCADE_LOW", 0.15)
+        self.high = env_float("LEAD_CASCADE_HIGH", 0.85)
+        self.model_path = env_str("LEAD_MODEL_PATH")
+        self.refit_every = env_int("LEAD_MODEL_REFIT_EVERY", 500)
+        self._samples: deque = deque(maxlen=env_int("LEAD_MODEL_MAX_SAMPLES", 50000))
+        self._since_fit = 0
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.llm_fallbacks = 0
+        self._load()
+
+    # --- Persistence ---
+    def _load(self):
+        if not self.model_path or not os.path.exists(self.model_path):
+            return
+        try:
+            with open(self.model_path) as f:
+                saved = json.load(f)
+            if saved.get("features") == FEATURE_NAMES:
+                self.weights = np.array(saved["weights"], dtype=np.float64)
+                self.fitted = True
+        except Exception as e:
+            logger.warning("Could not load lead model from %s: %s", self.model_path, e)
+
+    def _save(self):
+        if not self.model_path:
+            return
+        with open(self.model_path, "w") as f:
+            json.dump({"features": FEATURE_NAMES, "weights": self.weights.tolist()}, f)
+
+    @property
+    def cascade_active(self) -> bool:
+        """Whether confident local scores skip the LLM: LEAD_CASCADE and a fitted model."""
+        return self.cascade and self.fitted
+
+    # --- Scoring ---
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp(-(X @ self.weights)))
+
+    def score(self, leads: Sequence[LeadRequest]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Returns (scores 0-100, probabilities, confident mask) for a batch of leads."""
+        return self.score_features(featurize(leads))
+
+    def score_features(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        p = self.predict_proba(X)
+        scores = np.rint(p * 100).astype(np.int64)
+        confident = (p <= self.low) | (p >= self.high)
+        return scores, p, confident
+
+    def explain(self, lead: LeadRequest, x: Optional[np.ndarray] = None, top: int = 3) -> str:
+        if x is None:
+            x = featurize([lead])[0]
+        contributions = x * self.weights
+        order = np.argsort(-np.abs(contributions[1:]))[:top] + 1
+        parts = [f"{FEATURE_NAMES[i]} ({'+' if contributions[i] >= 0 else '-'}{abs(contributions[i]):.2f})" for i in order if contributions[i] != 0]
+        return "Local model score. Main factors: " + ", ".join(parts) + "." if parts else "Local model score."
+
+    def response(self, lead: LeadRequest, score: int, lead_id: str, x: Optional[np.ndarray] = None) -> LeadScoreResponse:
+        priority = "Medium"
+        if score >= 70: priority = "High"
+        elif score < 40: priority = "Low"
+
+        actions = {
+            "High": ["Schedule Discovery Call", "Send Proposal"],
+            "Medium": ["Send Case Studies", "Follow Up In One Week"],
+            "Low": ["Add To Nurture Campaign"],
+        }[priority]
+        return LeadScoreResponse(
+            lead_id=lead_id,
+            score=int(score),
+            priority=priority,
+            conversion_probability=f"{int(score)}%",
+            qualification_summary=f"Lead shows {lead.urgency.lower()} urgency with budget '{lead.budget}'.",
+            recommended_actions=actions,
+            xai_explanation=self.explain(lead, x)
+        )
+
+    # --- Training ---
+    def record(self, lead: LeadRequest, llm_score: int):
+        """
+        Stores an LLM-assigned score as a training sample; refits every `refit_every` samples.
+        Only scores a provider actually returned belong here, never demo or local-model output.
+        """
+        with self._lock:
+            self._samples.append((lead.budget, lead.urgency, lead.needs, lead.notes, max(0, min(100, int(llm_score)))))
+            self._since_fit += 1
+            due = self.refit_every > 0 and self._since_fit >= self.refit_every
+        if due:
+            # Refit off the event loop; the weights are swapped in when done
+            threading.Thread(target=self.fit, daemon=True).start()
+
+    def fit(self, l2: float = 1e-2, iterations: int = 25) -> Dict[str, Any]:
+        """Fits the weights with Newton/IRLS on the recorded samples (soft labels = score / 100)."""
+        with self._lock:
+            samples = list(self._samples)
+            self._since_fit = 0
+        if len(samples) < 20:
+            return {"fitted": False, "samples": len(samples), "reason": "need at least 20 samples"}
+
+        budgets, urgencies, needs, notes, scores = zip(*samples)
+        X = featurize_columns(budgets, urgencies, needs, notes)
+        y = np.asarray(scores, dtype=np.float64) / 100.0
+        w = self.weights.copy()
+        reg = l2 * np.eye(len(w))
+        reg[0, 0] = 0.0
+        for _ in range(iterations):
+            p = 1.0 / (1.0 + np.exp(-(X @ w)))
+            grad = X.T @ (p - y) / len(y) + reg @ w
+            hess = (X * (p * (1 - p))[:, None]).T @ X / len(y) + reg + 1e-9 * np.eye(len(w))
+            step = np.linalg.solve(hess, grad)
+            w -= step
+            if np.max(np.abs(step)) < 1e-6:
+                break
+
+        self.weights = w
+        self.fitted = True
+        self._save()
+        mae = float(np.mean(np.abs(self.predict_proba(X) - y)) * 100)
+        return {"fitted": True, "samples": len(samples), "mae": round(mae, 2)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cascade": self.cascade,
+            "cascade_active": self.cascade_active,
+            "thresholds": {"low": self.low, "high": self.high},
+            "fitted": self.fitted,
+            "samples": len(self._samples),
+            "weights": dict(zip(FEATURE_NAMES, np.round(self.weights, 4).tolist())),
+            "local_hits": self.local_hits,
+            "llm_fallbacks": self.llm_fallbacks,
+        }
+
+
+lead_scorer = LocalLeadScorer()
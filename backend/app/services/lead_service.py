@@ -1,29 +1,29 @@
-import json
+from typing import List, Dict, Any, AsyncIterator, Tuple
 from app.models.lead import LeadRequest, LeadScoreResponse
-from app.utils.llm_client import llm_client
+from app.utils.llm_client import llm_client, ProviderUnavailable
+from app.services.lead_scorer import lead_scorer
+from app.services.lead_fingerprints import lead_fingerprints, StoredScore, UNCHANGED, DELTA, FULL
+from app.utils.json_stream import IncrementalJSONParser
+from app.utils.llm_output import parse_json, validate, with_defaults
+from app.utils.response_cache import CacheMissError
+from app.utils.admission import Overloaded
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded, request_deadline
+from app.utils.sse import sse_event
+from app.utils.generation_store import generations, new_id
+from app.utils.metrics import stage, note_tokens
+from app.utils.tokens import TokenUsage
+from app.utils.log import get_logger
 
-async def score_lead(request: LeadRequest) -> LeadScoreResponse:
-    # Check for mock mode
-    if not llm_client.api_key:
-        # Simple heuristic for mock
-        base_score = 50
-        if "High" in request.urgency: base_score += 20
-        if "$" in request.budget and len(request.budget) > 4: base_score += 15
-        
-        priority = "Medium"
-        if base_score > 80: priority = "High"
-        elif base_score < 40: priority = "Low"
-        
-        return LeadScoreResponse(
-            lead_id="mock_lead_789",
-            score=base_score,
-            priority=priority,
-            conversion_probability=f"{base_score}%",
-            qualification_summary=f"Lead shows {request.urgency.lower()} urgency with defined budget.",
-            recommended_actions=["Schedule Discovery Call", "Send Case Studies"],
-            xai_explanation=f"Score boosted by '{request.urgency}' urgency. Budget presence indicates intent."
-        )
+logger = get_logger("lead")
+
+def _local_score(request: LeadRequest, score: int = None, features=None) -> LeadScoreResponse:
+    """Scores a lead with the local model (also the demo-mode path when no API key is set)."""
+    if score is None:
+        score = int(lead_scorer.score([request])[0][0])
+    return lead_scorer.response(request, score, new_id("local_lead"), features)
 
+def _build_messages(request: LeadRequest) -> List[Dict[str, str]]:
     system_prompt = """
     You are an AI Sales Operations Specialist.
     Analyze the lead details and provide a lead score (0-100), priority, and qualification summary.
@@ -49,43 +49,204 @@ async def score_lead(request: LeadRequest) -> LeadScoreResponse:
     Notes: {request.notes}
     """
     
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
-    
-    response_text = await llm_client.generate(messages)
-    
+
+SCORE_DEFAULTS = {
+    "score": 50,
+    "priority": "Medium",
+    "conversion_probability": "50%",
+    "qualification_summary": "Analysis complete.",
+    "recommended_actions": ["Contact Lead"],
+    "xai_explanation": "Score based on available data."
+}
+
+def _score_response(data: Dict[str, Any], res_id: str) -> LeadScoreResponse:
+    return validate(LeadScoreResponse, {**with_defaults(data, SCORE_DEFAULTS), "lead_id": res_id})
+
+def _error_score(summary: str) -> LeadScoreResponse:
+    return LeadScoreResponse(
+        lead_id="error",
+        score=0,
+        priority="Unknown",
+        conversion_probability="0%",
+        qualification_summary=summary,
+        recommended_actions=[],
+        xai_explanation="Error in AI processing.",
+        skipped_stages=deadline.skipped()
+    )
+
+DELTA_SYSTEM_PROMPT = """
+    You are an AI Sales Operations Specialist updating a lead score you assigned earlier.
+    Only the fields listed below have changed since then. Adjust the previous assessment
+    for these changes (BANT: Budget, Authority, Need, Timing) and keep what still holds.
+
+    CRITICAL: You MUST respond with a VALID JSON object.
+    Example format:
+    {
+        "score": 85,
+        "priority": "High",
+        "conversion_probability": "75%",
+        "qualification_summary": "...",
+        "recommended_actions": ["...", "..."],
+        "xai_explanation": "..."
+    }
+    """
+
+def _build_delta_messages(request: LeadRequest, stored: StoredScore, changed: List[str]) -> List[Dict[str, str]]:
+    previous = stored.result
+    changes = "\n".join(
+        f"    - {field.capitalize()}: {stored.values.get(field)!r} -> {getattr(request, field)!r}" for field in changed
+    )
+    user_prompt = f"""
+    Lead: {request.name} ({request.company})
+    Previous score: {previous.score} ({previous.priority}), conversion probability {previous.conversion_probability}
+    Previous summary: {previous.qualification_summary}
+    Changed fields:
+{changes}
+    """
+    return [
+        {"role": "system", "content": DELTA_SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt}
+    ]
+
+async def save_scores(scored: List[Tuple[LeadRequest, LeadScoreResponse]]):
+    """Persists lead scores for history and as each lead's latest score; failed scores are not kept."""
+    await generations.save([
+        generations.row("lead", result.lead_id, request, result, company=request.company)
+        for request, result in scored if result.lead_id != "error"
+    ])
+    await lead_fingerprints.remember(scored)
+
+def _record_sample(request: LeadRequest, result: LeadScoreResponse, usage: TokenUsage):
+    """
+    Records the call's tokens and, if a provider answered it, the score as a training
+    sample for the local model; a cached generation (provider "none") may belong to
+    another lead (semantic cache) or have been recorded already.
+    """
+    if usage.provider == "none":
+        return
+    note_tokens(usage.provider, usage.prompt, usage.completion)
+    lead_scorer.record(request, result.score)
+
+async def _llm_score(request: LeadRequest, messages: List[Dict[str, str]]) -> LeadScoreResponse:
+    """Scores a lead with one LLM call; raises ValueError if the output cannot be used."""
+    usage = TokenUsage()
+    try:
+        response_text = await llm_client.generate(messages, cache=request.cache, usage=usage, mock=False)
+    except ProviderUnavailable:
+        # No provider answered: a local estimate for now, not stored, so the lead is scored properly next time
+        logger.warning("No LLM provider answered; returning an unsaved local score for %s", request.company)
+        return _local_score(request)
+    with stage("json_parse"):
+        data = parse_json(response_text)
+    with stage("model_build"):
+        result = _score_response(data, new_id("gen_lead"))
+    result.skipped_stages = deadline.skipped()
+    _record_sample(request, result, usage)
+    await save_scores([(request, result)])
+    return result
+
+async def score_lead(request: LeadRequest) -> LeadScoreResponse:
+    with request_deadline(request.timeout):
+        return await _score_lead(request)
+
+async def _score_lead(request: LeadRequest) -> LeadScoreResponse:
+    # A lead resubmitted without changes to its scored fields keeps its stored score
+    stored = (await lead_fingerprints.lookup([request]))[0]
+    outcome, changed = lead_fingerprints.classify(request, stored)
+    if outcome == UNCHANGED:
+        lead_fingerprints.count(UNCHANGED)
+        return stored.result.model_copy(update={"skipped_stages": []})
+
+    # Local model first: mock mode, or a confident local score, never reaches the LLM.
+    # Only the fitted cascade's scores are stored; demo scores would stand in for a real one.
+    scores, _, confident = lead_scorer.score([request])
+    if not llm_client.api_key or (lead_scorer.cascade_active and confident[0]):
+        lead_scorer.local_hits += 1
+        lead_fingerprints.count(FULL)
+        result = _local_score(request, int(scores[0]))
+        if llm_client.api_key:
+            await save_scores([(request, result)])
+        return result
+    lead_scorer.llm_fallbacks += 1
+    return await _score_with_llm(request, stored, outcome, changed)
+
+async def _score_with_llm(request: LeadRequest, stored: StoredScore, outcome: str, changed: List[str]) -> LeadScoreResponse:
+    """
+    The LLM tier of score_lead, for a lead the local model left to it: a delta prompt for
+    a minor change, else (or if that fails) a full analysis. Batch retries call it directly,
+    since the batch already counted the lead as an LLM fallback.
+    """
+    if outcome == DELTA:
+        # Minor change: the previous score plus only the changed fields
+        with stage("prompt_build"):
+            messages = _build_delta_messages(request, stored, changed)
+        try:
+            result = await _llm_score(request, messages)
+            lead_fingerprints.count(DELTA)
+            return result
+        except ValueError as e:
+            logger.warning("Delta lead scoring failed, running a full analysis: %s", e)
+
+    lead_fingerprints.count(FULL)
+    with stage("prompt_build"):
+        messages = _build_messages(request)
     try:
-        # Clean JSON if AI adds markdown
-        clean_json = response_text
-        if "```json" in response_text:
-            clean_json = response_text.split("```json")[1].split("```")[0].strip()
-        elif "{" in response_text:
-            clean_json = response_text[response_text.find("{"):response_text.rfind("}")+1]
-
-        data = json.loads(clean_json)
-        # Use abs() and modulo to avoid indexing issues and signs
-        res_id = f"gen_lead_{abs(hash(clean_json)) % 1000000}"
-        
-        return LeadScoreResponse(
-            lead_id=res_id,
-            score=data.get("score", 50),
-            priority=data.get("priority", "Medium"),
-            conversion_probability=data.get("conversion_probability", "50%"),
-            qualification_summary=data.get("qualification_summary", "Analysis complete."),
-            recommended_actions=data.get("recommended_actions", ["Contact Lead"]),
-            xai_explanation=data.get("xai_explanation", "Score based on available data.")
-        )
+        return await _llm_score(request, messages)
+    except (CacheMissError, Overloaded, DeadlineExceeded):
+        raise
     except Exception as e:
-        print(f"ERROR: Lead parsing failed: {e}")
-        return LeadScoreResponse(
-            lead_id="error",
-            score=0,
-            priority="Unknown",
-            conversion_probability="0%",
-            qualification_summary=f"Error parsing AI response: {str(e)}",
-            recommended_actions=[],
-            xai_explanation="Error in AI processing."
-        )
+        logger.error("Lead parsing failed: %s", e)
+        return _error_score(f"Error parsing AI response: {str(e)}")
+
+async def stream_lead(request: LeadRequest) -> AsyncIterator[str]:
+    """
+    Server-sent events version of score_lead: each recommended action is sent as an
+    "action" event as it closes in the token stream; "done" carries the full score,
+    which is saved like score_lead's. Demo-mode scores are not saved.
+    """
+    if not llm_client.api_key:
+        result = _local_score(request)
+        for action in result.recommended_actions:
+            yield sse_event("action", {"action": action})
+        yield sse_event("done", result)
+        return
 
+    parser = IncrementalJSONParser({"recommended_actions"})
+    usage = TokenUsage()
+    try:
+        with request_deadline(request.timeout):
+            with stage("prompt_build"):
+                messages = _build_messages(request)
+            try:
+                async for chunk in llm_client.generate_stream(messages, cache=request.cache, usage=usage, mock=False):
+                    for _, action in parser.feed(chunk):
+                        yield sse_event("action", {"action": action})
+            except ProviderUnavailable:
+                # As in _llm_score: an unsaved local estimate
+                logger.warning("No LLM provider answered; streaming an unsaved local score for %s", request.company)
+                result = _local_score(request)
+                for action in result.recommended_actions:
+                    yield sse_event("action", {"action": action})
+                yield sse_event("done", result)
+                return
+
+            data = parser.document()
+            with stage("model_build"):
+                result = _score_response(data, new_id("gen_lead"))
+            result.skipped_stages = deadline.skipped()
+            _record_sample(request, result, usage)
+            await save_scores([(request, result)])
+            yield sse_event("done", result)
+    except CacheMissError as e:
+        yield sse_event("error", {"status": 404, "detail": str(e)})
+    except DeadlineExceeded as e:
+        yield sse_event("error", {"status": 504, "detail": e.detail})
+    except Overloaded as e:
+        yield sse_event("error", {"status": 503, "detail": e.detail, "retry_after": e.retry_after})
+    except Exception as e:
+        logger.error("Lead stream failed: %s", e)
+        yield sse_event("error", {"status": 500, "detail": str(e)})
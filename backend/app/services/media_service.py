@@ -0,0 +1,259 @@
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Any, List, Optional, Set, Tuple
+from app.utils.llm_client import llm_client
+from app.utils.http_pool import http_pool
+from app.utils.singleflight import SingleFlight
+from app.utils.media_cache import MediaDiskCache
+from app.utils.config import env_bool, env_float, env_int, env_str
+from app.utils.log import get_logger
+
+logger = get_logger("media")
+
+MEDIA_PREFETCH = env_bool("MEDIA_PREFETCH", False)
+MEDIA_PREFETCH_CONCURRENCY = env_int("MEDIA_PREFETCH_CONCURRENCY", 4)
+MEDIA_CACHE_DIR = env_str("MEDIA_CACHE_DIR", "media_cache")
+MEDIA_CACHE_MAX_BYTES = env_int("MEDIA_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+MEDIA_MAX_ITEM_BYTES = env_int("MEDIA_MAX_ITEM_BYTES", 10 * 1024 * 1024)
+MEDIA_URL_CACHE_SIZE = env_int("MEDIA_URL_CACHE_SIZE", 4096)
+MEDIA_PUBLIC_BASE_URL = env_str("MEDIA_PUBLIC_BASE_URL", "http://localhost:8000").rstrip("/")
+# Media still resolving after a response was sent keeps running this long before being dropped
+CAMPAIGN_MEDIA_HARD_TIMEOUT = env_float("CAMPAIGN_MEDIA_HARD_TIMEOUT", 120.0)
+CAMPAIGN_MEDIA_TTL = env_float("CAMPAIGN_MEDIA_TTL", 900.0)
+CAMPAIGN_MEDIA_MAX_CAMPAIGNS = env_int("CAMPAIGN_MEDIA_MAX_CAMPAIGNS", 2000)
+
+MEDIA_READY = "ready"
+MEDIA_PENDING = "pending"
+MEDIA_FAILED = "failed"
+MEDIA_NONE = "none"
+
+
+def media_kind(visual_prompt: str, platform: str) -> Tuple[str, str]:
+    """(kind, aspect ratio) for a content item, by platform and prompt."""
+    platform = platform.lower()
+    aspect_ratio = "1:1"
+    if "instagram" in platform or "poster" in platform:
+        aspect_ratio = "9:16"
+    if "video" in visual_prompt.lower() or "reel" in platform or "tiktok" in platform:
+        return "video", aspect_ratio
+    return "image", aspect_ratio
+
+
+def media_key(kind: str, visual_prompt: str, aspect_ratio: str) -> str:
+    normalized = " ".join(visual_prompt.lower().split())
+    return hashlib.sha256(f"{kind}|{aspect_ratio}|{normalized}".encode("utf-8")).hexdigest()
+
+
+def seed_for(key: str) -> int:
+    """Deterministic generator seed, so the same prompt always maps to the same image URL."""
+    return int(key[:8], 16) % 1000000
+
+
+class MediaResolver:
+    """
+    Resolves visual prompts to media URLs for campaign items.
+
+    Identical prompts (same kind, aspect ratio and normalized text) resolve once:
+    concurrently through single-flight, afterwards from an LRU of resolved URLs.
+    With MEDIA_PREFETCH on, images are downloaded in the background (bounded by
+    MEDIA_PREFETCH_CONCURRENCY) into a content-addressed disk cache, and later
+    requests get a local /media/{digest} URL instead of the upstream one.
+    """
+
+    def __init__(self):
+        self.prefetch = MEDIA_PREFETCH
+        self.disk = MediaDiskCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES)
+        self._urls: "OrderedDict[str, str]" = OrderedDict()
+        self._flight = SingleFlight("media")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._prefetching: Dict[str, asyncio.Task] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.url_hits = 0
+        self.disk_hits = 0
+        self.resolved = 0
+        self.prefetched = 0
+        self.prefetch_failed = 0
+
+    async def start(self):
+        if self.prefetch:
+            await asyncio.to_thread(self.disk.load)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def local_url(self, digest: str) -> str:
+        return f"{MEDIA_PUBLIC_BASE_URL}/media/{digest}"
+
+    async def resolve(self, visual_prompt: str, platform: str = "") -> Optional[str]:
+        if not visual_prompt:
+            return None
+        kind, aspect_ratio = media_kind(visual_prompt, platform)
+        key = media_key(kind, visual_prompt, aspect_ratio)
+        url = self._urls.get(key)
+        if url is not None and url.startswith(self.local_url("")) and self.disk.lookup(key) is None:
+            # The local copy was evicted; resolve upstream again
+            del self._urls[key]
+            url = None
+        if url is not None:
+            self._urls.move_to_end(key)
+            self.url_hits += 1
+            return url
+        return await self._flight.do(key, lambda: self._resolve(key, kind, visual_prompt, aspect_ratio))
+
+    async def _resolve(self, key: str, kind: str, visual_prompt: str, aspect_ratio: str) -> str:
+        if self.prefetch:
+            if not self.disk.loaded:
+                await asyncio.to_thread(self.disk.load)
+            digest = self.disk.lookup(key)
+            if digest is not None:
+                self.disk_hits += 1
+                return self._remember(key, self.local_url(digest))
+
+        if kind == "video":
+            url = await llm_client.generate_video(visual_prompt, aspect_ratio, seed=seed_for(key))
+        else:
+            url = await llm_client.generate_image(visual_prompt, aspect_ratio, seed=seed_for(key))
+        self.resolved += 1
+        self._remember(key, url)
+
+        # Videos are stock clips served by a CDN; only generated images are worth caching locally
+        if self.prefetch and kind == "image" and key not in self._prefetching:
+            task = asyncio.ensure_future(self._prefetch(key, url))
+            self._prefetching[key] = task
+            self._tasks.add(task)
+            task.add_done_callback(lambda t, k=key: (self._tasks.discard(t), self._prefetching.pop(k, None)))
+        return url
+
+    def _remember(self, key: str, url: str) -> str:
+        self._urls[key] = url
+        self._urls.move_to_end(key)
+        while len(self._urls) > MEDIA_URL_CACHE_SIZE:
+            self._urls.popitem(last=False)
+        return url
+
+    async def _prefetch(self, key: str, url: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(MEDIA_PREFETCH_CONCURRENCY)
+        async with self._semaphore:
+            try:
+                async with http_pool.track() as client:
+                    response = await client.get(
+                        url, follow_redirects=True, timeout=http_pool.timeout_for("media"),
+                        headers={"User-Agent": "Mozilla/5.0 (MarketMind media prefetch)"},
+                    )
+                content_type = response.headers.get("content-type", "").split(";")[0].strip()
+                if response.status_code != 200 or not content_type.startswith("image/"):
+                    raise ValueError(f"HTTP {response.status_code}, content type '{content_type}'")
+                if len(response.content) > MEDIA_MAX_ITEM_BYTES:
+                    raise ValueError(f"{len(response.content)} bytes exceeds MEDIA_MAX_ITEM_BYTES")
+                digest = await asyncio.to_thread(self.disk.store, key, response.content, content_type)
+                self.prefetched += 1
+                self._remember(key, self.local_url(digest))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.prefetch_failed += 1
+                logger.warning("Media prefetch failed for %s: %s", url, e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "prefetch": self.prefetch,
+            "url_cache_entries": len(self._urls),
+            "url_hits": self.url_hits,
+            "disk_hits": self.disk_hits,
+            "resolved": self.resolved,
+            "prefetching": len(self._prefetching),
+            "prefetched": self.prefetched,
+            "prefetch_failed": self.prefetch_failed,
+            "coalescing": self._flight.stats(),
+            "disk": self.disk.stats() if self.prefetch else None,
+        }
+
+
+class PendingMediaRegistry:
+    """
+    Media state per campaign for items that missed their deadline. The late tasks keep
+    running in the background (up to CAMPAIGN_MEDIA_HARD_TIMEOUT) and update the entry
+    when they finish, so clients can fetch the URLs later. Entries expire after
+    CAMPAIGN_MEDIA_TTL seconds; the oldest are dropped beyond CAMPAIGN_MEDIA_MAX_CAMPAIGNS.
+    """
+
+    def __init__(self):
+        self._campaigns: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.late_ready = 0
+        self.late_failed = 0
+
+    def register(self, campaign_id: str, items: List[Dict[str, Any]], pending: Dict[int, asyncio.Task],
+                 on_done: Optional[Callable[[List[Dict[str, Any]]], None]] = None):
+        """
+        `items` are the content item dicts; `pending` maps item index to its unfinished task.
+        `on_done` is called with the final media items once the last pending task finishes.
+        """
+        self._expire()
+        entry = {
+            "created": time.monotonic(),
+            "items": [
+                {
+                    "index": index,
+                    "platform": item.get("platform", "Unknown"),
+                    "media_status": item.get("media_status") or MEDIA_NONE,
+                    "media_url": item.get("media_url"),
+                }
+                for index, item in enumerate(items)
+            ],
+        }
+        if pending and on_done is not None:
+            entry["on_done"] = on_done
+        self._campaigns[campaign_id] = entry
+        loop = asyncio.get_running_loop()
+        for index, task in pending.items():
+            handle = loop.call_later(CAMPAIGN_MEDIA_HARD_TIMEOUT, task.cancel)
+            task.add_done_callback(lambda t, i=index, h=handle: self._finished(entry, i, t, h))
+
+    def _finished(self, entry: Dict[str, Any], index: int, task: asyncio.Task, handle: asyncio.TimerHandle):
+        handle.cancel()
+        url = None
+        if not task.cancelled() and task.exception() is None:
+            url = task.result()
+        slot = entry["items"][index]
+        slot["media_url"] = url
+        slot["media_status"] = MEDIA_READY if url else MEDIA_FAILED
+        if url:
+            self.late_ready += 1
+        else:
+            self.late_failed += 1
+        if "on_done" in entry and not any(i["media_status"] == MEDIA_PENDING for i in entry["items"]):
+            try:
+                entry.pop("on_done")([dict(item) for item in entry["items"]])
+            except Exception as e:
+                logger.warning("Media completion callback failed: %s", e)
+
+    def get(self, campaign_id: str) -> Optional[List[Dict[str, Any]]]:
+        self._expire()
+        entry = self._campaigns.get(campaign_id)
+        return [dict(item) for item in entry["items"]] if entry else None
+
+    def _expire(self):
+        cutoff = time.monotonic() - CAMPAIGN_MEDIA_TTL
+        while self._campaigns:
+            campaign_id, entry = next(iter(self._campaigns.items()))
+            if entry["created"] >= cutoff and len(self._campaigns) <= CAMPAIGN_MEDIA_MAX_CAMPAIGNS:
+                break
+            self._campaigns.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        pending = sum(1 for e in self._campaigns.values() for i in e["items"] if i["media_status"] == MEDIA_PENDING)
+        return {
+            "campaigns": len(self._campaigns),
+            "pending_items": pending,
+            "late_ready": self.late_ready,
+            "late_failed": self.late_failed,
+        }
+
+
+media_resolver = MediaResolver()
+media_registry = PendingMediaRegistry()
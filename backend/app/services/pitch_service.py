@@ -1,104 +1,275 @@
-import json
+import asyncio
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from app.models.pitch import PitchRequest, PitchResponse, PitchVariant
-from app.utils.llm_client import llm_client
+from app.utils.llm_client import llm_client, ProviderUnavailable
+from app.utils.singleflight import SingleFlight, fingerprint
+from app.utils.llm_output import dumps, parse_json, validate, with_defaults
+from app.utils.response_cache import CacheMissError
+from app.utils.admission import Overloaded
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded, request_deadline
+from app.utils.semantic_cache import semantic_key
+from app.utils.generation_store import generations, new_id
+from app.utils.prompt_builder import compact
+from app.utils.sse import sse_event
+from app.utils.metrics import stage
+from app.utils.log import get_logger
+
+logger = get_logger("pitch")
+
+pitch_flight = SingleFlight("pitch")
 
 async def generate_pitch(request: PitchRequest) -> PitchResponse:
-    # Check for mock mode first (if API key is missing, LLMClient handles it, but we need specific mock data for Pitch)
-    if not llm_client.api_key:
-         return PitchResponse(
-            pitch_id="mock_pitch_123",
-            strategy_explanation="DEMO MODE: Strategy focused on value-based selling and addressing pain points specific to the persona.",
-            variants=[
-                PitchVariant(
-                    variant_type="Cold Email",
-                    subject_line=f"Unlock growth for {request.industry} with {request.product_name}",
-                    content=f"Hi [Name],\n\nI noticed you're leading innovation in the {request.industry} space. {request.product_name} helps teams like yours streamline operations.\n\nWould you be open to a 10-min chat?",
-                    xai_explanation="Short, direct approach respecting the recipient's time. value proposition is front-loaded."
-                ),
-                PitchVariant(
-                    variant_type="LinkedIn Message",
-                    content=f"Saw your recent post about {request.industry} trends. {request.product_name} aligns perfectly with that vision. Let's connect!",
-                    xai_explanation="Contextual and personalized to recent activity to increase acceptance rate."
-                ),
-                PitchVariant(
-                    variant_type="Elevator Pitch",
-                    content=f"{request.product_name} is the only solution that combines X and Y for {request.persona}s, reducing costs by 20% in just 30 days.",
-                    xai_explanation="Focuses on unique selling proposition (USP) and quantifiable metrics."
-                )
-            ]
-        )
+    with request_deadline(request.timeout):
+        # Identical concurrent requests with about the same deadline share one generation
+        key = f"{fingerprint(request)}:{deadline.coalescing_key()}"
+        response = await pitch_flight.do(key, lambda: _generate_pitch(request))
+    return response.model_copy(deep=True)
 
-    system_prompt = """
+def _mock_pitch(request: PitchRequest) -> PitchResponse:
+    variants = {
+        "Cold Email": PitchVariant(
+            variant_type="Cold Email",
+            subject_line=f"Unlock growth for {request.industry} with {request.product_name}",
+            content=f"Hi [Name],\n\nI noticed you're leading innovation in the {request.industry} space. {request.product_name} helps teams like yours streamline operations.\n\nWould you be open to a 10-min chat?",
+            xai_explanation="Short, direct approach respecting the recipient's time. value proposition is front-loaded."
+        ),
+        "LinkedIn Message": PitchVariant(
+            variant_type="LinkedIn Message",
+            content=f"Saw your recent post about {request.industry} trends. {request.product_name} aligns perfectly with that vision. Let's connect!",
+            xai_explanation="Contextual and personalized to recent activity to increase acceptance rate."
+        ),
+        "Elevator Pitch": PitchVariant(
+            variant_type="Elevator Pitch",
+            content=f"{request.product_name} is the only solution that combines X and Y for {request.persona}s, reducing costs by 20% in just 30 days.",
+            xai_explanation="Focuses on unique selling proposition (USP) and quantifiable metrics."
+        ),
+    }
+    return PitchResponse(
+        pitch_id="mock_pitch_123",
+        strategy_explanation="DEMO MODE: Strategy focused on value-based selling and addressing pain points specific to the persona." if request.strategy else "",
+        variants=[variants[kind] for kind in _requested_variants(request)]
+    )
+
+# Output budget (max_tokens) and brief per variant. Each variant is its own LLM call,
+# so a pitch takes as long as its slowest variant rather than all of them in sequence.
+VARIANT_SPECS: Dict[str, Tuple[int, str]] = {
+    "Cold Email": (700, "A complete cold email with a subject line, ready to send."),
+    "LinkedIn Message": (300, "A LinkedIn connection message under 300 characters."),
+    "Elevator Pitch": (200, "A spoken elevator pitch of at most 30 seconds."),
+}
+STRATEGY_MAX_TOKENS = 250
+
+def _requested_variants(request: PitchRequest) -> List[str]:
+    # Request order, duplicates dropped
+    return list(dict.fromkeys(request.variants))
+
+def _user_prompt(request: PitchRequest) -> str:
+    return (
+        f"Product: {request.product_name}\n"
+        f"Description: {request.product_description}\n"
+        f"Persona: {request.persona}\n"
+        f"Industry: {request.industry}\n"
+        f"Tone: {request.tone}"
+    )
+
+def _variant_system_prompt(variant_type: str, brief: str) -> str:
+    example = {"subject_line": "...", "content": "...", "xai_explanation": "..."}
+    if variant_type != "Cold Email":
+        del example["subject_line"]
+    return compact(f"""
     You are an expert Sales Copywriter and Deal Closer.
-    Generate personalized sales pitches based on the product and target persona.
+    Write one '{variant_type}' pitch for the product and target persona.
+    {brief} Ensure 'content' is ready to use.
     Provide Explainable AI (XAI) reasoning for your choices.
-    
+
     CRITICAL: You MUST respond with a VALID JSON object.
     Example format:
-    {
-        "strategy_explanation": "...",
-        "variants": [
-            {
-                "variant_type": "Cold Email",
-                "subject_line": "...",
-                "content": "Full email text",
-                "xai_explanation": "..."
-            }
-        ]
-    }
+    {dumps(example)}
+    """)
+
+# Static system prompts, built once
+VARIANT_SYSTEM_PROMPTS = {kind: _variant_system_prompt(kind, brief) for kind, (_, brief) in VARIANT_SPECS.items()}
+STRATEGY_SYSTEM_PROMPT = compact("""
+    You are an expert Sales Copywriter and Deal Closer.
+    In two or three sentences, explain the overall persuasion strategy for pitching
+    the product to the target persona.
+
+    CRITICAL: You MUST respond with a VALID JSON object.
+    Example format:
+    {"strategy_explanation": "..."}
+    """)
+
+def _build_variant_messages(request: PitchRequest, variant_type: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": VARIANT_SYSTEM_PROMPTS[variant_type]},
+        {"role": "user", "content": _user_prompt(request)}
+    ]
+
+def _build_strategy_messages(request: PitchRequest) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": STRATEGY_SYSTEM_PROMPT},
+        {"role": "user", "content": _user_prompt(request)}
+    ]
+
+VARIANT_DEFAULTS = {"variant_type": "Unknown", "content": "No content generated", "xai_explanation": ""}
+STRATEGY_DEFAULT = "Generated based on sales best practices."
+# Free-text request fields matched by similarity in the semantic cache; the rest must be equal
+SEMANTIC_FIELDS = ("product_description",)
+# Each call generates one part, so which other parts were requested does not matter
+PER_CALL_IGNORED = ("variants", "strategy")
+
+def _pitch_variant(item: Dict[str, Any]) -> PitchVariant:
+    return validate(PitchVariant, with_defaults(item, VARIANT_DEFAULTS))
+
+async def _generate_variant(request: PitchRequest, variant_type: str) -> Optional[PitchVariant]:
     """
-    
-    user_prompt = f"""
-    Product: {request.product_name}
-    Description: {request.product_description}
-    Persona: {request.persona}
-    Industry: {request.industry}
-    Tone: {request.tone}
-    
-    Generate 3 distinct variants: 'Cold Email', 'LinkedIn Message', and 'Elevator Pitch'.
-    Ensure 'content' is detailed and ready to use.
+    One variant from its own LLM call; None if no provider answered, the output has no
+    content or cannot be used, or the call missed the deadline.
     """
-    
-    messages = [
-        {"role": "system", "content": system_prompt},
-        {"role": "user", "content": user_prompt}
-    ]
-    
-    response_text = await llm_client.generate(messages)
-    print(f"DEBUG: Pitch AI raw response: {response_text[:300]}")
-    
+    max_tokens, _ = VARIANT_SPECS[variant_type]
+    with stage("prompt_build"):
+        messages = _build_variant_messages(request, variant_type)
     try:
-        # Clean JSON if AI adds markdown
-        clean_json = response_text
-        if "```json" in response_text:
-            clean_json = response_text.split("```json")[1].split("```")[0].strip()
-        elif "{" in response_text:
-            clean_json = response_text[response_text.find("{"):response_text.rfind("}")+1]
-
-        data = json.loads(clean_json)
-        variants = []
-        for item in data.get("variants", []):
-            variants.append(PitchVariant(
-                variant_type=item.get("variant_type", "Unknown"),
-                subject_line=item.get("subject_line"),
-                content=item.get("content", "No content generated"),
-                xai_explanation=item.get("xai_explanation", "")
-            ))
-            
-        # Use abs() and modulo to avoid indexing issues and signs
-        res_id = f"gen_pitch_{abs(hash(clean_json)) % 1000000}"
-        
-        return PitchResponse(
-            pitch_id=res_id,
-            variants=variants,
-            strategy_explanation=data.get("strategy_explanation", "Generated based on sales best practices.")
+        response_text = await llm_client.generate(
+            messages, cache=request.cache, max_tokens=max_tokens,
+            semantic=semantic_key("pitch", request, SEMANTIC_FIELDS, PER_CALL_IGNORED), mock=False,
         )
+    except DeadlineExceeded:
+        # The variants that made it are still worth returning
+        deadline.note_skipped(f"variant:{variant_type}")
+        return None
+    except ProviderUnavailable:
+        logger.warning("Pitch %s: no LLM provider answered", variant_type)
+        return None
+    logger.debug("Pitch %s raw response: %.300s", variant_type, response_text)
+    try:
+        with stage("json_parse"):
+            data = parse_json(response_text)
+        content = data.get("content") if isinstance(data, dict) else None
+        if not isinstance(content, str) or not content.strip():
+            logger.error("Pitch %s has no content", variant_type)
+            return None
+        with stage("model_build"):
+            return _pitch_variant({**with_defaults(data, VARIANT_DEFAULTS), "variant_type": variant_type})
+    except ValueError as e:
+        logger.error("Pitch %s parsing failed: %s", variant_type, e)
+        return None
 
-    except Exception as e:
-        print(f"ERROR: Pitch parsing failed: {e}")
-        return PitchResponse(
-            pitch_id="error",
-            variants=[],
-            strategy_explanation=f"Error parsing AI response: {str(e)}"
+async def _generate_strategy(request: PitchRequest) -> str:
+    with stage("prompt_build"):
+        messages = _build_strategy_messages(request)
+    try:
+        response_text = await llm_client.generate(
+            messages, cache=request.cache, max_tokens=STRATEGY_MAX_TOKENS,
+            semantic=semantic_key("pitch", request, SEMANTIC_FIELDS, PER_CALL_IGNORED), mock=False,
         )
+    except DeadlineExceeded:
+        deadline.note_skipped("strategy")
+        return ""
+    except ProviderUnavailable:
+        return STRATEGY_DEFAULT
+    try:
+        with stage("json_parse"):
+            data = parse_json(response_text)
+        strategy = data.get("strategy_explanation") if isinstance(data, dict) else None
+    except ValueError as e:
+        logger.error("Pitch strategy parsing failed: %s", e)
+        strategy = None
+    return strategy if isinstance(strategy, str) and strategy else STRATEGY_DEFAULT
+
+def _start_calls(request: PitchRequest) -> Dict[asyncio.Future, Optional[str]]:
+    """Concurrent calls for a pitch: one per requested variant, keyed by type, plus the strategy (None)."""
+    calls: Dict[asyncio.Future, Optional[str]] = {
+        asyncio.ensure_future(_generate_variant(request, kind)): kind for kind in _requested_variants(request)
+    }
+    if request.strategy:
+        calls[asyncio.ensure_future(_generate_strategy(request))] = None
+    return calls
+
+async def _generate_pitch(request: PitchRequest) -> PitchResponse:
+    # Check for mock mode first (if API key is missing, LLMClient handles it, but we need specific mock data for Pitch)
+    if not llm_client.api_key:
+        return _mock_pitch(request)
+
+    calls = _start_calls(request)
+    try:
+        # A cache "only" miss on any part fails the whole pitch
+        results = await asyncio.gather(*calls)
+    finally:
+        for task in calls:
+            task.cancel()
 
+    parts = dict(zip(calls.values(), results))
+    variants = [parts[kind] for kind in _requested_variants(request) if parts[kind] is not None]
+    if not variants:
+        if deadline.expired():
+            raise DeadlineExceeded(deadline.skipped())
+        # Nothing usable from the providers: demo output, which is not saved
+        logger.warning("No usable pitch variant; returning the demo pitch")
+        return _mock_pitch(request)
+    response = PitchResponse(pitch_id=new_id("gen_pitch"), variants=variants, strategy_explanation=parts.get(None, ""),
+                             skipped_stages=deadline.skipped())
+    await generations.save([generations.row("pitch", response.pitch_id, request, response, product=request.product_name, persona=request.persona)])
+    return response
+
+async def stream_pitch(request: PitchRequest) -> AsyncIterator[str]:
+    """
+    Server-sent events version of generate_pitch: one "variant" event per PitchVariant
+    as soon as its call finishes (fastest first), then a "done" event with the strategy
+    and the stages skipped to meet the request deadline. The pitch is saved under the
+    "done" pitch_id, with its variants in the order they were sent.
+    """
+    if not llm_client.api_key:
+        mock = _mock_pitch(request)
+        for variant in mock.variants:
+            yield sse_event("variant", variant)
+        yield sse_event("done", {"pitch_id": mock.pitch_id, "variants": len(mock.variants), "strategy_explanation": mock.strategy_explanation})
+        return
+
+    calls: Dict[asyncio.Future, Optional[str]] = {}
+    variants: List[PitchVariant] = []
+    strategy = ""
+    try:
+        with request_deadline(request.timeout):
+            calls = _start_calls(request)
+            pending = set(calls)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    result = task.result()
+                    if calls[task] is None:
+                        strategy = result
+                    elif result is not None:
+                        yield sse_event("variant", result)
+                        variants.append(result)
+
+            if not variants and deadline.expired():
+                raise DeadlineExceeded(deadline.skipped())
+            if not variants:
+                mock = _mock_pitch(request)
+                for variant in mock.variants:
+                    yield sse_event("variant", variant)
+                yield sse_event("done", {"pitch_id": mock.pitch_id, "variants": len(mock.variants), "strategy_explanation": mock.strategy_explanation})
+                return
+            response = PitchResponse(pitch_id=new_id("gen_pitch"), variants=variants, strategy_explanation=strategy,
+                                     skipped_stages=deadline.skipped())
+            await generations.save([generations.row("pitch", response.pitch_id, request, response, product=request.product_name, persona=request.persona)])
+            yield sse_event("done", {
+                "pitch_id": response.pitch_id,
+                "variants": len(variants),
+                "strategy_explanation": strategy,
+                "skipped_stages": response.skipped_stages
+            })
+    except CacheMissError as e:
+        yield sse_event("error", {"status": 404, "detail": str(e)})
+    except DeadlineExceeded as e:
+        yield sse_event("error", {"status": 504, "detail": e.detail})
+    except Overloaded as e:
+        yield sse_event("error", {"status": 503, "detail": e.detail, "retry_after": e.retry_after})
+    except Exception as e:
+        logger.error("Pitch stream failed: %s", e)
+        yield sse_event("error", {"status": 500, "detail": str(e)})
+    finally:
+        for task in calls:
+            task.cancel()
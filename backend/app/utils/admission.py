@@ -0,0 +1,211 @@
+import math
+import time
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+from fastapi import HTTPException
+from app.utils.config import env_bool, env_float, env_int
+from app.utils.metrics import registry
+from app.utils.log import get_logger
+
+logger = get_logger("admission")
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "marketmind_admission_wait_seconds",
+    "Time LLM calls waited for an admission slot, by lane.",
+    ["lane"],
+)
+ADMISSION_TOTAL = registry.counter(
+    "marketmind_admission_total",
+    "LLM calls by lane and admission outcome: admitted, shed (queue full) or timeout (waited too long).",
+    ["lane", "outcome"],
+)
+ADMISSION_INFLIGHT = registry.gauge(
+    "marketmind_admission_inflight",
+    "LLM calls holding an admission slot, by lane (per worker).",
+    ["lane"],
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "marketmind_admission_queue_depth",
+    "LLM calls waiting for an admission slot, by lane (per worker).",
+    ["lane"],
+)
+
+
+class Overloaded(HTTPException):
+    """Shed by admission control: a 503 with Retry-After. Routers let it through as is."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail=f"Server is busy ({lane} lane); retry in {retry_after}s",
+            headers={"Retry-After": str(retry_after)},
+        )
+        self.retry_after = retry_after
+
+
+# (lane, shed) for LLM calls made in the current context
+_lane: ContextVar[Tuple[str, bool]] = ContextVar("marketmind_admission_lane", default=(INTERACTIVE, True))
+
+
+@contextmanager
+def admission_lane(lane: str, shed: bool = True) -> Iterator[None]:
+    """
+    LLM calls made inside (including tasks started inside) use this lane. With
+    shed=False they wait for a slot however long the queue is: for work that is
+    already queued elsewhere (campaign jobs, streaming imports) and has nobody to
+    send a 503 to.
+    """
+    token = _lane.set((lane, shed))
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+class AdmissionController:
+    """
+    Bounds the LLM calls in flight in this worker (ADMISSION_MAX_INFLIGHT). Calls over
+    the limit queue in one of two lanes: interactive (single lead scores, pitches) is
+    always served before bulk (campaigns, batch scoring), and bulk may hold at most
+    ADMISSION_BULK_MAX_INFLIGHT slots so interactive calls always find headroom.
+    A call that finds its lane's queue full, or waits longer than ADMISSION_MAX_WAIT,
+    is shed with Overloaded (503 + Retry-After sized from the queue and recent call times).
+    """
+
+    def __init__(self):
+        self.enabled = env_bool("ADMISSION_CONTROL", True)
+        self.max_inflight = max(1, env_int("ADMISSION_MAX_INFLIGHT", 32))
+        self.bulk_max_inflight = max(1, min(self.max_inflight, env_int("ADMISSION_BULK_MAX_INFLIGHT", self.max_inflight * 3 // 4)))
+        self.max_queue = {
+            INTERACTIVE: env_int("ADMISSION_MAX_QUEUE", 128),
+            BULK: env_int("ADMISSION_BULK_MAX_QUEUE", 64),
+        }
+        self.max_wait = env_float("ADMISSION_MAX_WAIT", 15.0)
+        self.inflight = {lane: 0 for lane in LANES}
+        self._queues: Dict[str, Deque[asyncio.Future]] = {lane: deque() for lane in LANES}
+        # Moving average of how long a call holds its slot, for Retry-After
+        self.avg_hold = 1.0
+        self.outcomes = {lane: {"admitted": 0, "waited": 0, "shed": 0, "timeout": 0} for lane in LANES}
+        self._publish()
+
+    def _has_room(self, lane: str) -> bool:
+        if sum(self.inflight.values()) >= self.max_inflight:
+            return False
+        return lane == INTERACTIVE or self.inflight[BULK] < self.bulk_max_inflight
+
+    def _waiting(self, lane: str) -> int:
+        return sum(1 for w in self._queues[lane] if not w.done())
+
+    def _publish(self):
+        for lane in LANES:
+            ADMISSION_INFLIGHT.set(self.inflight[lane], lane=lane)
+            ADMISSION_QUEUE_DEPTH.set(self._waiting(lane), lane=lane)
+
+    def retry_after(self, lane: str) -> int:
+        """Seconds until a call joining this lane's queue now would likely get a slot."""
+        ahead = self._waiting(INTERACTIVE) + (self._waiting(BULK) if lane == BULK else 0)
+        slots = self.max_inflight if lane == INTERACTIVE else self.bulk_max_inflight
+        return int(min(60, max(1, math.ceil(self.avg_hold * (ahead + 1) / slots))))
+
+    def _dispatch(self):
+        # Interactive first; bulk only while it is under its own cap
+        for lane in LANES:
+            queue = self._queues[lane]
+            while queue and self._has_room(lane):
+                waiter = queue.popleft()
+                if waiter.done():
+                    continue
+                self.inflight[lane] += 1
+                waiter.set_result(None)
+
+    def _shed(self, lane: str, outcome: str) -> Overloaded:
+        self.outcomes[lane][outcome] += 1
+        ADMISSION_TOTAL.inc(lane=lane, outcome=outcome)
+        error = Overloaded(lane, self.retry_after(lane))
+        logger.info("Shedding %s LLM call (%s): %d in flight, %d queued", lane, outcome, sum(self.inflight.values()), self._waiting(lane))
+        return error
+
+    async def _acquire(self, lane: str, shed: bool):
+        queue = self._queues[lane]
+        if self._has_room(lane) and not self._waiting(lane):
+            self.inflight[lane] += 1
+            return
+        if shed and self._waiting(lane) >= self.max_queue[lane]:
+            raise self._shed(lane, "shed")
+
+        waiter = asyncio.get_running_loop().create_future()
+        queue.append(waiter)
+        self.outcomes[lane]["waited"] += 1
+        self._publish()
+        try:
+            if shed and self.max_wait > 0:
+                await asyncio.wait_for(waiter, self.max_wait)
+            else:
+                await waiter
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # Granted just as the caller gave up: hand the slot on
+                self._release(lane)
+            else:
+                waiter.cancel()
+            try:
+                queue.remove(waiter)
+            except ValueError:
+                pass
+            self._publish()
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed(lane, "timeout") from None
+            raise
+
+    def _release(self, lane: str):
+        self.inflight[lane] -= 1
+        self._dispatch()
+        self._publish()
+
+    @asynccontextmanager
+    async def slot(self, lane: Optional[str] = None) -> AsyncIterator[None]:
+        """
+        Holds one admission slot for an LLM call. The lane defaults to the one set with
+        admission_lane(); raises Overloaded when the call is shed.
+        """
+        if not self.enabled:
+            yield
+            return
+        current, shed = _lane.get()
+        lane = lane or current
+        started = time.monotonic()
+        await self._acquire(lane, shed)
+        admitted = time.monotonic()
+        self.outcomes[lane]["admitted"] += 1
+        ADMISSION_TOTAL.inc(lane=lane, outcome="admitted")
+        ADMISSION_WAIT_SECONDS.observe(admitted - started, lane=lane)
+        self._publish()
+        try:
+            yield
+        finally:
+            self.avg_hold = 0.9 * self.avg_hold + 0.1 * (time.monotonic() - admitted)
+            self._release(lane)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "max_inflight": self.max_inflight,
+            "bulk_max_inflight": self.bulk_max_inflight,
+            "max_queue": dict(self.max_queue),
+            "max_wait": self.max_wait,
+            "avg_hold_seconds": round(self.avg_hold, 3),
+            "lanes": {
+                lane: {"inflight": self.inflight[lane], "queued": self._waiting(lane), **self.outcomes[lane]}
+                for lane in LANES
+            },
+        }
+
+
+admission = AdmissionController()
@@ -0,0 +1,187 @@
+import math
+import time
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, List, Optional, TypeVar
+from fastapi import HTTPException
+from app.utils.config import env_float
+from app.utils.metrics import registry
+from app.utils.log import get_logger
+
+logger = get_logger("deadline")
+
+T = TypeVar("T")
+
+# Seconds a request may take when the client sets no deadline, and the most it may ask for
+REQUEST_TIMEOUT = env_float("REQUEST_TIMEOUT", 60.0)
+REQUEST_TIMEOUT_MAX = env_float("REQUEST_TIMEOUT_MAX", 300.0)
+TIMEOUT_HEADER = "x-request-timeout"
+# Coalesced requests must have deadlines in the same slot of this many seconds
+COALESCE_SLOT = 0.5
+
+DEADLINE_SKIPS = registry.counter(
+    "marketmind_deadline_skips_total",
+    "Stages skipped or cut short because the request deadline would pass: fallback models, whole LLM calls, pitch variants and strategy, campaign media.",
+    ["stage"],
+)
+
+
+class DeadlineExceeded(HTTPException):
+    """The request deadline passed before an answer was ready: a 504. Routers let it through as is."""
+
+    def __init__(self, skipped: List[str]):
+        detail = "Request deadline exceeded"
+        if skipped:
+            detail += f" (skipped: {', '.join(skipped)})"
+        super().__init__(status_code=504, detail=detail)
+        self.skipped = skipped
+
+
+class Deadline:
+    """A request's deadline (time.monotonic; inf for none) and the stages skipped to meet it."""
+
+    __slots__ = ("at", "skipped")
+
+    def __init__(self, at: float, skipped: Optional[List[str]] = None):
+        self.at = at
+        self.skipped = skipped if skipped is not None else []
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+
+_current: ContextVar[Optional[Deadline]] = ContextVar("marketmind_deadline", default=None)
+
+
+def _clamp(seconds: float) -> float:
+    return max(0.0, min(seconds, REQUEST_TIMEOUT_MAX))
+
+
+@contextmanager
+def _deadline(at: float) -> Iterator[Deadline]:
+    current = _current.get()
+    deadline = Deadline(at, current.skipped if current is not None else None)
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def request_deadline(timeout: Optional[float] = None, default: Optional[float] = REQUEST_TIMEOUT):
+    """
+    Deadline for the work inside (including tasks started inside). A `timeout` from the
+    request body can only tighten a deadline already set from the X-Request-Timeout
+    header; with neither, `default` applies (None: no deadline).
+    """
+    current = _current.get()
+    if timeout is not None:
+        at = time.monotonic() + _clamp(timeout)
+        if current is not None:
+            at = min(at, current.at)
+    elif current is not None:
+        at = current.at
+    else:
+        at = time.monotonic() + _clamp(default) if default is not None else math.inf
+    return _deadline(at)
+
+
+def no_deadline():
+    """
+    Work inside has no deadline unless its request sets an explicit `timeout`: for work
+    that is already queued elsewhere (campaign jobs, streaming imports) and has nobody
+    waiting on the response, like admission_lane(shed=False).
+    """
+    return _deadline(math.inf)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline, or None when there is none."""
+    deadline = _current.get()
+    if deadline is None or deadline.at == math.inf:
+        return None
+    return deadline.remaining()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def fits(expected: Optional[float]) -> bool:
+    """True if a step expected to take `expected` seconds can finish before the deadline (or either is unknown)."""
+    left = remaining()
+    return left is None or expected is None or expected <= left
+
+
+def cap(seconds: float) -> float:
+    """A timeout that also ends at the deadline."""
+    left = remaining()
+    return seconds if left is None else max(0.0, min(seconds, left))
+
+
+def coalescing_key() -> str:
+    """
+    The current deadline, for a single-flight key: a request only joins one whose deadline
+    is about the same, since the shared work runs (and skips stages) against the leader's.
+    """
+    deadline = _current.get()
+    if deadline is None or deadline.at == math.inf:
+        return "none"
+    return str(int(deadline.at // COALESCE_SLOT))
+
+
+def note_skipped(stage: str):
+    DEADLINE_SKIPS.inc(stage=stage)
+    deadline = _current.get()
+    if deadline is not None and stage not in deadline.skipped:
+        deadline.skipped.append(stage)
+    logger.debug("Skipped %s to meet the request deadline", stage)
+
+
+def skipped() -> List[str]:
+    deadline = _current.get()
+    return list(deadline.skipped) if deadline is not None else []
+
+
+async def bound(work: Awaitable[T], stage: str) -> T:
+    """Awaits `work`, cancelling it and raising DeadlineExceeded if the deadline passes first."""
+    left = remaining()
+    if left is None:
+        return await work
+    if left <= 0:
+        if asyncio.iscoroutine(work):
+            work.close()
+        note_skipped(stage)
+        raise DeadlineExceeded(skipped())
+    try:
+        return await asyncio.wait_for(work, left)
+    except asyncio.TimeoutError:
+        note_skipped(stage)
+        raise DeadlineExceeded(skipped()) from None
+
+
+class DeadlineMiddleware:
+    """
+    Pure ASGI middleware: an X-Request-Timeout header (seconds) sets the request's
+    deadline. Without one, services fall back to a `timeout` body field or REQUEST_TIMEOUT.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        header = dict(scope.get("headers") or ()).get(TIMEOUT_HEADER.encode("latin-1"))
+        try:
+            timeout = float(header) if header else None
+        except ValueError:
+            timeout = None
+        if timeout is None or timeout <= 0:
+            await self.app(scope, receive, send)
+            return
+        with request_deadline(timeout):
+            await self.app(scope, receive, send)
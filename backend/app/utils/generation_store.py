@@ -0,0 +1,202 @@
+import time
+import uuid
+import base64
+import hashlib
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+from pydantic import BaseModel
+from app.utils.config import env_bool, env_str
+from app.utils.llm_output import dumps
+from app.utils.log import get_logger
+
+logger = get_logger("generations")
+
+GENERATIONS_DB = env_str("GENERATIONS_DB", "marketmind_generations.db")
+
+# Columns a history listing can filter on; each has an index with created_at
+FILTERS = ("product", "company", "persona")
+
+
+def new_id(prefix: str) -> str:
+    """Random 128-bit id: unique across requests, processes and restarts."""
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+
+def _etag(*parts: str) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return '"' + digest.hexdigest()[:32] + '"'
+
+
+def _encode_cursor(created_at: float, record_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at!r}|{record_id}".encode("utf-8")).decode("ascii")
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        created_at, record_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return float(created_at), record_id
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+class GenerationStore:
+    """
+    SQLite persistence for generated campaigns, pitches and lead scores, so history
+    can be reloaded without new LLM calls. The request and response are kept as JSON
+    text and served back as is, with an ETag computed at insert time; a row is only
+    rewritten (same id and created_at) when a campaign's late media resolves.
+    Listings page by (created_at, id) keyset, newest first.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, product TEXT, company TEXT, persona TEXT, "
+            "request TEXT NOT NULL, response TEXT NOT NULL, etag TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_generations_created ON generations(kind, created_at, id)")
+        for column in FILTERS:
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_generations_{column} ON generations(kind, {column}, created_at, id)"
+            )
+        self._conn.commit()
+        self.writes = 0
+        self.write_errors = 0
+
+    def insert(self, rows: Sequence[Dict[str, Any]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO generations (id, kind, product, company, persona, request, response, etag, created_at) "
+                "VALUES (:id, :kind, :product, :company, :persona, :request, :response, :etag, :created_at)",
+                rows,
+            )
+            self._conn.commit()
+
+    def get(self, kind: str, record_id: str) -> Optional[Tuple[str, str]]:
+        """(record JSON, etag) or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, created_at, request, response, etag FROM generations WHERE kind = ? AND id = ?", (kind, record_id)
+            ).fetchone()
+        return (self._record_json(row), row[4]) if row else None
+
+    def page(self, kind: str, limit: int, cursor: Optional[str] = None, **filters: Optional[str]) -> Tuple[str, str]:
+        """
+        One page of records as JSON ({"items": [...], "next_cursor": ...}) and its ETag.
+        Raises ValueError for an unknown filter or a malformed cursor.
+        """
+        query = "SELECT id, created_at, request, response, etag FROM generations WHERE kind = ?"
+        params: List[Any] = [kind]
+        for column, value in filters.items():
+            if column not in FILTERS:
+                raise ValueError(f"Unknown filter: {column}")
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        if cursor:
+            query += " AND (created_at, id) < (?, ?)"
+            params.extend(_decode_cursor(cursor))
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit + 1)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+
+        next_cursor = _encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+        rows = rows[:limit]
+        body = '{"items":[' + ",".join(self._record_json(r) for r in rows) + '],"next_cursor":' + dumps(next_cursor) + "}"
+        return body, _etag(*(r[4] for r in rows), next_cursor or "")
+
+    def count(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, COUNT(*) FROM generations GROUP BY kind").fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def _record_json(row: Tuple[Any, ...]) -> str:
+        # Stored JSON is spliced in rather than parsed and re-serialized
+        record_id, created_at, request, response, _ = row
+        return f'{{"id":{dumps(record_id)},"created_at":{created_at!r},"request":{request},"response":{response}}}'
+
+
+class Generations:
+    """App-facing wrapper: no-op when GENERATION_STORE is off, and SQLite calls run in a thread."""
+
+    def __init__(self):
+        self.store: Optional[GenerationStore] = None
+        self._tasks: Set[asyncio.Task] = set()
+        if env_bool("GENERATION_STORE", True) and GENERATIONS_DB:
+            try:
+                self.store = GenerationStore(GENERATIONS_DB)
+            except Exception as e:
+                logger.warning("Generation store disabled: %s", e)
+
+    @staticmethod
+    def row(kind: str, record_id: str, request: BaseModel, response: BaseModel, created_at: Optional[float] = None,
+            **columns: Optional[str]) -> Dict[str, Any]:
+        request_json = request.model_dump_json(exclude={"cache", "timeout"})
+        response_json = response.model_dump_json()
+        return {
+            "id": record_id,
+            "kind": kind,
+            "product": columns.get("product"),
+            "company": columns.get("company"),
+            "persona": columns.get("persona"),
+            "request": request_json,
+            "response": response_json,
+            # From the stored content, so a rewritten record (late campaign media) gets a new ETag
+            "etag": _etag(record_id, response_json),
+            "created_at": created_at if created_at is not None else time.time(),
+        }
+
+    async def save(self, rows: Sequence[Dict[str, Any]]):
+        """Persists generations; a failed write is logged, never surfaced to the caller."""
+        if self.store is None or not rows:
+            return
+        try:
+            await asyncio.to_thread(self.store.insert, rows)
+            self.store.writes += len(rows)
+        except Exception as e:
+            self.store.write_errors += 1
+            logger.warning("Saving %d generations failed: %s", len(rows), e)
+
+    def save_later(self, rows: Sequence[Dict[str, Any]]):
+        """save() from synchronous code such as a done callback; the task is kept until it finishes."""
+        if self.store is None or not rows:
+            return
+        task = asyncio.ensure_future(self.save(rows))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get(self, kind: str, record_id: str) -> Optional[Tuple[str, str]]:
+        if self.store is None:
+            return None
+        return await asyncio.to_thread(self.store.get, kind, record_id)
+
+    async def page(self, kind: str, limit: int, cursor: Optional[str] = None, **filters: Optional[str]) -> Tuple[str, str]:
+        if self.store is None:
+            return '{"items":[],"next_cursor":null}', _etag("")
+        return await asyncio.to_thread(self.store.page, kind, limit, cursor, **filters)
+
+    def stats(self) -> Dict[str, Any]:
+        if self.store is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "path": self.store.path,
+            "records": self.store.count(),
+            "writes": self.store.writes,
+            "write_errors": self.store.write_errors,
+        }
+
+
+generations = Generations()
@@ -0,0 +1,79 @@
+from collections import deque
+from typing import Dict, Any, Optional
+from app.utils.config import env_bool, env_float, env_int
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies per provider."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, provider: str, seconds: float):
+        samples = self._samples.get(provider)
+        if samples is None:
+            samples = self._samples[provider] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def count(self, provider: str) -> int:
+        return len(self._samples.get(provider, ()))
+
+    def percentile(self, provider: str, q: float) -> Optional[float]:
+        samples = self._samples.get(provider)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))
+        return ordered[index]
+
+
+class HedgePolicy:
+    """
+    Decides when to hedge and keeps the bookkeeping needed to tune it.
+
+    The hedge delay is the LLM_HEDGE_PERCENTILE (default p95) of the primary's recent
+    latencies, floored at LLM_HEDGE_MIN_DELAY. Until LLM_HEDGE_MIN_SAMPLES latencies
+    have been seen, LLM_HEDGE_DEFAULT_DELAY is used. A higher percentile hedges less
+    often (lower cost); a lower one cuts more of the tail.
+    """
+
+    def __init__(self):
+        self.enabled = env_bool("LLM_HEDGE", False)
+        self.percentile = env_float("LLM_HEDGE_PERCENTILE", 95.0)
+        self.min_delay = env_float("LLM_HEDGE_MIN_DELAY", 0.5)
+        self.default_delay = env_float("LLM_HEDGE_DEFAULT_DELAY", 3.0)
+        self.min_samples = env_int("LLM_HEDGE_MIN_SAMPLES", 20)
+        self.latencies = LatencyTracker(env_int("LLM_HEDGE_WINDOW", 200))
+        self.requests = 0
+        self.hedged = 0
+        self.primary_wins = 0
+        self.hedge_wins = 0
+        self.fallback_wins = 0
+        self.both_failed = 0
+        self.losers_cancelled = 0
+
+    def delay(self, provider: str) -> float:
+        if self.latencies.count(provider) < self.min_samples:
+            return self.default_delay
+        return max(self.min_delay, self.latencies.percentile(provider, self.percentile))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "requests": self.requests,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.requests, 4) if self.requests else 0.0,
+            "primary_wins": self.primary_wins,
+            "hedge_wins": self.hedge_wins,
+            "hedge_win_rate": round(self.hedge_wins / self.hedged, 4) if self.hedged else 0.0,
+            "fallback_wins": self.fallback_wins,
+            "both_failed": self.both_failed,
+            "losers_cancelled": self.losers_cancelled,
+            "delay": {p: round(self.delay(p), 4) for p in self.latencies._samples},
+            "samples": {p: self.latencies.count(p) for p in self.latencies._samples},
+        }
+
+
+hedge_policy = HedgePolicy()
@@ -0,0 +1,139 @@
+import httpx
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+from urllib.parse import urlsplit
+from app.utils.config import env_int, env_float, env_bool
+from app.utils.log import get_logger
+
+logger = get_logger("http_pool")
+
+# Default read timeouts (seconds) per provider, overridable with <PROVIDER>_TIMEOUT
+DEFAULT_PROVIDER_TIMEOUTS = {
+    "groq": 20.0,
+    "gemini": 30.0,
+    "media": 30.0,
+}
+
+
+class HTTPPool:
+    """
+    App-lifetime pooled httpx client shared by all provider calls.
+    Created and closed from the FastAPI lifespan in main.py, but created lazily
+    on first use too so scripts like test_client.py keep working.
+    """
+
+    def __init__(self):
+        self.max_connections = env_int("LLM_HTTP_MAX_CONNECTIONS", 100)
+        self.max_keepalive = env_int("LLM_HTTP_MAX_KEEPALIVE", 20)
+        self.keepalive_expiry = env_float("LLM_HTTP_KEEPALIVE_EXPIRY", 30.0)
+        self.connect_timeout = env_float("LLM_HTTP_CONNECT_TIMEOUT", 5.0)
+        self.pool_timeout = env_float("LLM_HTTP_POOL_TIMEOUT", 10.0)
+        self.http2 = env_bool("LLM_HTTP2", False)
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Usage counters
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waits = 0
+        self.requests = 0
+        self.errors = 0
+
+    def timeout_for(self, provider: str) -> httpx.Timeout:
+        read = env_float(f"{provider.upper()}_TIMEOUT", DEFAULT_PROVIDER_TIMEOUTS.get(provider, 20.0))
+        return httpx.Timeout(read, connect=self.connect_timeout, pool=self.pool_timeout)
+
+    def _create_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("LLM_HTTP2 requested but 'h2' is not installed, using HTTP/1.1")
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        logger.debug("HTTP pool started (max=%d, keepalive=%d, http2=%s)", self.max_connections, self.max_keepalive, http2)
+        return httpx.AsyncClient(limits=limits, http2=http2, timeout=self.timeout_for("groq"))
+
+    async def start(self):
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+
+    @asynccontextmanager
+    async def track(self):
+        """Counts a request against the pool usage stats while it is in flight."""
+        self.requests += 1
+        if self.in_use >= self.max_connections:
+            self.waits += 1
+        self.in_use += 1
+        self.peak_in_use = max(self.peak_in_use, self.in_use)
+        try:
+            yield self.client
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_use -= 1
+
+    async def post(self, url: str, provider: str, **kwargs) -> httpx.Response:
+        kwargs.setdefault("timeout", self.timeout_for(provider))
+        async with self.track() as client:
+            return await client.post(url, **kwargs)
+
+    async def warm(self, urls: List[str], timeout: float = 3.0):
+        """
+        Opens a keep-alive connection to each URL's origin (DNS, TCP and TLS done before the
+        first real request). Any response counts; failures are logged and ignored.
+        """
+        origins = {f"{u.scheme}://{u.netloc}/" for u in map(urlsplit, urls) if u.scheme and u.netloc}
+
+        async def _head(origin: str):
+            try:
+                await self.client.head(origin, timeout=timeout)
+            except Exception as e:
+                logger.debug("Warm-up of %s failed: %s", origin, e)
+
+        await asyncio.gather(*(_head(o) for o in origins))
+
+    def _connection_counts(self) -> Dict[str, int]:
+        # httpx does not expose pool state publicly; read httpcore's pool if available
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for c in connections if getattr(c, "is_idle", lambda: False)())
+        return {"open": len(connections), "idle": idle, "active": len(connections) - idle}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "started": self._client is not None and not self._client.is_closed,
+            "http2": self.http2,
+            "limits": {
+                "max_connections": self.max_connections,
+                "max_keepalive_connections": self.max_keepalive,
+                "keepalive_expiry": self.keepalive_expiry,
+            },
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "waits": self.waits,
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections": self._connection_counts(),
+        }
+
+
+http_pool = HTTPPool()
@@ -0,0 +1,293 @@
+import time
+import json
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from app.utils.config import env_str
+from app.utils.shared_state import WORKERS
+from app.utils.log import get_logger
+
+logger = get_logger("jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL = (SUCCEEDED, FAILED, CANCELLED)
+
+JOBS_DB = env_str("JOBS_DB", "marketmind_jobs.db")
+# With several workers a job may finish, or be cancelled, in another process; long-polls and
+# running jobs re-check the store this often
+WAIT_POLL_INTERVAL = 0.5
+
+
+class JobStore:
+    """
+    SQLite persistence for jobs so queued work and results survive a restart. Calls are
+    blocking; JobQueue runs them in a thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, status TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "payload TEXT NOT NULL, result TEXT, error TEXT, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs(kind, status, priority, created_at)")
+        self._conn.commit()
+
+    def insert(self, job: Dict[str, Any]):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, priority, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job["id"], job["kind"], job["status"], job["priority"], json.dumps(job["payload"]), job["created_at"]),
+            )
+            self._conn.commit()
+
+    def update(self, job_id: str, only_if: Optional[str] = None, **fields) -> bool:
+        """Updates a job, optionally only while it is in status `only_if`; returns whether it did."""
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        columns = ", ".join(f"{k} = ?" for k in fields)
+        query = f"UPDATE jobs SET {columns} WHERE id = ?"
+        params = [*fields.values(), job_id]
+        if only_if is not None:
+            query += " AND status = ?"
+            params.append(only_if)
+        with self._lock:
+            updated = self._conn.execute(query, params).rowcount
+            self._conn.commit()
+        return updated > 0
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, kind: str, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM jobs WHERE kind = ?"
+        params: List[Any] = [kind]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def requeue_running(self, kind: Optional[str] = None) -> int:
+        """Puts jobs left running by a stopped process back in the queue."""
+        query = "UPDATE jobs SET status = ?, started_at = NULL WHERE status = ?"
+        params: List[Any] = [QUEUED, RUNNING]
+        if kind is not None:
+            query += " AND kind = ?"
+            params.append(kind)
+        with self._lock:
+            requeued = self._conn.execute(query, params).rowcount
+            self._conn.commit()
+        return requeued
+
+    def recover(self, kind: str, requeue_running: bool = True) -> List[Dict[str, Any]]:
+        """
+        Returns every queued job, after requeueing jobs that were running when the process
+        stopped. With several workers, running jobs may belong to a live worker, so serve.py
+        requeues them once before the workers start and they pass requeue_running=False.
+        """
+        if requeue_running:
+            self.requeue_running(kind)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE kind = ? AND status = ? ORDER BY priority DESC, created_at", (kind, QUEUED)
+            ).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+
+class JobQueue:
+    """
+    In-process worker pool over a persistent job table. Higher `priority` runs first,
+    FIFO within a priority. Jobs can be cancelled while queued or running, and
+    callers can long-poll for completion with wait(). With several workers a cancel
+    may be recorded by a process that is not running the job; the owner sees the
+    cancelled status in the store and stops it.
+    """
+
+    def __init__(self, kind: str, handler: Callable[[Dict[str, Any]], Awaitable[Any]], store: JobStore, workers: int = 2):
+        self.kind = kind
+        self.handler = handler
+        self.store = store
+        self.workers = max(1, workers)
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        # Running jobs cancelled through cancel(), so the worker can tell them from a shutdown
+        self._cancelled: set = set()
+        # One event per long-poll, removed by the waiter itself
+        self._events: Dict[str, Set[asyncio.Event]] = {}
+        self._seq = 0
+
+    def _enqueue(self, job: Dict[str, Any]):
+        self._seq += 1
+        self._queue.put_nowait((-job["priority"], self._seq, job["id"]))
+
+    async def start(self):
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        recovered = await asyncio.to_thread(self.store.recover, self.kind, WORKERS == 1)
+        for job in recovered:
+            self._enqueue(job)
+        if recovered:
+            logger.info("Recovered %d queued %s jobs", len(recovered), self.kind)
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        for task in list(self._running.values()) + self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        self._running.clear()
+
+    async def submit(self, payload: Dict[str, Any], priority: int = 5) -> Dict[str, Any]:
+        if self._queue is None:
+            await self.start()
+        job = {
+            "id": f"job_{uuid.uuid4().hex}",
+            "kind": self.kind,
+            "status": QUEUED,
+            "priority": priority,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        await asyncio.to_thread(self.store.insert, job)
+        self._enqueue(job)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        return job if job and job["kind"] == self.kind else None
+
+    async def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.list, self.kind, status, limit)
+
+    async def wait(self, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Long-poll: returns once the job is finished or `timeout` seconds have passed."""
+        job = await self.get(job_id)
+        if job is None or job["status"] in TERMINAL or timeout <= 0:
+            return job
+        event = asyncio.Event()
+        self._events.setdefault(job_id, set()).add(event)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    # Jobs run by another worker never set the local event, so poll the store too
+                    await asyncio.wait_for(event.wait(), timeout=remaining if WORKERS == 1 else min(remaining, WAIT_POLL_INTERVAL))
+                    break
+                except asyncio.TimeoutError:
+                    if time.monotonic() >= deadline:
+                        break
+                    job = await self.get(job_id)
+                    if job is None or job["status"] in TERMINAL:
+                        return job
+        finally:
+            # Whether the job finished here, elsewhere or not yet, nothing else will remove this event
+            waiters = self._events.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._events[job_id]
+        return await self.get(job_id)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.get(job_id)
+        if job is None or job["status"] in TERMINAL:
+            return job
+        task = self._running.get(job_id)
+        if task is not None:
+            self._cancelled.add(job_id)
+            task.cancel()
+            # Give the worker a moment to record the cancellation
+            return await self.wait(job_id, 5.0)
+        # Queued, or running in another worker, which stops it once it sees the status
+        await self._finish(job_id, CANCELLED)
+        return await self.get(job_id)
+
+    async def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None, only_if: Optional[str] = None):
+        await asyncio.to_thread(self.store.update, job_id, only_if, status=status, result=result, error=error, finished_at=time.time())
+        for event in self._events.pop(job_id, ()):
+            event.set()
+
+    async def _watch(self, job_id: str, task: asyncio.Task):
+        """Cancels a running job once another worker has marked it cancelled in the store."""
+        while not task.done():
+            await asyncio.sleep(WAIT_POLL_INTERVAL)
+            job = await self.get(job_id)
+            if job is not None and job["status"] == CANCELLED and not task.done():
+                self._cancelled.add(job_id)
+                task.cancel()
+                return
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job_id = await self._queue.get()
+            try:
+                # A cancelled queued job is no longer QUEUED in the store
+                job = await self.get(job_id)
+                if job is None or job["status"] != QUEUED:
+                    continue
+                # Claim it; another worker that recovered the same queue may have got there first
+                if not await asyncio.to_thread(self.store.update, job_id, QUEUED, status=RUNNING, started_at=time.time()):
+                    continue
+
+                task = asyncio.create_task(self.handler(job["payload"]))
+                self._running[job_id] = task
+                watcher = asyncio.create_task(self._watch(job_id, task)) if WORKERS > 1 else None
+                try:
+                    result = await task
+                    # A cancel handled by another worker has already marked the job; keep that
+                    await self._finish(job_id, SUCCEEDED, result=result, only_if=RUNNING)
+                except asyncio.CancelledError:
+                    if job_id not in self._cancelled:
+                        # The worker itself is shutting down: leave the job to be recovered on restart
+                        raise
+                    await self._finish(job_id, CANCELLED)
+                except Exception as e:
+                    logger.error("%s job %s failed: %s", self.kind, job_id, e)
+                    await self._finish(job_id, FAILED, error=str(e), only_if=RUNNING)
+                finally:
+                    if watcher is not None:
+                        watcher.cancel()
+                    self._running.pop(job_id, None)
+                    self._cancelled.discard(job_id)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+        }
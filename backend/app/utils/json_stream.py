@@ -0,0 +1,116 @@
+import json
+from typing import Any, List, Optional, Set, Tuple
+from app.utils.llm_output import parse_json
+
+
+class IncrementalJSONParser:
+    """
+    Single-pass scanner for a JSON object arriving in token chunks.
+
+    feed() returns every element of the watched top-level arrays (e.g.
+    "generated_content" or "variants") as soon as that element closes in the
+    stream, so callers can act on it before the rest of the document exists.
+    Anything before the first '{' (markdown fences, chatter) is skipped.
+    """
+
+    def __init__(self, array_keys: Set[str]):
+        self.array_keys = set(array_keys)
+        self.buffer = ""
+        self._pos = 0
+        self._root_start = -1
+        self._root_end = -1
+        self._in_string = False
+        self._escape = False
+        self._stack: List[Tuple[str, Optional[str]]] = []  # (container char, key it belongs to)
+        self._string_start = -1
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._element_start = -1
+
+    @property
+    def complete(self) -> bool:
+        return self._root_end >= 0
+
+    def _in_watched_array(self) -> bool:
+        return (
+            len(self._stack) == 2
+            and self._stack[1][0] == "["
+            and self._stack[1][1] in self.array_keys
+        )
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """Consumes a chunk and returns (array_key, element) for each element that closed in it."""
+        self.buffer += chunk
+        emitted: List[Tuple[str, Any]] = []
+        buf = self.buffer
+        i = self._pos
+        n = len(buf)
+
+        while i < n and self._root_end < 0:
+            c = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    depth = len(self._stack)
+                    if depth == 1:
+                        # Possibly a key of the root object
+                        try:
+                            self._last_string = json.loads(buf[self._string_start:i + 1])
+                        except ValueError:
+                            self._last_string = None
+                    elif depth == 2 and self._element_start == self._string_start and self._in_watched_array():
+                        emitted.append(self._emit(buf, i))
+                i += 1
+                continue
+
+            if self._root_start < 0:
+                if c == "{":
+                    self._root_start = i
+                    self._stack.append(("{", None))
+                i += 1
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                if len(self._stack) == 2 and self._in_watched_array():
+                    self._element_start = i
+            elif c == ":" and len(self._stack) == 1:
+                self._pending_key = self._last_string
+            elif c in "{[":
+                if len(self._stack) == 2 and self._in_watched_array():
+                    self._element_start = i
+                key = self._pending_key if len(self._stack) == 1 else None
+                self._stack.append((c, key))
+            elif c in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._root_end = i
+                elif len(self._stack) == 2 and self._element_start >= 0 and self._in_watched_array():
+                    emitted.append(self._emit(buf, i))
+            elif c == "," and len(self._stack) == 1:
+                self._pending_key = None
+            i += 1
+
+        self._pos = i
+        return [e for e in emitted if e is not None]
+
+    def _emit(self, buf: str, end: int) -> Optional[Tuple[str, Any]]:
+        start, self._element_start = self._element_start, -1
+        try:
+            return self._stack[1][1], json.loads(buf[start:end + 1])
+        except ValueError:
+            return None
+
+    def document(self) -> Any:
+        """Parses the whole root object once the stream has ended."""
+        if self._root_start < 0:
+            raise ValueError("No JSON object found in stream")
+        # Tolerates a stream that was cut off mid-document (repaired like a complete response)
+        return parse_json(self.buffer[self._root_start:])
@@ -1,12 +1,74 @@
 import os
+import re
+import time
+import asyncio
+import threading
 import httpx
 import json
-from typing import List, Dict, Any
-from dotenv import load_dotenv
+from typing import List, Dict, Any, Optional, AsyncIterator, Tuple
+from app.utils.http_pool import http_pool
+from app.utils.model_health import model_health
+from app.utils.rate_limiter import rate_limiters, parse_retry_after, RateLimited
+from app.utils.response_cache import response_cache, cache_key, CacheMissError, CACHE_BYPASS, CACHE_ONLY
+from app.utils.metrics import PROVIDER_CALL_SECONDS, record_stage, note_llm_result, note_tokens
+from app.utils.admission import admission
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+from app.utils.tokens import TokenUsage, add_usage, collect_usage
+from app.utils.hedging import hedge_policy
+from app.utils.llm_output import is_json
+from app.utils.model_catalog import model_catalog
+from app.utils.semantic_cache import semantic_cache
+from app.utils.log import get_logger
 
-# Ensure environment variables are loaded immediately
-load_dotenv()
-print(f"DEBUG: Loaded env keys: {[k for k in os.environ.keys() if 'API_KEY' in k]}")
+logger = get_logger("llm")
+logger.debug("Loaded env keys: %s", [k for k in os.environ.keys() if 'API_KEY' in k])
+
+# Configured fallback order; models the cached catalog does not list are skipped (see model_catalog)
+GEMINI_MODELS = [m.strip() for m in os.getenv("GEMINI_MODELS", "gemini-2.0-flash,gemini-1.5-flash,gemini-2.5-flash").split(",") if m.strip()]
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
+
+# Gemini reports quota errors as text, sometimes with a suggested delay
+_GEMINI_RETRY = re.compile(r"(?:retry_delay\s*\{\s*seconds:\s*|retry in\s*)(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+class ProviderUnavailable(Exception):
+    """Raised by generate(mock=False) when no provider answered and only demo output is left."""
+
+
+def _is_throttle(error: Exception) -> bool:
+    return getattr(error, "code", None) == 429 or "429" in str(error) or "quota" in str(error).lower()
+
+
+def _gemini_retry_after(error: Exception) -> float:
+    match = _GEMINI_RETRY.search(str(error))
+    return float(match.group(1)) if match else 5.0
+
+
+def _observe_call(provider: str, model: str, outcome: str, started: float):
+    elapsed = time.perf_counter() - started
+    PROVIDER_CALL_SECONDS.observe(elapsed, provider=provider, model=model, outcome=outcome)
+    record_stage("provider_call", elapsed)
+
+
+def _provider_timeout(provider: str) -> httpx.Timeout:
+    """The provider's HTTP timeout, cut short to end at the request deadline."""
+    timeout = http_pool.timeout_for(provider)
+    if deadline.remaining() is None:
+        return timeout
+    return httpx.Timeout(deadline.cap(timeout.read), connect=deadline.cap(timeout.connect), pool=deadline.cap(timeout.pool))
+
+
+def _out_of_time(provider: str, model: str) -> bool:
+    """
+    True (and noted as a skipped stage) when the model's last call took longer than
+    the time left before the request deadline. Only fallbacks are skipped this way:
+    the first model tried always gets its chance.
+    """
+    if deadline.fits(model_health.breaker(model).last_latency):
+        return False
+    deadline.note_skipped(f"{provider}:{model}")
+    return True
 
 class LLMClient:
     def __init__(self, provider: str = "gemini"):
@@ -18,106 +80,567 @@ class LLMClient:
             self.api_key = None
 
             
-        print(f"LLMClient initialized with provider: {provider}. API Key loaded: {'Yes' if self.api_key else 'No'}")
+        logger.info("LLMClient initialized with provider: %s. API Key loaded: %s", provider, 'Yes' if self.api_key else 'No')
         
         # Default to Groq for now
-        self.base_url = "https://api.groq.com/openai/v1/chat/completions"
+        self.base_url = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1/chat/completions")
 
-    async def generate(self, messages: List[Dict[str, str]], model: str = "", temperature: float = 0.7) -> str:
+        # Provider SDK state, configured once by setup()
+        self._genai = None
+        self._genai_failed = False
+        self._gemini_models: Dict[str, Any] = {}
+        self._setup_lock = threading.Lock()
+        self._setup_task: Optional[asyncio.Future] = None
 
-        # Check for Gemini first if key exists
-        gemini_key = os.getenv("GEMINI_API_KEY")
-        groq_key = os.getenv("GROQ_API_KEY")
-        
+    def setup(self):
+        """
+        Configures the Gemini SDK once (blocking: importing google.generativeai takes
+        about a second). Async code goes through ensure_setup() instead.
+        """
+        with self._setup_lock:
+            if self._genai is not None or self._genai_failed:
+                return
+            gemini_key = os.getenv("GEMINI_API_KEY")
+            if not gemini_key:
+                return
+            try:
+                import google.generativeai as genai
+                genai.configure(api_key=gemini_key)
+                self._genai = genai
+            except Exception as e:
+                self._genai_failed = True
+                logger.warning("Gemini setup failed: %s", e)
+
+    async def ensure_setup(self):
+        """
+        Runs setup() in a worker thread so the SDK import never blocks the event loop.
+        The app lifespan starts it in the background; a request that arrives first
+        waits on the same setup instead of starting another.
+        """
+        if self._genai is not None or self._genai_failed or not os.getenv("GEMINI_API_KEY"):
+            return
+        if self._setup_task is None:
+            self._setup_task = asyncio.ensure_future(asyncio.to_thread(self.setup))
+        await asyncio.shield(self._setup_task)
+
+    async def warm_up(self):
+        """
+        Startup warm-up: SDK setup, the cached model catalog (refreshed in the background
+        when stale), Gemini model objects, and pooled connections to the Groq API.
+        """
+        model_catalog.load()
+        await self.ensure_setup()
+        if self._genai is not None:
+            if model_catalog.stale:
+                model_catalog.refresh_in_background(self._genai)
+            for name in model_catalog.filter(GEMINI_MODELS):
+                self._gemini_model(name)
+        if rate_limiters["groq"].keys:
+            await http_pool.warm([self.base_url])
+
+    def _gemini_model(self, name: str):
+        if name not in self._gemini_models:
+            self._gemini_models[name] = self._genai.GenerativeModel(name)
+        return self._gemini_models[name]
+
+    async def _try_gemini(self, messages: List[Dict[str, str]], max_tokens: Optional[int] = None) -> Optional[str]:
+        await self.ensure_setup()
+        if self._genai is None:
+            return None
+
+        system_instruction = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_message = next((m["content"] for m in messages if m["role"] == "user"), "")
+        full_prompt = f"System: {system_instruction}\n\nUser: {user_message}\n\nJSON Output:"
+
+        # Open breakers are skipped outright; last known good model goes first
+        limiter = rate_limiters["gemini"]
+        attempted = False
+        for m_name in model_health.candidates("gemini", model_catalog.filter(GEMINI_MODELS)):
+            if attempted and _out_of_time("gemini", m_name):
+                continue
+            if not model_health.allow(m_name):
+                continue
+            attempted = True
+            try:
+                lease = await limiter.acquire()
+            except RateLimited as e:
+                # Gemini quota is exhausted for now; let Groq take the request
+                model_health.release(m_name)
+                logger.info("%s", e)
+                return None
+            started = time.perf_counter()
+            try:
+                logger.debug("Attempting Gemini %s", m_name)
+                # Use JSON mode if available
+                generation_config = {"response_mime_type": "application/json"}
+                if max_tokens:
+                    generation_config["max_output_tokens"] = max_tokens
+                response = await self._gemini_model(m_name).generate_content_async(
+                    full_prompt,
+                    generation_config=generation_config,
+                    request_options={"timeout": _provider_timeout("gemini").read},
+                )
+                text = response.text
+                metadata = getattr(response, "usage_metadata", None)
+                add_usage("gemini", getattr(metadata, "prompt_token_count", None),
+                          getattr(metadata, "candidates_token_count", None), messages, text)
+                lease.success()
+                model_health.record_success("gemini", m_name, time.perf_counter() - started)
+                _observe_call("gemini", m_name, "ok", started)
+                return text
+            except asyncio.CancelledError:
+                lease.failed()
+                model_health.release(m_name)
+                raise
+            except Exception as e:
+                if _is_throttle(e):
+                    # Throttling is not a model fault: back off without tripping the breaker
+                    lease.throttled(_gemini_retry_after(e))
+                    model_health.release(m_name)
+                    _observe_call("gemini", m_name, "throttled", started)
+                else:
+                    lease.failed()
+                    model_health.record_failure("gemini", m_name, str(e))
+                    _observe_call("gemini", m_name, "error", started)
+                logger.warning("Gemini %s failed: %s", m_name, e)
+                continue
+        return None
+
+    def _groq_headers(self, api_key: str) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+
+    async def _try_groq(self, messages: List[Dict[str, str]], temperature: float, max_tokens: Optional[int] = None,
+                        fallback: bool = False) -> Optional[str]:
+        limiter = rate_limiters["groq"]
+        if not limiter.keys or not model_health.candidates("groq", [GROQ_MODEL]):
+            return None
+        if fallback and _out_of_time("groq", GROQ_MODEL):
+            return None
+        if not model_health.allow(GROQ_MODEL):
+            return None
+
+        started = time.perf_counter()
+        try:
+            data = {
+                "model": GROQ_MODEL,
+                "messages": messages,
+                "temperature": temperature
+            }
+            if max_tokens:
+                data["max_tokens"] = max_tokens
+            # A 429 moves on to the key with the most quota left (or waits out Retry-After)
+            for _ in range(len(limiter.keys) + 1):
+                lease = await limiter.acquire()
+                try:
+                    response = await http_pool.post(self.base_url, "groq", json=data, headers=self._groq_headers(lease.api_key),
+                                                    timeout=_provider_timeout("groq"))
+                except BaseException:
+                    lease.failed()
+                    raise
+                if response.status_code == 429:
+                    lease.throttled(parse_retry_after(response.headers.get("retry-after")))
+                    logger.info("Groq throttled on %s", lease.key.label)
+                    continue
+                if response.status_code == 200:
+                    lease.success(response.headers)
+                    body = response.json()
+                    raw_res = body['choices'][0]['message']['content']
+                    usage = body.get("usage") or {}
+                    add_usage("groq", usage.get("prompt_tokens"), usage.get("completion_tokens"), messages, raw_res)
+                    model_health.record_success("groq", GROQ_MODEL, time.perf_counter() - started)
+                    _observe_call("groq", GROQ_MODEL, "ok", started)
+                    logger.debug("Groq raw response: %.200s...", raw_res)
+                    return raw_res
+                lease.failed()
+                model_health.record_failure("groq", GROQ_MODEL, f"HTTP {response.status_code}")
+                _observe_call("groq", GROQ_MODEL, "error", started)
+                return None
+            model_health.release(GROQ_MODEL)
+            _observe_call("groq", GROQ_MODEL, "throttled", started)
+        except RateLimited as e:
+            model_health.release(GROQ_MODEL)
+            _observe_call("groq", GROQ_MODEL, "throttled", started)
+            logger.info("%s", e)
+        except asyncio.CancelledError:
+            model_health.release(GROQ_MODEL)
+            raise
+        except Exception as e:
+            model_health.record_failure("groq", GROQ_MODEL, str(e))
+            _observe_call("groq", GROQ_MODEL, "error", started)
+            logger.warning("Groq fallback failed: %s", e)
+        return None
+
+    async def generate(self, messages: List[Dict[str, str]], model: str = "", temperature: float = 0.7, cache: str = CACHE_BYPASS,
+                       semantic: Optional[Tuple[str, str]] = None, max_tokens: Optional[int] = None,
+                       usage: Optional[TokenUsage] = None, lane: Optional[str] = None, mock: bool = True) -> str:
+        """
+        Runs the provider cascade (Gemini models, then Groq, then mock).
+        cache: "bypass" skips the response cache, "prefer" serves a cached
+        generation when one exists, "only" never calls a provider and raises
+        CacheMissError when nothing is cached.
+        semantic: (scope, text) from semantic_key(); on an exact cache miss, a stored
+        generation for a near-duplicate request is served (when SEMANTIC_CACHE is on).
+        max_tokens: output budget passed to the provider; callers size it to the output
+        they expect, since generation time grows with the tokens produced.
+        usage: filled with the provider tokens this call spent (zero on a cache hit). A
+        caller that passes it records it with note_tokens() itself, to split it across
+        platforms; otherwise it is recorded here under platform "none".
+        lane: admission lane for the provider call (default: the admission_lane() in
+        effect, else interactive). Raises Overloaded when admission control sheds it;
+        cache hits never wait for a slot.
+        Under a request_deadline(), the wait for a slot and the provider calls are
+        cancelled when it passes (DeadlineExceeded), and fallback models that would not
+        finish in time are skipped.
+        mock: with False, raises ProviderUnavailable instead of returning demo output, for
+        callers that store or learn from the result.
+        """
+        key = None
+        cache_status = "bypass"
+        if cache != CACHE_BYPASS:
+            key = cache_key(messages, model, temperature, max_tokens)
+            cached = await response_cache.get(key)
+            if cached is not None:
+                logger.debug("LLM cache hit")
+                note_llm_result("cache", "hit")
+                return cached
+            if semantic is not None:
+                # The prompt template, model, temperature and max_tokens are part of the exact match
+                semantic = (cache_key(messages[:1], model, temperature, max_tokens) + semantic[0], semantic[1])
+                cached = semantic_cache.lookup(*semantic)
+                if cached is not None:
+                    note_llm_result("cache", "semantic")
+                    return cached
+            if cache == CACHE_ONLY:
+                note_llm_result("none", "miss")
+                raise CacheMissError("No cached generation for this request")
+            cache_status = "miss"
+
+        spent = usage if usage is not None else TokenUsage()
+        text, provider = await deadline.bound(self._generate_admitted(messages, temperature, max_tokens, spent, lane), "llm")
+        if usage is None and spent.provider != "none":
+            note_tokens(spent.provider, spent.prompt, spent.completion)
+        if text is not None:
+            if key is not None:
+                await response_cache.put(key, text)
+                if semantic is not None:
+                    semantic_cache.put(*semantic, text)
+            note_llm_result(provider, cache_status)
+            return text
+
+        if not mock:
+            note_llm_result("none", cache_status)
+            raise ProviderUnavailable("No LLM provider answered")
+        # Mock responses are never cached
+        logger.info("Using mock response")
+        note_llm_result("mock", cache_status)
+        return self._mock_response(messages)
+
+    async def _generate_admitted(self, messages: List[Dict[str, str]], temperature: float, max_tokens: Optional[int],
+                                 spent: TokenUsage, lane: Optional[str]) -> Tuple[Optional[str], str]:
+        async with admission.slot(lane):
+            with collect_usage(spent):
+                return await self._generate_uncached(messages, temperature, max_tokens)
+
+    async def _generate_uncached(self, messages: List[Dict[str, str]], temperature: float,
+                                 max_tokens: Optional[int] = None) -> Tuple[Optional[str], str]:
+        """Returns (text, provider) from the first provider that answers, or (None, "") if none did."""
+        await self.ensure_setup()
+        if hedge_policy.enabled and self._genai is not None and rate_limiters["groq"].keys:
+            return await self._generate_hedged(messages, temperature, max_tokens)
+
+        # --- TRY GEMINI ---
+        text = await self._timed("gemini", self._try_gemini(messages, max_tokens))
+        if text is not None:
+            return text, "gemini"
+
+        # --- TRY GROQ ---
+        text = await self._timed("groq", self._try_groq(messages, temperature, max_tokens, fallback=self._genai is not None))
+        return text, "groq"
+
+    async def _timed(self, provider: str, attempt) -> Optional[str]:
+        """Awaits one provider attempt and feeds its latency to the hedge policy if it answered."""
+        started = time.perf_counter()
+        text = await attempt
+        if text is not None:
+            hedge_policy.latencies.record(provider, time.perf_counter() - started)
+        return text
+
+    async def _generate_hedged(self, messages: List[Dict[str, str]], temperature: float,
+                               max_tokens: Optional[int] = None) -> Tuple[Optional[str], str]:
+        """
+        Starts Gemini and, if it has not answered within the hedge delay, races Groq
+        against it. The first valid JSON answer wins and the other call is cancelled.
+        A primary that fails or returns invalid JSON early falls through to Groq as usual.
+        Groq is not started at all when its last call took longer than the time left.
+        """
+        policy = hedge_policy
+        policy.requests += 1
+        primary = asyncio.ensure_future(self._timed("gemini", self._try_gemini(messages, max_tokens)))
+        tasks = {primary: "gemini"}
+        pending = {primary}
+        backup_started = False
+        hedged = False
+        fallback: Tuple[Optional[str], str] = (None, "")
+        try:
+            while pending:
+                timeout = None if backup_started else policy.delay("gemini")
+                done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    text = task.result()
+                    if is_json(text):
+                        provider = tasks[task]
+                        if provider == "gemini":
+                            policy.primary_wins += 1
+                        elif hedged:
+                            policy.hedge_wins += 1
+                        else:
+                            policy.fallback_wins += 1
+                        if pending:
+                            policy.losers_cancelled += len(pending)
+                            logger.debug("Hedge won by %s; cancelling the other call", provider)
+                        return text, provider
+                    if text is not None and fallback[0] is None:
+                        fallback = (text, tasks[task])
+                if not backup_started:
+                    backup_started = True
+                    if _out_of_time("groq", GROQ_MODEL):
+                        continue
+                    if not done:
+                        hedged = True
+                        policy.hedged += 1
+                        logger.debug("Gemini slower than %.2fs; hedging with Groq", policy.delay("gemini"))
+                    backup = asyncio.ensure_future(self._timed("groq", self._try_groq(messages, temperature, max_tokens)))
+                    tasks[backup] = "groq"
+                    pending.add(backup)
+        finally:
+            for task in pending:
+                task.cancel()
+        if hedged:
+            policy.both_failed += 1
+        return fallback
+
+    def _mock_response(self, messages: List[Dict[str, str]]) -> str:
         # Extract product for Dynamic Mock if AI fails
-        product_name = "Product"
+        prod = "Product"
         for m in reversed(messages):
             if "Product:" in m["content"]:
-                product_name = m["content"].split("Product:")[1].split(",")[0].strip()
+                prod = m["content"].split("Product:")[1].split(",")[0].strip()
                 break
             elif "product is" in m["content"].lower():
-                product_name = m["content"].lower().split("product is")[1].strip().split()[0]
+                prod = m["content"].lower().split("product is")[1].strip().split()[0]
                 break
 
-        # Helper for Mock (Dynamic)
-        def get_mock_response(prod):
-            import random
-            return json.dumps({
-                "strategy_explanation": f"DEMO MODE: Insights for {prod}.",
-                "generated_content": [], # Empty for generic
-                "variants": [
-                    {
-                        "variant_type": "Cold Email",
-                        "subject_line": f"Solving {prod} challenges",
-                        "content": f"Hi, I noticed you're working with {prod}. We help teams optimize this.",
-                        "xai_explanation": "Direct value prop."
-                    }
-                ],
-                "score": 85,
-                "priority": "High"
-            })
+        return json.dumps({
+            "strategy_explanation": f"DEMO MODE: Insights for {prod}.",
+            "generated_content": [], # Empty for generic
+            "variants": [
+                {
+                    "variant_type": "Cold Email",
+                    "subject_line": f"Solving {prod} challenges",
+                    "content": f"Hi, I noticed you're working with {prod}. We help teams optimize this.",
+                    "xai_explanation": "Direct value prop."
+                }
+            ],
+            "score": 85,
+            "priority": "High"
+        })
 
+    async def generate_stream(self, messages: List[Dict[str, str]], model: str = "", temperature: float = 0.7, cache: str = CACHE_BYPASS,
+                              usage: Optional[TokenUsage] = None, lane: Optional[str] = None, mock: bool = True) -> AsyncIterator[str]:
+        """
+        Streaming variant of generate(): yields text chunks as the provider produces them.
+        Falls through the cascade only while nothing has been yielded yet; a provider
+        that fails mid-stream raises, since the caller has already consumed its output.
+        Under a request_deadline(), the stream stops with DeadlineExceeded once it passes.
+        usage: as in generate(); streams do not report usage, so both sides are estimated.
+        mock: with False, raises ProviderUnavailable instead of yielding demo output.
+        """
+        key = None
+        cache_status = "bypass"
+        if cache != CACHE_BYPASS:
+            key = cache_key(messages, model, temperature)
+            cached = await response_cache.get(key)
+            if cached is not None:
+                logger.debug("LLM cache hit (stream)")
+                note_llm_result("cache", "hit")
+                yield cached
+                return
+            if cache == CACHE_ONLY:
+                note_llm_result("none", "miss")
+                raise CacheMissError("No cached generation for this request")
+            cache_status = "miss"
 
-        # --- TRY GEMINI ---
-        if gemini_key:
-            try:
-                import google.generativeai as genai
-                genai.configure(api_key=gemini_key)
-                
-                # Using the exact names from model_list.txt for maximum compatibility
-                models_to_try = ["gemini-2.0-flash", "gemini-1.5-flash", "gemini-2.5-flash"]
-                
-                for m_name in models_to_try:
-                    try:
-                        print(f"DEBUG: Attempting Gemini {m_name}")
-                        model_instance = genai.GenerativeModel(m_name)
-                        system_instruction = next((m["content"] for m in messages if m["role"] == "system"), "")
-                        user_message = next((m["content"] for m in messages if m["role"] == "user"), "")
-                        full_prompt = f"System: {system_instruction}\n\nUser: {user_message}\n\nJSON Output:"
-                        
-                        # Use JSON mode if available
-                        generation_config = {"response_mime_type": "application/json"}
-                        response = await model_instance.generate_content_async(full_prompt, generation_config=generation_config)
-                        text = response.text
-
-                        if "{" in text:
-                            return text[text.find("{"):text.rfind("}")+1]
-                        return text
-                    except Exception as e:
-                        print(f"DEBUG: Gemini {m_name} failed: {e}")
-                        continue
-            except Exception as e:
-                print(f"DEBUG: Gemini setup failed: {e}")
+        if deadline.expired():
+            deadline.note_skipped("llm")
+            raise DeadlineExceeded(deadline.skipped())
+        # The slot is held until the stream ends
+        async with admission.slot(lane):
+            streams = (("gemini", self._stream_gemini(messages)),
+                       ("groq", self._stream_groq(messages, temperature, fallback=self._genai is not None)))
+            for provider, stream in streams:
+                parts: List[str] = []
+                try:
+                    async for chunk in stream:
+                        if deadline.expired():
+                            deadline.note_skipped("llm")
+                            raise DeadlineExceeded(deadline.skipped())
+                        parts.append(chunk)
+                        yield chunk
+                finally:
+                    await stream.aclose()
+                if parts:
+                    text = "".join(parts)
+                    if key is not None:
+                        await response_cache.put(key, text)
+                    note_llm_result(provider, cache_status)
+                    spent = usage if usage is not None else TokenUsage()
+                    spent.add(provider, None, None, messages, text)
+                    if usage is None:
+                        note_tokens(provider, spent.prompt, spent.completion)
+                    return
 
-        # --- TRY GROQ ---
-        if groq_key:
+        if not mock:
+            note_llm_result("none", cache_status)
+            raise ProviderUnavailable("No LLM provider answered")
+        logger.info("Using mock response (stream)")
+        note_llm_result("mock", cache_status)
+        yield self._mock_response(messages)
+
+    async def _stream_gemini(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        await self.ensure_setup()
+        if self._genai is None:
+            return
+
+        system_instruction = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_message = next((m["content"] for m in messages if m["role"] == "user"), "")
+        full_prompt = f"System: {system_instruction}\n\nUser: {user_message}\n\nJSON Output:"
+
+        limiter = rate_limiters["gemini"]
+        attempted = False
+        for m_name in model_health.candidates("gemini", model_catalog.filter(GEMINI_MODELS)):
+            if attempted and _out_of_time("gemini", m_name):
+                continue
+            if not model_health.allow(m_name):
+                continue
+            attempted = True
             try:
-                import httpx
-                headers = {"Authorization": f"Bearer {groq_key}", "Content-Type": "application/json"}
-                data = {
-                    "model": "llama-3.1-8b-instant", 
-                    "messages": messages,
-                    "temperature": temperature
-                }
-                async with httpx.AsyncClient() as client:
-                    response = await client.post("https://api.groq.com/openai/v1/chat/completions", json=data, headers=headers, timeout=20.0)
-                    if response.status_code == 200:
-                        raw_res = response.json()['choices'][0]['message']['content']
-                        print(f"DEBUG: Groq raw response: {raw_res[:200]}...")
-                        return raw_res
+                lease = await limiter.acquire()
+            except RateLimited as e:
+                model_health.release(m_name)
+                logger.info("%s", e)
+                return
+            started = time.perf_counter()
+            yielded = False
+            try:
+                logger.debug("Streaming Gemini %s", m_name)
+                response = await self._gemini_model(m_name).generate_content_async(
+                    full_prompt,
+                    generation_config={"response_mime_type": "application/json"},
+                    request_options={"timeout": _provider_timeout("gemini").read},
+                    stream=True,
+                )
+                async for chunk in response:
+                    text = chunk.text
+                    if text:
+                        yielded = True
+                        yield text
+                lease.success()
+                model_health.record_success("gemini", m_name, time.perf_counter() - started)
+                _observe_call("gemini", m_name, "ok", started)
+                if yielded:
+                    return
+            except (asyncio.CancelledError, GeneratorExit):
+                lease.failed()
+                model_health.release(m_name)
+                raise
             except Exception as e:
-                print(f"DEBUG: Groq fallback failed: {e}")
+                if _is_throttle(e) and not yielded:
+                    lease.throttled(_gemini_retry_after(e))
+                    model_health.release(m_name)
+                    _observe_call("gemini", m_name, "throttled", started)
+                else:
+                    lease.failed()
+                    model_health.record_failure("gemini", m_name, str(e))
+                    _observe_call("gemini", m_name, "error", started)
+                logger.warning("Gemini stream %s failed: %s", m_name, e)
+                if yielded:
+                    raise
+
+    async def _stream_groq(self, messages: List[Dict[str, str]], temperature: float, fallback: bool = False) -> AsyncIterator[str]:
+        limiter = rate_limiters["groq"]
+        if not limiter.keys or not model_health.candidates("groq", [GROQ_MODEL]):
+            return
+        if fallback and _out_of_time("groq", GROQ_MODEL):
+            return
+        if not model_health.allow(GROQ_MODEL):
+            return
 
-        print("DEBUG: Using mock response")
-        return get_mock_response(product_name)
+        started = time.perf_counter()
+        yielded = False
+        lease = None
+        try:
+            data = {
+                "model": GROQ_MODEL,
+                "messages": messages,
+                "temperature": temperature,
+                "stream": True
+            }
+            for _ in range(len(limiter.keys) + 1):
+                lease = await limiter.acquire()
+                async with http_pool.track() as client:
+                    async with client.stream("POST", self.base_url, json=data, headers=self._groq_headers(lease.api_key), timeout=_provider_timeout("groq")) as response:
+                        if response.status_code == 429:
+                            lease.throttled(parse_retry_after(response.headers.get("retry-after")))
+                            logger.info("Groq stream throttled on %s", lease.key.label)
+                            continue
+                        if response.status_code != 200:
+                            lease.failed()
+                            model_health.record_failure("groq", GROQ_MODEL, f"HTTP {response.status_code}")
+                            _observe_call("groq", GROQ_MODEL, "error", started)
+                            return
+                        # OpenAI-style server-sent events: "data: {...}" lines, ended by "data: [DONE]"
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            payload = line[5:].strip()
+                            if payload == "[DONE]":
+                                break
+                            delta = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+                            if delta:
+                                yielded = True
+                                yield delta
+                        lease.success(response.headers)
+                model_health.record_success("groq", GROQ_MODEL, time.perf_counter() - started)
+                _observe_call("groq", GROQ_MODEL, "ok", started)
+                return
+            model_health.release(GROQ_MODEL)
+            _observe_call("groq", GROQ_MODEL, "throttled", started)
+        except RateLimited as e:
+            model_health.release(GROQ_MODEL)
+            _observe_call("groq", GROQ_MODEL, "throttled", started)
+            logger.info("%s", e)
+        except (asyncio.CancelledError, GeneratorExit):
+            if lease is not None:
+                lease.failed()
+            model_health.release(GROQ_MODEL)
+            raise
+        except Exception as e:
+            if lease is not None:
+                lease.failed()
+            model_health.record_failure("groq", GROQ_MODEL, str(e))
+            _observe_call("groq", GROQ_MODEL, "error", started)
+            logger.warning("Groq stream failed: %s", e)
+            if yielded:
+                raise
 
 
-    async def generate_image(self, prompt: str, aspect_ratio: str = "1:1") -> str:
+    async def generate_image(self, prompt: str, aspect_ratio: str = "1:1", seed: Optional[int] = None) -> str:
         """
         Generates an image using Pollinations.ai with a fallback to Picsum.
+        Without an explicit seed, the seed is derived from the prompt so the URL is reproducible.
         """
         import urllib.parse
-        import random
+        import hashlib
         
         # Clean prompt: ONLY alphanumeric and spaces, then replace spaces with underscores
         # Pollinations often handles underscores better for direct links
@@ -135,18 +658,21 @@ class LLMClient:
         
         width, height = 1024, 1024
         if aspect_ratio == "9:16": width, height = 768, 1344
-        seed = random.randint(0, 999999)
+        if seed is None:
+            seed = int(hashlib.sha256(f"{aspect_ratio}|{prompt}".encode("utf-8")).hexdigest()[:8], 16) % 1000000
         
         # Format 1: Direct link
         image_url = f"https://pollinations.ai/p/{url_prompt}?width={width}&height={height}&seed={seed}&nologo=true"
         
-        print(f"DEBUG: Generated Image URL: {image_url}")
+        logger.debug("Generated Image URL: %s", image_url)
         return image_url
 
 
-    async def generate_video(self, prompt: str, aspect_ratio: str = "1:1") -> str:
-        import random
+    async def generate_video(self, prompt: str, aspect_ratio: str = "1:1", seed: Optional[int] = None) -> str:
+        import hashlib
         stock_videos = ["https://cdn.coverr.co/videos/coverr-typing-on-a-macbook-4734/1080p.mp4", "https://cdn.coverr.co/videos/coverr-working-on-a-laptop-4503/1080p.mp4"]
-        return random.choice(stock_videos)
+        if seed is None:
+            seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8], 16)
+        return stock_videos[seed % len(stock_videos)]
 
 llm_client = LLMClient(provider="gemini")
@@ -0,0 +1,205 @@
+import re
+import json
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar
+from pydantic import TypeAdapter
+from app.utils.metrics import LLM_OUTPUT
+from app.utils.log import get_logger
+
+try:
+    import orjson
+except ImportError:  # orjson is a speedup, not a requirement
+    orjson = None
+
+logger = get_logger("llm_output")
+
+T = TypeVar("T")
+
+_CLOSERS = {"{": "}", "[": "]"}
+# How many truncation cut points to remember; the latest usable one wins
+_MAX_CUTS = 8
+
+
+def _loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def dumps(obj: Any) -> str:
+    """json.dumps replacement for response bodies and events (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj)
+
+
+# Structural characters; everything between them (string contents, numbers) is skipped
+_TOKENS = re.compile(r'[{}\[\]",\\\n\r\t]')
+_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+
+def _extract(text: str) -> Tuple[str, bool, Any]:
+    """
+    Finds the JSON document in LLM output. Well-formed output (optionally fenced or
+    followed by chatter) parses from the first brace to the last one; anything else
+    goes through the repairing scan, from the first '{' or '[' (whichever comes first,
+    retrying from the other if that fails, e.g. for a "[note]" in chatter).
+    Returns (json text, repaired, parsed value).
+    """
+    start = text.find("{")
+    bracket = text.find("[")
+    if start >= 0 and not 0 <= bracket < start:
+        candidate = text[start:text.rfind("}") + 1]
+        try:
+            return candidate, False, _loads(candidate)
+        except ValueError:
+            pass
+
+    starts = sorted(p for p in (start, bracket) if p >= 0)
+    if not starts:
+        raise ValueError("No JSON object found in LLM output")
+    for start in starts[:-1]:
+        try:
+            candidate, repaired = _scan(text, start)
+            return candidate, repaired, _loads(candidate)
+        except ValueError:
+            continue
+    candidate, repaired = _scan(text, starts[-1])
+    return candidate, repaired, _loads(candidate)
+
+
+def _scan(text: str, start: int) -> Tuple[str, bool]:
+    """
+    One pass over LLM output from `start`: follows the JSON document to its balanced
+    closing bracket and ignores whatever comes after (markdown fences, chatter).
+    Repairs made on the way:
+      - trailing commas before '}' or ']' are dropped
+      - raw newlines and tabs inside strings are escaped
+      - a truncated document is cut back to the last complete top-level field or
+        array element (a half-written item is dropped, not kept with missing fields)
+        and its open brackets are closed
+    Returns (json text, repaired).
+    """
+    fixes: Dict[int, str] = {}
+    stack: List[str] = []
+    cuts: List[Tuple[int, str]] = []
+    in_string = False
+    skip = -1  # position of an escaped character
+    end = -1
+    for match in _TOKENS.finditer(text, start):
+        i = match.start()
+        c = text[i]
+        if in_string:
+            if i == skip:
+                continue
+            if c == "\\":
+                skip = i + 1
+            elif c == '"':
+                in_string = False
+            elif c in _ESCAPES:
+                fixes[i] = _ESCAPES[c]
+        elif c == '"':
+            in_string = True
+        elif c == "{" or c == "[":
+            stack.append(c)
+        elif c == "}" or c == "]":
+            j = i - 1
+            while text[j].isspace():
+                j -= 1
+            if text[j] == ",":
+                fixes[j] = ""
+            if stack:
+                stack.pop()
+            if not stack:
+                end = i + 1
+                break
+            if stack[-1] == "[" and "{" not in stack[1:]:
+                # A complete element of an array that is not inside an unfinished object
+                cuts.append((i + 1, "".join(_CLOSERS[b] for b in reversed(stack))))
+                del cuts[:-_MAX_CUTS]
+        elif c == ",":
+            if len(stack) == 1 or (stack[-1] == "[" and "{" not in stack[1:]):
+                # Everything before a top-level or array-level comma is complete
+                cuts.append((i, "".join(_CLOSERS[b] for b in reversed(stack))))
+                del cuts[:-_MAX_CUTS]
+
+    if end < 0:
+        # Ran out of text before the root closed
+        for cut, closers in reversed(cuts):
+            candidate = _apply(text, start, cut, fixes).rstrip().rstrip(",") + closers
+            try:
+                _loads(candidate)
+                return candidate, True
+            except ValueError:
+                continue
+        raise ValueError("Truncated JSON in LLM output could not be repaired")
+
+    return _apply(text, start, end, fixes), True
+
+
+def _apply(text: str, start: int, end: int, fixes: Dict[int, str]) -> str:
+    if not fixes:
+        return text[start:end]
+    parts = []
+    pos = start
+    for index in sorted(fixes):
+        if index >= end:
+            break
+        parts.append(text[pos:index])
+        parts.append(fixes[index])
+        pos = index + 1
+    parts.append(text[pos:end])
+    return "".join(parts)
+
+
+def parse_json(text: Optional[str]) -> Any:
+    """
+    Extracts and parses the JSON document in an LLM response, repairing common
+    malformations without another LLM call. Raises ValueError if nothing usable is found.
+    """
+    try:
+        if not text:
+            raise ValueError("Empty LLM output")
+        _, repaired, data = _extract(text)
+    except ValueError:
+        LLM_OUTPUT.inc(outcome="failed")
+        raise
+    LLM_OUTPUT.inc(outcome="repaired" if repaired else "clean")
+    if repaired:
+        logger.debug("Repaired malformed LLM JSON")
+    return data
+
+
+def is_json(text: Optional[str]) -> bool:
+    """True if parse_json would succeed on this output (used to pick a winner between providers)."""
+    if not text:
+        return False
+    try:
+        _extract(text)
+        return True
+    except ValueError:
+        return False
+
+
+@lru_cache(maxsize=None)
+def adapter(tp: Any) -> TypeAdapter:
+    """TypeAdapter per type, built once; schema construction is the expensive part."""
+    return TypeAdapter(tp)
+
+
+def validate(tp: Type[T], data: Any) -> T:
+    return adapter(tp).validate_python(data)
+
+
+def with_defaults(data: Any, defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """An LLM-produced object with missing (or null) fields filled from defaults."""
+    if not isinstance(data, dict):
+        raise ValueError(f"Expected a JSON object, got {type(data).__name__}")
+    merged = dict(defaults)
+    merged.update((k, v) for k, v in data.items() if v is not None or k not in defaults)
+    return merged
+
+
+def items_with_defaults(items: Any, defaults: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """The object elements of an LLM-produced array with defaults filled in; anything else is dropped."""
+    if not isinstance(items, list):
+        return []
+    return [with_defaults(item, defaults) for item in items if isinstance(item, dict)]
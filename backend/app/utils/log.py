@@ -0,0 +1,34 @@
+import sys
+import logging
+from app.utils.config import env_str
+
+_configured = False
+
+
+def _configure():
+    global _configured
+    if _configured:
+        return
+    _configured = True
+    root = logging.getLogger("marketmind")
+    root.propagate = False
+    level = env_str("MARKETMIND_LOG_LEVEL", "INFO").upper()
+    if level in ("OFF", "NONE", "FALSE", "0"):
+        # No handler and a level above CRITICAL: log calls return before formatting anything
+        root.setLevel(logging.CRITICAL + 1)
+        root.addHandler(logging.NullHandler())
+        return
+    root.setLevel(getattr(logging, level, logging.INFO))
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root.addHandler(handler)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Module logger under the "marketmind" namespace. Level comes from
+    MARKETMIND_LOG_LEVEL (DEBUG, INFO, WARNING, ERROR or OFF; default INFO).
+    Use %-style arguments so disabled levels cost no string formatting.
+    """
+    _configure()
+    return logging.getLogger(f"marketmind.{name}")
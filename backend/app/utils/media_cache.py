@@ -0,0 +1,133 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+
+
+class MediaDiskCache:
+    """
+    Content-addressed store for prefetched media. Blobs are named by the sha256 of
+    their bytes, so identical images fetched for different prompts are stored once.
+    A small key file maps each media key (prompt, kind, aspect ratio) to its blob.
+    Least recently used blobs are evicted once the total size exceeds max_bytes.
+
+    Layout:
+        <dir>/blobs/<digest>      media bytes
+        <dir>/keys/<key>          {"digest": ..., "content_type": ...}
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._keys: Dict[str, str] = {}
+        self._types: Dict[str, str] = {}
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self.evictions = 0
+        self.loaded = False
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "blobs", digest)
+
+    def _key_path(self, key: str) -> str:
+        return os.path.join(self.directory, "keys", key)
+
+    def load(self):
+        """Rebuilds the in-memory index from disk (blobs in mtime order, oldest first)."""
+        with self._lock:
+            if self.loaded:
+                return
+            os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+            os.makedirs(os.path.join(self.directory, "keys"), exist_ok=True)
+            blobs = []
+            for name in os.listdir(os.path.join(self.directory, "blobs")):
+                if _DIGEST.match(name):
+                    st = os.stat(self._blob_path(name))
+                    blobs.append((st.st_mtime, name, st.st_size))
+            for _, digest, size in sorted(blobs):
+                self._sizes[digest] = size
+                self.total_bytes += size
+            for key in os.listdir(os.path.join(self.directory, "keys")):
+                try:
+                    with open(self._key_path(key)) as f:
+                        entry = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if entry.get("digest") in self._sizes:
+                    self._keys[key] = entry["digest"]
+                    self._types[entry["digest"]] = entry.get("content_type", "application/octet-stream")
+            self.loaded = True
+
+    def lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            digest = self._keys.get(key)
+            if digest is not None and digest in self._sizes:
+                self._sizes.move_to_end(digest)
+                return digest
+        return None
+
+    def open(self, digest: str) -> Optional[Tuple[str, str]]:
+        """Returns (path, content type) for a stored blob and marks it recently used."""
+        if not _DIGEST.match(digest):
+            return None
+        with self._lock:
+            if digest not in self._sizes:
+                return None
+            self._sizes.move_to_end(digest)
+            return self._blob_path(digest), self._types.get(digest, "application/octet-stream")
+
+    def store(self, key: str, data: bytes, content_type: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest not in self._sizes:
+                tmp = self._blob_path(digest) + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, self._blob_path(digest))
+                self._sizes[digest] = len(data)
+                self.total_bytes += len(data)
+            self._sizes.move_to_end(digest)
+            self._types[digest] = content_type
+            self._keys[key] = digest
+            with open(self._key_path(key), "w") as f:
+                json.dump({"digest": digest, "content_type": content_type}, f)
+            self._evict()
+        return digest
+
+    def _evict(self):
+        evicted = set()
+        # Never evict the blob that was just stored, even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self._sizes) > 1:
+            digest, size = self._sizes.popitem(last=False)
+            self.total_bytes -= size
+            self.evictions += 1
+            evicted.add(digest)
+            self._types.pop(digest, None)
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+        if evicted:
+            for key in [k for k, d in self._keys.items() if d in evicted]:
+                del self._keys[key]
+                try:
+                    os.remove(self._key_path(key))
+                except OSError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "entries": len(self._sizes),
+                "keys": len(self._keys),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
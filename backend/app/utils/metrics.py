@@ -0,0 +1,329 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond parsing up to slow provider calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_fmt(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts (non-cumulative, last slot is +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(k, list(s[0]), s[1], s[2]) for k, s in self._series.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "marketmind_stage_seconds",
+    "Time spent in each hot-path stage of a generation request.",
+    ["stage", "endpoint", "provider", "cache", "fallback"],
+)
+PROVIDER_CALL_SECONDS = registry.histogram(
+    "marketmind_provider_call_seconds",
+    "Latency of individual provider calls by provider, model and outcome.",
+    ["provider", "model", "outcome"],
+)
+REQUEST_SECONDS = registry.histogram(
+    "marketmind_request_seconds",
+    "End-to-end HTTP request latency.",
+    ["endpoint", "method", "status"],
+)
+LLM_RESULTS = registry.counter(
+    "marketmind_llm_results_total",
+    "Generations by serving provider and cache outcome; provider=\"mock\" is the demo fallback.",
+    ["endpoint", "provider", "cache"],
+)
+LLM_TOKENS = registry.counter(
+    "marketmind_llm_tokens_total",
+    "Tokens sent (kind=\"prompt\") and received (kind=\"completion\") by endpoint and platform; from provider usage, estimated when none is reported.",
+    ["endpoint", "platform", "provider", "kind"],
+)
+LLM_CALL_TOKENS = registry.histogram(
+    "marketmind_llm_call_tokens",
+    "Tokens per generation call, to compare prompt size with marketmind_stage_seconds{stage=\"provider_call\"}.",
+    ["endpoint", "kind"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384),
+)
+PROMPT_TOKENS_SAVED = registry.counter(
+    "marketmind_prompt_tokens_saved_total",
+    "Estimated prompt tokens left out by compaction: guidelines for platforms not requested, or sections trimmed to fit the token budget.",
+    ["endpoint", "reason"],
+)
+LLM_OUTPUT = registry.counter(
+    "marketmind_llm_output_total",
+    "LLM responses by JSON extraction outcome: clean, repaired (trailing commas, truncation) or failed.",
+    ["outcome"],
+)
+
+
+class RequestMetrics:
+    """
+    Per-request collector. Stage timings are buffered and observed when the request
+    ends, so every stage carries the provider, cache and fallback labels that are
+    only known once the LLM call has finished.
+    """
+
+    __slots__ = ("endpoint", "provider", "cache", "fallback", "stages", "results", "tokens", "saved")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.provider = "none"
+        self.cache = "bypass"
+        self.fallback = False
+        self.stages: List[Tuple[str, float]] = []
+        self.results: List[Tuple[str, str]] = []
+        self.tokens: List[Tuple[Dict[str, float], str, int, int]] = []
+        self.saved: List[Tuple[str, int]] = []
+
+    def flush(self):
+        fallback = "true" if self.fallback else "false"
+        for name, seconds in self.stages:
+            STAGE_SECONDS.observe(seconds, stage=name, endpoint=self.endpoint, provider=self.provider, cache=self.cache, fallback=fallback)
+        for provider, cache in self.results:
+            LLM_RESULTS.inc(endpoint=self.endpoint, provider=provider, cache=cache)
+        for shares, provider, prompt, completion in self.tokens:
+            _observe_tokens(self.endpoint, shares, provider, prompt, completion)
+        for reason, tokens in self.saved:
+            PROMPT_TOKENS_SAVED.inc(tokens, endpoint=self.endpoint, reason=reason)
+        self.stages = []
+        self.results = []
+        self.tokens = []
+        self.saved = []
+
+
+_current: ContextVar[Optional[RequestMetrics]] = ContextVar("marketmind_request_metrics", default=None)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def track_request(endpoint: str) -> Iterator[RequestMetrics]:
+    """Collects stage timings for one unit of work (an HTTP request or a background job)."""
+    ctx = RequestMetrics(endpoint)
+    token = _current.set(ctx)
+    try:
+        yield ctx
+    finally:
+        _current.reset(token)
+        ctx.flush()
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def record_stage(name: str, seconds: float):
+    ctx = _current.get()
+    if ctx is not None:
+        ctx.stages.append((name, seconds))
+    else:
+        STAGE_SECONDS.observe(seconds, stage=name, endpoint="none", provider="none", cache="bypass", fallback="false")
+
+
+def note_llm_result(provider: str, cache: str):
+    """Records which provider served a generation and how the cache was involved."""
+    ctx = _current.get()
+    if ctx is None:
+        LLM_RESULTS.inc(endpoint="none", provider=provider, cache=cache)
+        return
+    ctx.results.append((provider, cache))
+    ctx.cache = cache
+    if provider == "mock":
+        ctx.fallback = True
+    # A batch may mix providers; a real provider wins the label over the mock
+    if ctx.provider in ("none", "mock") or provider != "mock":
+        ctx.provider = provider
+
+
+def _observe_tokens(endpoint: str, shares: Dict[str, float], provider: str, prompt: int, completion: int):
+    LLM_CALL_TOKENS.observe(prompt, endpoint=endpoint, kind="prompt")
+    LLM_CALL_TOKENS.observe(completion, endpoint=endpoint, kind="completion")
+    total = sum(shares.values()) or 1.0
+    for platform, share in shares.items():
+        LLM_TOKENS.inc(prompt * share / total, endpoint=endpoint, platform=platform, provider=provider, kind="prompt")
+        LLM_TOKENS.inc(completion * share / total, endpoint=endpoint, platform=platform, provider=provider, kind="completion")
+
+
+def note_tokens(provider: str, prompt: int, completion: int, shares: Optional[Dict[str, float]] = None):
+    """
+    Records the tokens one generation spent. `shares` splits them across platforms
+    (weights, e.g. by output length per platform); without it they count as platform="none".
+    """
+    shares = shares or {"none": 1.0}
+    ctx = _current.get()
+    if ctx is None:
+        _observe_tokens("none", shares, provider, prompt, completion)
+    else:
+        ctx.tokens.append((shares, provider, prompt, completion))
+
+
+def note_tokens_saved(reason: str, tokens: int):
+    """Records prompt tokens left out by compaction (reason: "platforms" or "budget")."""
+    if tokens <= 0:
+        return
+    ctx = _current.get()
+    if ctx is None:
+        PROMPT_TOKENS_SAVED.inc(tokens, endpoint="none", reason=reason)
+    else:
+        ctx.saved.append((reason, tokens))
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no body buffering, so streaming and request.stream() are
+    unaffected). Opens a RequestMetrics context and labels it with the route template
+    once routing has happened, so /jobs/{job_id} stays one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with track_request(scope["path"]) as ctx:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                ctx.endpoint = getattr(route, "path", None) or "unmatched"
+                REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=ctx.endpoint, method=scope["method"], status=status["code"])
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import asyncio
+from typing import Any, Dict, List, Optional
+from app.utils.config import env_float, env_str
+from app.utils.log import get_logger
+
+logger = get_logger("model_catalog")
+
+MODEL_CATALOG_PATH = env_str("MODEL_CATALOG_PATH", "model_catalog.json")
+MODEL_CATALOG_TTL = env_float("MODEL_CATALOG_TTL", 24 * 3600.0)
+
+
+class ModelCatalog:
+    """
+    Gemini models available to the configured key, cached on disk so startup never waits
+    for a list_models() call. A missing or stale catalog (older than MODEL_CATALOG_TTL) is
+    used as is and refreshed in the background. Configured GEMINI_MODELS that the catalog
+    does not list for generateContent are skipped instead of costing a failed call; with
+    no catalog at all, the configured list is used unchanged.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.fetched_at = 0.0
+        self.models: Dict[str, List[str]] = {}
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._filtered: Dict[tuple, List[str]] = {}
+
+    def load(self) -> bool:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.models = {m["name"]: m.get("methods", []) for m in data.get("models", [])}
+            self.fetched_at = float(data.get("fetched_at", 0.0))
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        self._filtered.clear()
+        return True
+
+    @property
+    def stale(self) -> bool:
+        return time.time() - self.fetched_at > self.ttl
+
+    def filter(self, models: List[str]) -> List[str]:
+        """The configured models that the catalog says can generate content, in configured order."""
+        key = tuple(models)
+        if key not in self._filtered:
+            usable = [m for m in models if "generateContent" in self.models.get(m, ())] if self.models else list(models)
+            # A catalog that rules out every configured model is more likely wrong than the config
+            self._filtered[key] = usable or list(models)
+        return self._filtered[key]
+
+    def fetch(self, genai: Any):
+        """Lists models with the configured SDK and saves the catalog (blocking; run in a thread)."""
+        models = [
+            {"name": m.name.split("/", 1)[-1], "methods": list(m.supported_generation_methods)}
+            for m in genai.list_models()
+        ]
+        data = {"fetched_at": time.time(), "models": models}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, self.path)
+        self.models = {m["name"]: m["methods"] for m in models}
+        self.fetched_at = data["fetched_at"]
+        self._filtered.clear()
+
+    def refresh_in_background(self, genai: Any):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.ensure_future(self._refresh(genai))
+
+    async def _refresh(self, genai: Any):
+        try:
+            await asyncio.to_thread(self.fetch, genai)
+            self.refreshes += 1
+            logger.info("Model catalog refreshed: %d models", len(self.models))
+        except Exception as e:
+            self.refresh_errors += 1
+            logger.warning("Model catalog refresh failed: %s", e)
+
+    async def close(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "models": len(self.models),
+            "age": round(time.time() - self.fetched_at, 1) if self.fetched_at else None,
+            "stale": self.stale,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+model_catalog = ModelCatalog(MODEL_CATALOG_PATH, MODEL_CATALOG_TTL)
@@ -0,0 +1,226 @@
+import time
+import asyncio
+from typing import Dict, List, Optional, Any, Tuple
+from app.utils.config import env_int, env_float
+from app.utils.shared_state import shared_state
+from app.utils.log import get_logger
+
+logger = get_logger("model_health")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Per-model breaker. Opens after `failure_threshold` consecutive failures and
+    skips the model entirely until `cooldown` seconds have passed, then lets a
+    single probe call through (half-open) to decide whether to close again.
+    Every re-open doubles the cooldown, up to `max_cooldown`.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, cooldown: float, max_cooldown: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.opened_wall = 0.0
+        self.probe_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_latency: Optional[float] = None
+
+    def available(self) -> bool:
+        """Non-mutating check used when ordering candidates."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() - self.opened_at < self.cooldown:
+            return False
+        return not self.probe_in_flight
+
+    def allow(self) -> bool:
+        """Called right before a call is made; claims the half-open probe slot."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return False
+            self.state = HALF_OPEN
+            self.probe_in_flight = False
+        # Half-open: only one probe at a time
+        if self.probe_in_flight:
+            return False
+        self.probe_in_flight = True
+        return True
+
+    def record_success(self, latency: Optional[float] = None):
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.last_latency = latency
+        self.state = CLOSED
+        self.cooldown = self.base_cooldown
+        self.probe_in_flight = False
+
+    def record_failure(self, error: str = ""):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error[:300] if error else None
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open()
+        elif self.consecutive_failures >= self.failure_threshold:
+            self._open()
+        self.probe_in_flight = False
+
+    def release(self):
+        """Frees the probe slot when a call ends without a verdict (e.g. cancelled)."""
+        self.probe_in_flight = False
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.opened_wall = time.time()
+
+    def adopt_open(self, open_until: float, cooldown: float):
+        """Opens this breaker because another worker opened it (open_until is wall clock)."""
+        self.state = OPEN
+        self.cooldown = cooldown
+        self.opened_wall = open_until - cooldown
+        self.opened_at = time.monotonic() - (time.time() - self.opened_wall)
+        self.probe_in_flight = False
+
+    def adopt_closed(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = self.base_cooldown
+        self.probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = 0.0
+        if self.state == OPEN:
+            retry_in = max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "successes": self.successes,
+            "failures": self.failures,
+            "cooldown": self.cooldown,
+            "retry_in": round(retry_in, 2),
+            "last_error": self.last_error,
+            "last_latency": self.last_latency,
+        }
+
+
+class ModelHealthRegistry:
+    """
+    Tracks breaker state for every provider model and remembers the last model that worked.
+    Under serve.py, breakers opening and closing are published to the shared state and
+    picked up by the other workers every MODEL_HEALTH_SYNC_INTERVAL seconds. Both happen
+    off the event loop: writes go to the shared state's writer thread, and a background
+    task started by start() reads the other workers' breakers in a thread.
+    """
+
+    def __init__(self):
+        self.failure_threshold = env_int("MODEL_BREAKER_THRESHOLD", 2)
+        self.cooldown = env_float("MODEL_BREAKER_COOLDOWN", 30.0)
+        self.max_cooldown = env_float("MODEL_BREAKER_MAX_COOLDOWN", 600.0)
+        self.sync_interval = env_float("MODEL_HEALTH_SYNC_INTERVAL", 1.0)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.last_good: Dict[str, str] = {}
+        self.shared = shared_state
+        self._sync_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self.shared is not None and self._sync_task is None:
+            self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def close(self):
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+
+    async def _sync_loop(self):
+        while True:
+            try:
+                self._apply(await asyncio.to_thread(self.shared.breakers))
+            except Exception as e:
+                logger.warning("Reading shared breaker state failed: %s", e)
+            await asyncio.sleep(self.sync_interval)
+
+    def _apply(self, shared: Dict[str, Tuple[float, float, float]]):
+        """Adopts breakers other workers opened or closed."""
+        wall = time.time()
+        for model, (open_until, cooldown, updated) in shared.items():
+            b = self.breaker(model)
+            if open_until > wall and b.state == CLOSED:
+                b.adopt_open(open_until, cooldown)
+            elif open_until == 0 and b.state != CLOSED and updated > b.opened_wall:
+                b.adopt_closed()
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        if model not in self.breakers:
+            self.breakers[model] = CircuitBreaker(model, self.failure_threshold, self.cooldown, self.max_cooldown)
+        return self.breakers[model]
+
+    def candidates(self, provider: str, models: List[str]) -> List[str]:
+        """
+        Returns the models worth trying right now, last known good first.
+        Models with an open breaker are dropped so they cost no latency.
+        """
+        ordered = list(models)
+        good = self.last_good.get(provider)
+        if good in ordered:
+            ordered.remove(good)
+            ordered.insert(0, good)
+        return [m for m in ordered if self.breaker(m).available()]
+
+    def allow(self, model: str) -> bool:
+        return self.breaker(model).allow()
+
+    def record_success(self, provider: str, model: str, latency: Optional[float] = None):
+        b = self.breaker(model)
+        recovered = b.state != CLOSED
+        b.record_success(latency)
+        self.last_good[provider] = model
+        if recovered and self.shared is not None:
+            self.shared.write_later(self.shared.set_breaker, model, 0.0, b.cooldown)
+
+    def record_failure(self, provider: str, model: str, error: str = ""):
+        b = self.breaker(model)
+        was_open = b.state == OPEN
+        b.record_failure(error)
+        if self.last_good.get(provider) == model:
+            del self.last_good[provider]
+        if b.state == OPEN and not was_open and self.shared is not None:
+            self.shared.write_later(self.shared.set_breaker, model, b.opened_wall + b.cooldown, b.cooldown)
+
+    def release(self, model: str):
+        self.breaker(model).release()
+
+    def reset(self, model: Optional[str] = None):
+        if self.shared is not None:
+            self.shared.write_later(self.shared.clear_breakers, model)
+        if model is None:
+            self.breakers.clear()
+            self.last_good.clear()
+        else:
+            self.breakers.pop(model, None)
+            for provider, good in list(self.last_good.items()):
+                if good == model:
+                    del self.last_good[provider]
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "last_known_good": dict(self.last_good),
+            "models": {name: b.snapshot() for name, b in self.breakers.items()},
+        }
+
+
+model_health = ModelHealthRegistry()
@@ -0,0 +1,59 @@
+import textwrap
+from typing import Dict, List, NamedTuple, Sequence
+from app.utils.config import env_int
+from app.utils.metrics import note_tokens_saved
+from app.utils.tokens import estimate_tokens
+from app.utils.log import get_logger
+
+logger = get_logger("prompts")
+
+# Estimated tokens a prompt (system + user) may use before optional sections are trimmed; 0 turns trimming off
+PROMPT_TOKEN_BUDGET = env_int("PROMPT_TOKEN_BUDGET", 1000)
+
+# Section.keep for sections that are never trimmed
+REQUIRED = 1_000_000
+
+
+def compact(template: str) -> str:
+    """Drops the source indentation of a triple-quoted prompt: it costs tokens and carries no meaning."""
+    return textwrap.dedent(template).strip()
+
+
+class Section(NamedTuple):
+    text: str
+    # Trim order when over budget: the lowest value goes first
+    keep: int = REQUIRED
+
+
+class PromptBuilder:
+    """
+    Chat messages from a static system prompt, compacted and measured once when the
+    builder is created, and a user prompt assembled from sections. When the estimated
+    prompt is over the token budget, optional sections are left out, lowest `keep`
+    first, until it fits; required sections are always sent.
+    """
+
+    def __init__(self, system_prompt: str, budget: int = PROMPT_TOKEN_BUDGET):
+        self.system_prompt = compact(system_prompt)
+        self.system_tokens = estimate_tokens(self.system_prompt)
+        self.budget = budget
+
+    def build(self, sections: Sequence[Section]) -> List[Dict[str, str]]:
+        sections = [Section(s.text.strip(), s.keep) for s in sections if s.text and s.text.strip()]
+        sizes = [estimate_tokens(s.text) for s in sections]
+        total = self.system_tokens + sum(sizes)
+        if self.budget > 0 and total > self.budget:
+            dropped = 0
+            for i in sorted((i for i, s in enumerate(sections) if s.keep < REQUIRED), key=lambda i: (sections[i].keep, -i)):
+                if total - dropped <= self.budget:
+                    break
+                dropped += sizes[i]
+                sections[i] = None
+            sections = [s for s in sections if s is not None]
+            note_tokens_saved("budget", dropped)
+            if total - dropped > self.budget:
+                logger.info("Prompt is ~%d tokens after trimming, over the %d token budget", total - dropped, self.budget)
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": "\n\n".join(s.text for s in sections)},
+        ]
@@ -0,0 +1,356 @@
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, List, Optional, Tuple
+from app.utils.config import env_float, env_int
+from app.utils.shared_state import SharedState, shared_state, WORKERS
+
+
+class RateLimited(Exception):
+    """No API key for the provider can take another request within the allowed wait."""
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Retry-After is either delta-seconds or an HTTP date."""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+def _safe_int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def blocked_for(self) -> float:
+        return max(0.0, self.blocked_until - time.monotonic())
+
+    def block(self, seconds: float):
+        """Holds the bucket empty for `seconds` (a provider Retry-After)."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available (0 if one is available now)."""
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return self.blocked_for()
+        return max(self.blocked_for(), (1 - self.tokens) / self.rate)
+
+    def try_take(self) -> float:
+        """Takes a token and returns 0, or returns the seconds to wait without taking one."""
+        wait = self.wait_time()
+        if wait <= 0:
+            self.tokens -= 1
+        return wait
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose tokens and blocks live in SharedState, so every worker draws from one
+    budget. Every call is a SQLite query: the limiter reads and takes them in a thread.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float, state: SharedState):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.state = state
+
+    def available(self) -> float:
+        return self.state.peek_bucket(self.name, self.rate, self.capacity)[0]
+
+    def blocked_for(self) -> float:
+        return self.state.peek_bucket(self.name, self.rate, self.capacity)[1]
+
+    def block(self, seconds: float):
+        # Called from a lease on the event loop; nothing waits for the write
+        self.state.write_later(self.state.block, self.name, seconds, self.capacity)
+
+    def wait_time(self) -> float:
+        tokens, blocked = self.state.peek_bucket(self.name, self.rate, self.capacity)
+        if tokens >= 1 or self.rate <= 0:
+            return blocked
+        return max(blocked, (1 - tokens) / self.rate)
+
+    def try_take(self) -> float:
+        return self.state.take_token(self.name, self.rate, self.capacity)
+
+
+class APIKeyState:
+    def __init__(self, provider: str, index: int, key: str, rate: float, burst: float):
+        self.provider = provider
+        self.label = f"{provider}_key_{index}"
+        self.key = key
+        if shared_state is not None:
+            self.bucket = SharedTokenBucket(self.label, rate, burst, shared_state)
+        else:
+            self.bucket = TokenBucket(rate, burst)
+        # Provider-reported quota (x-ratelimit-* headers), when available
+        self.remaining: Optional[int] = None
+        self.limit: Optional[int] = None
+        self.requests = 0
+        self.throttles = 0
+
+    def wait_time(self) -> float:
+        return self.bucket.wait_time()
+
+    def headroom(self, tokens: Optional[float] = None) -> float:
+        """Higher is better: provider-reported remaining quota, else bucket tokens (read unless given)."""
+        if self.remaining is not None:
+            return float(self.remaining)
+        return self.bucket.available() if tokens is None else tokens
+
+    def snapshot(self, level: Tuple[float, float]) -> Dict[str, Any]:
+        """`level` is the bucket's (tokens, seconds blocked)."""
+        return {
+            "requests": self.requests,
+            "throttles": self.throttles,
+            "remaining": self.remaining,
+            "limit": self.limit,
+            "bucket_tokens": round(level[0], 2),
+            "blocked_for": round(level[1], 2),
+        }
+
+
+class KeyLease:
+    """One admitted request on one API key; report how it went so the limiter can adapt."""
+
+    def __init__(self, limiter: "ProviderRateLimiter", key: APIKeyState):
+        self.limiter = limiter
+        self.key = key
+        self._done = False
+
+    @property
+    def api_key(self) -> str:
+        return self.key.key
+
+    def success(self, headers: Optional[Dict[str, str]] = None):
+        if headers:
+            remaining = _safe_int(headers.get("x-ratelimit-remaining-requests"))
+            limit = _safe_int(headers.get("x-ratelimit-limit-requests"))
+            if remaining is not None:
+                self.key.remaining = remaining
+            if limit is not None:
+                self.key.limit = limit
+        self._release(throttled=False)
+
+    def throttled(self, retry_after: float):
+        self.key.throttles += 1
+        self.key.remaining = 0
+        self.key.bucket.block(retry_after)
+        self.limiter.throttles += 1
+        self._release(throttled=True)
+
+    def failed(self):
+        self._release(throttled=None)
+
+    def _release(self, throttled: Optional[bool]):
+        if self._done:
+            return
+        self._done = True
+        self.limiter._release(throttled)
+
+
+class ProviderRateLimiter:
+    """
+    Per-provider limiter: a token bucket per API key plus AIMD adaptive concurrency.
+
+    acquire() waits for a concurrency slot and then for the key with the most
+    remaining quota that is not blocked by a Retry-After. Successes grow the
+    concurrency limit additively; throttles (429) halve it. Under serve.py the key
+    buckets are shared by all workers and each worker gets its share of the
+    configured concurrency.
+    """
+
+    def __init__(self, provider: str, keys: List[str], rpm: float, burst: float,
+                 initial_concurrency: int, max_concurrency: int, max_wait: float):
+        self.provider = provider
+        self.rate = rpm / 60.0
+        self.burst = burst
+        self.keys = [APIKeyState(provider, i, k, self.rate, burst) for i, k in enumerate(keys)]
+        self.limit = float(initial_concurrency)
+        self.min_limit = 1.0
+        self.max_limit = float(max_concurrency)
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self.throttles = 0
+        self.rejected = 0
+        self.admitted = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    async def acquire(self, max_wait: Optional[float] = None) -> KeyLease:
+        """Waits (up to `max_wait` seconds) for a concurrency slot and a usable key."""
+        if not self.keys:
+            raise RateLimited(f"No API keys configured for {self.provider}")
+        started = time.monotonic()
+        deadline = started + (self.max_wait if max_wait is None else max_wait)
+        try:
+            await self._acquire_slot(deadline)
+            try:
+                key = await self._pick_key(deadline)
+            except BaseException:
+                self._release_slot()
+                raise
+        except RateLimited:
+            self.rejected += 1
+            raise
+
+        delay = time.monotonic() - started
+        self.admitted += 1
+        self.queue_delay_total += delay
+        self.queue_delay_max = max(self.queue_delay_max, delay)
+        key.requests += 1
+        if key.remaining is not None:
+            key.remaining = max(0, key.remaining - 1)
+        return KeyLease(self, key)
+
+    async def _acquire_slot(self, deadline: float):
+        while self.in_flight >= int(self.limit):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RateLimited(f"{self.provider} concurrency limit reached")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await asyncio.wait_for(waiter, timeout=remaining)
+            except asyncio.TimeoutError:
+                raise RateLimited(f"{self.provider} concurrency limit reached")
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.in_flight += 1
+
+    async def _pick_key(self, deadline: float) -> APIKeyState:
+        while True:
+            if shared_state is not None:
+                # BEGIN IMMEDIATE can wait out another worker's transaction; not on the event loop
+                key, wait = await asyncio.to_thread(self._take_shared)
+            else:
+                key, wait = self._take_local()
+            if key is not None:
+                return key
+            if time.monotonic() + wait > deadline:
+                raise RateLimited(f"All {self.provider} API keys are throttled")
+            await asyncio.sleep(wait)
+
+    def _take_local(self) -> Tuple[Optional[APIKeyState], float]:
+        """(key a token was taken from, 0), or (None, seconds until one can take)."""
+        # Taking the token is the availability check, so concurrent requests cannot both win the last one
+        for key in sorted(self.keys, key=lambda k: k.headroom(), reverse=True):
+            if key.bucket.try_take() <= 0:
+                return key, 0.0
+        return None, min(k.wait_time() for k in self.keys)
+
+    def _take_shared(self) -> Tuple[Optional[APIKeyState], float]:
+        """_take_local on SharedState: one query for every key's headroom, one transaction to take."""
+        levels = shared_state.peek_buckets([k.label for k in self.keys], self.rate, self.burst)
+        ordered = sorted(self.keys, key=lambda k: k.headroom(levels[k.label][0]), reverse=True)
+        label, wait = shared_state.take_first([k.label for k in ordered], self.rate, self.burst)
+        return next((k for k in ordered if k.label == label), None), wait
+
+    def _levels(self) -> Dict[str, Tuple[float, float]]:
+        """label -> (bucket tokens, seconds blocked) for every key."""
+        if shared_state is not None and self.keys:
+            return shared_state.peek_buckets([k.label for k in self.keys], self.rate, self.burst)
+        return {k.label: (k.bucket.available(), k.bucket.blocked_for()) for k in self.keys}
+
+    def _release_slot(self):
+        self.in_flight -= 1
+        # Wake as many waiters as the (possibly changed) limit now allows
+        free = int(self.limit) - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    def _release(self, throttled: Optional[bool]):
+        if throttled is True:
+            self.limit = max(self.min_limit, self.limit / 2)
+        elif throttled is False:
+            self.limit = min(self.max_limit, self.limit + 1.0 / max(self.limit, 1.0))
+        self._release_slot()
+
+    async def stats(self) -> Dict[str, Any]:
+        # Shared buckets are a SQLite query
+        levels = await asyncio.to_thread(self._levels) if shared_state is not None else self._levels()
+        return {
+            "keys": len(self.keys),
+            "concurrency_limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "throttles": self.throttles,
+            "queue_delay_avg": round(self.queue_delay_total / self.admitted, 4) if self.admitted else 0.0,
+            "queue_delay_max": round(self.queue_delay_max, 4),
+            "per_key": {k.label: k.snapshot(levels[k.label]) for k in self.keys},
+        }
+
+
+def _provider_keys(provider: str, pooled: bool = True) -> List[str]:
+    """<PROVIDER>_API_KEYS (comma separated) plus <PROVIDER>_API_KEY, placeholders dropped."""
+    raw = [os.getenv(f"{provider.upper()}_API_KEY", "")]
+    if pooled:
+        raw += os.getenv(f"{provider.upper()}_API_KEYS", "").split(",")
+    keys = []
+    for key in (k.strip() for k in raw):
+        if key and "your_" not in key.lower() and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def _per_worker(total: int) -> int:
+    return max(1, math.ceil(total / WORKERS))
+
+
+def build_limiter(provider: str, default_rpm: float, pooled: bool = True) -> ProviderRateLimiter:
+    prefix = provider.upper()
+    return ProviderRateLimiter(
+        provider,
+        _provider_keys(provider, pooled),
+        rpm=env_float(f"{prefix}_RPM", default_rpm),
+        burst=env_float(f"{prefix}_BURST", 5.0),
+        # Concurrency settings are for the whole service, split across workers
+        initial_concurrency=_per_worker(env_int(f"{prefix}_CONCURRENCY", 8)),
+        max_concurrency=_per_worker(env_int(f"{prefix}_MAX_CONCURRENCY", 64)),
+        max_wait=env_float("LLM_RATE_MAX_WAIT", 10.0),
+    )
+
+
+rate_limiters: Dict[str, ProviderRateLimiter] = {
+    "groq": build_limiter("groq", 30.0),
+    # The Gemini SDK is configured with a single process-wide key, so it is not pooled
+    "gemini": build_limiter("gemini", 15.0, pooled=False),
+}
@@ -0,0 +1,206 @@
+import time
+import json
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+from app.utils.config import env_int, env_float, env_str
+from app.utils.shared_state import SHARED_STATE_PATH
+from app.utils.log import get_logger
+
+logger = get_logger("cache")
+
+# Per-request cache modes accepted by the generation endpoints
+CACHE_BYPASS = "bypass"
+CACHE_PREFER = "prefer"
+CACHE_ONLY = "only"
+
+
+class CacheMissError(Exception):
+    """Raised for cache="only" requests when no cached generation exists."""
+
+
+def cache_key(messages: List[Dict[str, str]], model: str = "", temperature: float = 0.7,
+              max_tokens: Optional[int] = None) -> str:
+    """
+    Key for a generation: the prompt and every parameter sent to the providers, since a
+    smaller max_tokens can truncate the output. An unset max_tokens leaves the key as
+    it was before max_tokens was part of it, so persisted entries stay valid.
+    """
+    # Whitespace in the prompt templates is layout only, so it is collapsed before hashing
+    normalized = [[m.get("role", "").lower(), " ".join(m.get("content", "").split())] for m in messages]
+    parts = [normalized, model or "auto", round(float(temperature), 3)]
+    if max_tokens:
+        parts.append(int(max_tokens))
+    payload = json.dumps(parts, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheTier:
+    """Optional on-disk tier so cached generations survive restarts."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache(created_at)")
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row[1] < time.time():
+            self.delete(key)
+            return None
+        return row[0], row[1]
+
+    def put(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, time.time()),
+            )
+            self._writes += 1
+            # Prune expired and overflow rows every so often rather than on every write
+            if self._writes % 100 == 0:
+                self._prune()
+            self._conn.commit()
+
+    def _prune(self) -> int:
+        cur = self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+        removed = cur.rowcount
+        cur = self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        return removed + cur.rowcount
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Two-tier cache for raw LLM generations: an in-memory LRU bounded by entry
+    count and total bytes, with TTL, backed by an optional SQLite tier
+    (enabled by setting LLM_CACHE_DB to a file path, and always on under serve.py).
+    """
+
+    def __init__(self):
+        self.ttl = env_float("LLM_CACHE_TTL", 3600.0)
+        self.max_entries = env_int("LLM_CACHE_MAX_ENTRIES", 1024)
+        self.max_bytes = env_int("LLM_CACHE_MAX_BYTES", 32 * 1024 * 1024)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._bytes = 0
+
+        # Workers started by serve.py share generations through the shared state database
+        db_path = env_str("LLM_CACHE_DB", SHARED_STATE_PATH)
+        self.disk: Optional[SQLiteCacheTier] = None
+        if db_path:
+            try:
+                self.disk = SQLiteCacheTier(db_path, env_int("LLM_CACHE_DB_MAX_ENTRIES", 10000))
+            except Exception as e:
+                logger.warning("LLM cache disk tier disabled: %s", e)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.puts = 0
+        self.evictions = {"lru": 0, "size": 0, "expired": 0}
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        if key in self._entries:
+            self._bytes -= len(self._entries.pop(key)[1])
+        self._entries[key] = (expires_at, value)
+        self._bytes += len(value)
+        while len(self._entries) > self.max_entries:
+            self._evict("lru")
+        while self._bytes > self.max_bytes and self._entries:
+            self._evict("size")
+
+    def _evict(self, reason: str):
+        _, (_, value) = self._entries.popitem(last=False)
+        self._bytes -= len(value)
+        self.evictions[reason] += 1
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._bytes -= len(self._entries.pop(key)[1])
+            self.evictions["expired"] += 1
+
+        if self.disk is not None:
+            row = await asyncio.to_thread(self.disk.get, key)
+            if row is not None:
+                value, expires_at = row
+                self._remember(key, value, expires_at)
+                self.disk_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, value: str):
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        self.puts += 1
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, value, expires_at)
+            except Exception as e:
+                logger.warning("LLM cache disk write failed: %s", e)
+
+    async def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.clear)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "puts": self.puts,
+            "evictions": dict(self.evictions),
+            "disk": {"path": self.disk.path, "entries": self.disk.count()} if self.disk else None,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,374 @@
+import os
+import re
+import json
+import time
+import zlib
+import asyncio
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+from app.utils.config import env_bool, env_float, env_int, env_str
+from app.utils.llm_output import dumps
+from app.utils.log import get_logger
+
+logger = get_logger("semantic_cache")
+
+_WORDS = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+class HashingEmbedder:
+    """
+    Local text embedding with no model download or network call: words and word
+    bigrams are hashed into `dim` signed buckets, weighted 1 + log(tf) and
+    L2-normalized, so the dot product of two embeddings is their cosine similarity.
+    Texts that differ by a few words score close to 1.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed(self, text: str) -> np.ndarray:
+        words = _WORDS.findall(text.lower())
+        counts: Dict[int, float] = {}
+        for token in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            h = zlib.crc32(token.encode("utf-8"))
+            index = h % self.dim
+            counts[index] = counts.get(index, 0.0) + (1.0 if h & 0x80000000 else -1.0)
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if counts:
+            index = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+            vector[index] = np.sign(values) * (1.0 + np.log(np.maximum(np.abs(values), 1.0)))
+            norm = float(np.linalg.norm(vector))
+            if norm > 0:
+                vector /= norm
+        return vector
+
+
+class IVFIndex:
+    """
+    Approximate nearest-neighbour index over unit vectors (inverted file): vectors
+    are assigned to the nearest of `nlist` k-means centroids and a lookup only
+    scans the `nprobe` lists closest to the query. Below `train_min` entries it is
+    an exact scan. The centroids are retrained in a worker thread whenever the
+    index has doubled since the last training, so adds never wait for k-means.
+    Every entry carries a scope id; only entries of the query's scope can match.
+    """
+
+    def __init__(self, dim: int, nprobe: int = 8, train_min: int = 2048):
+        self.dim = dim
+        self.nprobe = nprobe
+        self.train_min = train_min
+        self._lock = threading.Lock()
+        self.size = 0
+        self.vectors = np.zeros((1024, dim), dtype=np.float32)
+        self.scopes = np.zeros(1024, dtype=np.uint64)
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._list_len: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self.trainings = 0
+        self._training = False
+        # Bumped whenever entries are renumbered; a training started before that is discarded
+        self._generation = 0
+
+    def _grow(self):
+        capacity = self.vectors.shape[0] * 2
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self.size] = self.vectors[:self.size]
+        scopes = np.zeros(capacity, dtype=np.uint64)
+        scopes[:self.size] = self.scopes[:self.size]
+        self.vectors, self.scopes = vectors, scopes
+
+    def reset(self, vectors: np.ndarray, scopes: np.ndarray):
+        """Replaces the contents with these entries (untrained until the next train())."""
+        with self._lock:
+            self.size = vectors.shape[0]
+            capacity = max(1024, self.size)
+            self.vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+            self.vectors[:self.size] = vectors
+            self.scopes = np.zeros(capacity, dtype=np.uint64)
+            self.scopes[:self.size] = scopes
+            self.centroids = None
+            self._lists = []
+            self._list_len = None
+            self.trained_size = 0
+            self._generation += 1
+
+    def keep(self, entries: np.ndarray):
+        """Keeps only these entries (sorted ids), renumbered densely; the centroids stay valid."""
+        with self._lock:
+            self._generation += 1
+            remap = np.full(self.size, -1, dtype=np.int64)
+            remap[entries] = np.arange(entries.shape[0])
+            self.vectors = self.vectors[entries]
+            self.scopes = self.scopes[entries]
+            self.size = entries.shape[0]
+            if self.centroids is not None:
+                self._lists = [ids[ids >= 0] for ids in (remap[ids[:n]] for ids, n in zip(self._lists, self._list_len))]
+                self._list_len = np.array([ids.shape[0] for ids in self._lists], dtype=np.int64)
+                self.trained_size = min(self.trained_size, self.size)
+
+    def _append_to_list(self, cluster: int, entry: int):
+        ids = self._lists[cluster]
+        n = self._list_len[cluster]
+        if n == ids.shape[0]:
+            ids = np.resize(ids, max(16, n * 2))
+            self._lists[cluster] = ids
+        ids[n] = entry
+        self._list_len[cluster] = n + 1
+
+    def add(self, vector: np.ndarray, scope: int) -> int:
+        """Adds a vector and returns its entry id (ids are dense, in insertion order)."""
+        with self._lock:
+            if self.size == self.vectors.shape[0]:
+                self._grow()
+            entry = self.size
+            self.vectors[entry] = vector
+            self.scopes[entry] = scope
+            self.size += 1
+            if self.centroids is not None:
+                self._append_to_list(int(np.argmax(self.centroids @ vector)), entry)
+        return entry
+
+    @property
+    def needs_training(self) -> bool:
+        return not self._training and self.size >= self.train_min and self.size >= 2 * self.trained_size
+
+    def search(self, vector: np.ndarray, scope: int) -> Tuple[int, float]:
+        """(entry id, similarity) of the best entry in the scope, or (-1, 0.0)."""
+        with self._lock:
+            if self.size == 0:
+                return -1, 0.0
+            if self.centroids is None:
+                candidates = np.flatnonzero(self.scopes[:self.size] == scope)
+            else:
+                nprobe = min(self.nprobe, self.centroids.shape[0])
+                probe = np.argpartition(self.centroids @ vector, -nprobe)[-nprobe:]
+                ids = np.concatenate([self._lists[c][:self._list_len[c]] for c in probe])
+                candidates = ids[self.scopes[ids] == scope]
+            if candidates.size == 0:
+                return -1, 0.0
+            scores = self.vectors[candidates] @ vector
+        best = int(np.argmax(scores))
+        return int(candidates[best]), float(scores[best])
+
+    def train(self, iterations: int = 6, seed: int = 0):
+        """Spherical k-means on a sample of the index, then reassigns every entry (blocking)."""
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+            n = self.size
+            generation = self._generation
+            vectors = self.vectors  # entries [0, n) never move within this array
+        try:
+            nlist = max(1, int(4 * np.sqrt(n)))
+            rng = np.random.default_rng(seed)
+            sample = vectors[rng.choice(n, size=min(n, 32 * nlist), replace=False)]
+            centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+            for _ in range(iterations):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assign, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                # Empty clusters keep their previous centroid
+                centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids).astype(np.float32)
+            assign = self._assign(vectors[:n], centroids)
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(nlist + 1))
+            lists = [order[bounds[c]:bounds[c + 1]].astype(np.int64) for c in range(nlist)]
+
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self.centroids = centroids
+                self._lists = lists
+                self._list_len = np.array([ids.shape[0] for ids in lists], dtype=np.int64)
+                # Entries added while training was running
+                for entry in range(n, self.size):
+                    self._append_to_list(int(np.argmax(centroids @ self.vectors[entry])), entry)
+                self.trained_size = n
+                self.trainings += 1
+        finally:
+            self._training = False
+
+    @staticmethod
+    def _assign(vectors: np.ndarray, centroids: np.ndarray, chunk: int = 8192) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[i:i + chunk] @ centroids.T, axis=1) for i in range(0, vectors.shape[0], chunk)
+        ]) if vectors.shape[0] else np.zeros(0, dtype=np.int64)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": self.size,
+            "lists": 0 if self.centroids is None else int(self.centroids.shape[0]),
+            "nprobe": self.nprobe,
+            "trained_size": self.trained_size,
+            "trainings": self.trainings,
+        }
+
+
+def _scope_id(scope: str) -> int:
+    return int.from_bytes(hashlib.blake2b(scope.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def semantic_key(kind: str, request: BaseModel, text_fields: Iterable[str], ignore: Iterable[str] = ()) -> Tuple[str, str]:
+    """
+    (scope, text) for a request: the free-text fields are compared by similarity, every
+    other field (and the request kind) must match exactly. The cache mode, the timeout
+    and the `ignore` fields (ones the prompt does not depend on) are left out.
+    """
+    text_fields = tuple(text_fields)
+    exact = request.model_dump(exclude={"cache", "timeout", *ignore, *text_fields})
+    text = "\n".join(str(getattr(request, f) or "") for f in text_fields)
+    return f"{kind}:{dumps(exact)}", text
+
+
+class SemanticCache:
+    """
+    Near-duplicate cache for generations: a request whose free-text fields are within
+    SEMANTIC_CACHE_THRESHOLD cosine similarity of a stored request (with every other
+    field equal) is served the stored generation. Entries live in memory in an IVF
+    index, expire after SEMANTIC_CACHE_TTL and are saved to SEMANTIC_CACHE_PATH on
+    shutdown. Off unless SEMANTIC_CACHE=true; consulted for cache "prefer"/"only".
+    """
+
+    def __init__(self):
+        self.enabled = env_bool("SEMANTIC_CACHE", False)
+        self.threshold = env_float("SEMANTIC_CACHE_THRESHOLD", 0.9)
+        self.ttl = env_float("SEMANTIC_CACHE_TTL", 24 * 3600.0)
+        self.max_entries = env_int("SEMANTIC_CACHE_MAX_ENTRIES", 100_000)
+        self.path = env_str("SEMANTIC_CACHE_PATH", "semantic_cache.npz")
+        self.embedder = HashingEmbedder(env_int("SEMANTIC_CACHE_DIM", 256))
+        self.nprobe = env_int("SEMANTIC_CACHE_NPROBE", 16)
+        self._reset()
+        self._train_task: Optional[asyncio.Future] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.puts = 0
+        self.compactions = 0
+
+    def _reset(self):
+        self._replace(np.zeros((0, self.embedder.dim), dtype=np.float32), np.zeros(0, dtype=np.uint64), [], [])
+
+    def lookup(self, scope: str, text: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        entry, score = self.index.search(self.embedder.embed(text), _scope_id(scope))
+        if entry < 0 or score < self.threshold:
+            self.misses += 1
+            return None
+        if self.created[entry] + self.ttl < time.time():
+            self.expired += 1
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.debug("Semantic cache hit (similarity %.3f)", score)
+        return self.values[entry]
+
+    def put(self, scope: str, text: str, value: str):
+        if not self.enabled:
+            return
+        self._put(self.embedder.embed(text), _scope_id(scope), value, time.time())
+        self.puts += 1
+        if self.index.size > self.max_entries:
+            self._compact()
+        if self.index.needs_training and (self._train_task is None or self._train_task.done()):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:  # no event loop (scripts): train inline
+                self.index.train()
+            else:
+                self._train_task = loop.create_task(asyncio.to_thread(self.index.train))
+
+    def _put(self, vector: np.ndarray, scope: int, value: str, created: float):
+        self.index.add(vector, scope)
+        self.values.append(value)
+        self.created.append(created)
+
+    def _compact(self):
+        """Drops expired entries and the oldest tenth of the rest."""
+        size = self.index.size
+        cutoff = time.time() - self.ttl
+        keep = np.array([i for i in range(size // 10, size) if self.created[i] >= cutoff], dtype=np.int64)
+        self.index.keep(keep)
+        self.values = [self.values[i] for i in keep]
+        self.created = [self.created[i] for i in keep]
+        self.compactions += 1
+
+    def _replace(self, vectors: np.ndarray, scopes: np.ndarray, values: List[str], created: List[float]):
+        self.index = IVFIndex(self.embedder.dim, nprobe=self.nprobe)
+        self.index.reset(vectors, scopes)
+        self.values = values
+        self.created = created
+
+    async def start(self):
+        if self.enabled and os.path.exists(self.path):
+            try:
+                await asyncio.to_thread(self.load)
+            except Exception as e:
+                logger.warning("Semantic cache load failed: %s", e)
+
+    async def close(self):
+        if self._train_task is not None:
+            await asyncio.gather(self._train_task, return_exceptions=True)
+        if self.enabled and self.index.size:
+            try:
+                await asyncio.to_thread(self.save)
+            except Exception as e:
+                logger.warning("Semantic cache save failed: %s", e)
+
+    def save(self):
+        size = self.index.size
+        tmp = self.path + ".tmp.npz"
+        np.savez(
+            tmp,
+            vectors=self.index.vectors[:size],
+            scopes=self.index.scopes[:size],
+            created=np.array(self.created[:size], dtype=np.float64),
+            values=np.frombuffer(dumps(self.values[:size]).encode("utf-8"), dtype=np.uint8),
+        )
+        os.replace(tmp, self.path)
+        logger.info("Semantic cache saved: %d entries", size)
+
+    def load(self):
+        with np.load(self.path) as data:
+            vectors, scopes, created = data["vectors"], data["scopes"], data["created"]
+            values = json.loads(data["values"].tobytes())
+        if vectors.shape[1] != self.embedder.dim:
+            logger.warning("Semantic cache at %s has dimension %d, expected %d; ignoring it", self.path, vectors.shape[1], self.embedder.dim)
+            return
+        keep = np.flatnonzero(created >= time.time() - self.ttl)[-self.max_entries:]
+        self._replace(vectors[keep], scopes[keep], [values[i] for i in keep], created[keep].tolist())
+        if self.index.needs_training:
+            self.index.train()
+        logger.info("Semantic cache loaded: %d entries", self.index.size)
+
+    def clear(self):
+        self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "dim": self.embedder.dim,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "puts": self.puts,
+            "compactions": self.compactions,
+            "index": self.index.stats(),
+            "path": self.path,
+        }
+
+
+semantic_cache = SemanticCache()
@@ -0,0 +1,161 @@
+import time
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from app.utils.config import env_int, env_str
+from app.utils.log import get_logger
+
+logger = get_logger("shared_state")
+
+# serve.py sets both; a plain `uvicorn main:app` run is a single worker with no shared state
+SHARED_STATE_PATH = env_str("MARKETMIND_SHARED_STATE")
+WORKERS = max(1, env_int("MARKETMIND_WORKERS", 1))
+
+
+class SharedState:
+    """
+    State that several worker processes on one host must agree on, kept in a
+    SQLite database in WAL mode (no external service):
+      - token buckets and Retry-After blocks per provider API key
+      - circuit breaker state per provider model
+    The response cache shares the same file through its SQLite tier. Timestamps
+    are wall clock, since monotonic clocks are per process. Every update is a
+    short IMMEDIATE transaction, so read-modify-write is atomic across workers.
+    Calls block on SQLite (up to the 5 s busy timeout), so async callers run them
+    in a thread, or hand writes nobody waits for to write_later().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # One thread, so fire-and-forget writes land in the order they were made
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shared-state")
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets ("
+            "name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL, blocked_until REAL NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS model_breakers ("
+            "model TEXT PRIMARY KEY, open_until REAL NOT NULL, cooldown REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def write_later(self, method: Callable[..., Any], *args: Any):
+        """Runs `method(*args)` in the writer thread without waiting for it (directly outside an event loop)."""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            method(*args)
+            return
+        self._writer.submit(method, *args).add_done_callback(_log_failure)
+
+    def _buckets(self, names: Sequence[str], rate: float, capacity: float, now: float) -> Dict[str, Tuple[float, float]]:
+        """name -> (tokens, blocked_until) for every name, in one query; unknown names are full."""
+        rows = self._conn.execute(
+            f"SELECT name, tokens, updated, blocked_until FROM rate_buckets WHERE name IN ({','.join('?' * len(names))})",
+            list(names),
+        ).fetchall()
+        buckets = {name: (capacity, 0.0) for name in names}
+        for name, tokens, updated, blocked_until in rows:
+            buckets[name] = (min(capacity, tokens + max(0.0, now - updated) * rate), blocked_until)
+        return buckets
+
+    def take_first(self, names: Sequence[str], rate: float, capacity: float) -> Tuple[Optional[str], float]:
+        """
+        Takes one token from the first of `names` that has one and is not blocked, in one
+        transaction. Returns (that name, 0), or (None, seconds until the soonest one can take).
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                buckets = self._buckets(names, rate, capacity, now)
+                taken, wait = None, float("inf")
+                for name in names:
+                    tokens, blocked_until = buckets[name]
+                    if blocked_until > now:
+                        wait = min(wait, blocked_until - now)
+                    elif tokens >= 1 or rate <= 0:
+                        taken, wait = name, 0.0
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO rate_buckets (name, tokens, updated, blocked_until) VALUES (?, ?, ?, ?)",
+                            (name, tokens - 1, now, blocked_until),
+                        )
+                        break
+                    else:
+                        wait = min(wait, (1 - tokens) / rate)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return taken, wait
+
+    def take_token(self, name: str, rate: float, capacity: float) -> float:
+        """Takes one token if one is available and the key is not blocked; returns 0, else seconds to wait."""
+        return self.take_first([name], rate, capacity)[1]
+
+    def peek_buckets(self, names: Sequence[str], rate: float, capacity: float) -> Dict[str, Tuple[float, float]]:
+        """name -> (tokens available now, seconds the key is still blocked), in one query."""
+        now = time.time()
+        with self._lock:
+            buckets = self._buckets(names, rate, capacity, now)
+        return {name: (tokens, max(0.0, blocked_until - now)) for name, (tokens, blocked_until) in buckets.items()}
+
+    def peek_bucket(self, name: str, rate: float, capacity: float) -> Tuple[float, float]:
+        """(tokens available now, seconds the key is still blocked)."""
+        return self.peek_buckets([name], rate, capacity)[name]
+
+    def block(self, name: str, seconds: float, capacity: float):
+        until = time.time() + seconds
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO rate_buckets (name, tokens, updated, blocked_until) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)",
+                (name, capacity, time.time(), until),
+            )
+
+    def set_breaker(self, model: str, open_until: float, cooldown: float):
+        """open_until is wall-clock time; 0 marks the breaker closed."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO model_breakers (model, open_until, cooldown, updated) VALUES (?, ?, ?, ?)",
+                (model, open_until, cooldown, time.time()),
+            )
+
+    def breakers(self) -> Dict[str, Tuple[float, float, float]]:
+        """model -> (open_until, cooldown, updated)."""
+        with self._lock:
+            rows = self._conn.execute("SELECT model, open_until, cooldown, updated FROM model_breakers").fetchall()
+        return {model: (open_until, cooldown, updated) for model, open_until, cooldown, updated in rows}
+
+    def clear_breakers(self, model: Optional[str] = None):
+        with self._lock:
+            if model is None:
+                self._conn.execute("DELETE FROM model_breakers")
+            else:
+                self._conn.execute("DELETE FROM model_breakers WHERE model = ?", (model,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "workers": WORKERS}
+
+
+def _log_failure(future):
+    if future.exception() is not None:
+        logger.warning("Shared state write failed: %s", future.exception())
+
+
+def _open() -> Optional[SharedState]:
+    if not SHARED_STATE_PATH:
+        return None
+    try:
+        return SharedState(SHARED_STATE_PATH)
+    except Exception as e:
+        logger.warning("Shared worker state disabled: %s", e)
+        return None
+
+
+shared_state = _open()
@@ -0,0 +1,16 @@
+from typing import Any
+from pydantic import BaseModel
+from app.utils.llm_output import dumps
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Formats one server-sent event frame."""
+    payload = data.model_dump_json() if isinstance(data, BaseModel) else dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stop reverse proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+}
@@ -0,0 +1,16 @@
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for endpoints whose body iterator is still reading the
+    request body (upload in, results out). Starlette's default disconnect
+    listener calls receive() concurrently on ASGI < 2.4 servers and would steal
+    the body chunks, so here the request stream itself detects the disconnect.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
@@ -0,0 +1,64 @@
+import math
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+# Rough average for English prose with the providers' BPE tokenizers; only used when a
+# provider does not report usage, and for sizing prompts before they are sent
+CHARS_PER_TOKEN = 4.0
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    # A few tokens of chat framing per message
+    return sum(estimate_tokens(m.get("content", "")) + 4 for m in messages)
+
+
+class TokenUsage:
+    """
+    Tokens spent by one generate() call, summed over every provider attempt that
+    produced output (a hedge loser that answered was billed too). `estimated` is set
+    when a provider did not report usage and the counts were estimated from text length.
+    """
+
+    __slots__ = ("prompt", "completion", "provider", "estimated")
+
+    def __init__(self):
+        self.prompt = 0
+        self.completion = 0
+        self.provider = "none"
+        self.estimated = False
+
+    def add(self, provider: str, prompt: Optional[int], completion: Optional[int],
+            messages: List[Dict[str, str]], text: Optional[str]):
+        if prompt is None or completion is None:
+            self.estimated = True
+            prompt = estimate_prompt_tokens(messages) if prompt is None else prompt
+            completion = estimate_tokens(text) if completion is None else completion
+        self.prompt += int(prompt)
+        self.completion += int(completion)
+        self.provider = provider
+
+
+_current: ContextVar[Optional[TokenUsage]] = ContextVar("marketmind_token_usage", default=None)
+
+
+@contextmanager
+def collect_usage(usage: TokenUsage) -> Iterator[TokenUsage]:
+    """Provider calls made inside (including tasks started inside) add their usage to `usage`."""
+    token = _current.set(usage)
+    try:
+        yield usage
+    finally:
+        _current.reset(token)
+
+
+def add_usage(provider: str, prompt: Optional[int], completion: Optional[int],
+              messages: List[Dict[str, str]], text: Optional[str]):
+    """Called by providers after a successful call; counts missing from the response are estimated."""
+    usage = _current.get()
+    if usage is not None:
+        usage.add(provider, prompt, completion, messages, text)
@@ -0,0 +1,208 @@
+"""
+Local stand-in for an OpenAI-style chat completions API (what Groq serves), so the
+backend can be load-tested without spending provider quota.
+
+    python -m bench.fake_provider --port 9100 --latency-ms 300 --latency-dist lognormal
+    python -m bench.fake_provider --error-rate 0.02 --rate-429 0.05 --retry-after 1
+
+Point the backend at it with
+    GROQ_BASE_URL=http://127.0.0.1:9100/v1/chat/completions GROQ_API_KEY=bench
+
+Responses are canned JSON in the shape each MarketMind prompt asks for (campaign,
+pitch, single lead or packed lead batch), picked from the system prompt. With
+"stream": true the JSON is sent as server-sent-event deltas.
+"""
+import re
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+from typing import Any, Dict, List
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class FakeConfig:
+    latency_ms: float = 300.0
+    latency_dist: str = "lognormal"
+    latency_sigma: float = 0.5
+    error_rate: float = 0.0
+    rate_429: float = 0.0
+    retry_after: float = 1.0
+    chunk_chars: int = 24
+    chunk_ms: float = 10.0
+    ms_per_token: float = 0.0
+    seed: int = 0
+
+
+def sample_latency(config: FakeConfig, rng: random.Random) -> float:
+    """Seconds to wait before answering, from the configured distribution around latency_ms."""
+    mean = config.latency_ms / 1000.0
+    if mean <= 0:
+        return 0.0
+    if config.latency_dist == "fixed":
+        return mean
+    if config.latency_dist == "uniform":
+        return rng.uniform(0, 2 * mean)
+    if config.latency_dist == "exponential":
+        return rng.expovariate(1.0 / mean)
+    # lognormal with the requested mean: mu = ln(mean) - sigma^2 / 2
+    sigma = config.latency_sigma
+    return rng.lognormvariate(math.log(mean) - sigma * sigma / 2, sigma)
+
+
+def _campaign(user: str) -> Dict[str, Any]:
+    platforms = re.search(r"Platforms:\s*(.+)", user)
+    names = [p.strip() for p in platforms.group(1).split(",")] if platforms else ["LinkedIn"]
+    return {
+        "strategy_explanation": "Benchmark strategy: lead with the core benefit, adapt tone per platform.",
+        "generated_content": [
+            {
+                "platform": name,
+                "content": f"Benchmark post for {name}. " * 8,
+                "hashtags": ["#bench", "#marketmind"],
+                "visual_prompt": f"Studio photo of the product styled for {name}",
+                "xai_explanation": "Copy length and call to action chosen for the platform audience.",
+            }
+            for name in names
+        ],
+    }
+
+
+_PITCH_LENGTHS = {"Cold Email": 24, "LinkedIn Message": 8, "Elevator Pitch": 6}
+
+
+def _pitch_variant(kind: str) -> Dict[str, Any]:
+    return {"variant_type": kind, "subject_line": "Quick idea" if kind == "Cold Email" else None,
+            "content": f"Benchmark {kind} content. " * _PITCH_LENGTHS.get(kind, 10), "xai_explanation": "Matches the persona's priorities."}
+
+
+def _pitch() -> Dict[str, Any]:
+    return {
+        "strategy_explanation": "Benchmark pitch strategy focused on measurable outcomes.",
+        "variants": [_pitch_variant(kind) for kind in _PITCH_LENGTHS],
+    }
+
+
+def _lead(index: int = None) -> Dict[str, Any]:
+    result = {
+        "score": 72,
+        "priority": "High",
+        "conversion_probability": "70%",
+        "qualification_summary": "Budget and timing are confirmed.",
+        "recommended_actions": ["Schedule Discovery Call", "Send Proposal"],
+        "xai_explanation": "Strong budget and urgency signals.",
+    }
+    if index is not None:
+        result = {"index": index, **result}
+    return result
+
+
+def canned_response(messages: List[Dict[str, str]]) -> str:
+    system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content", "") for m in messages if m.get("role") == "user"), "")
+    if "Marketing Strategist" in system:
+        return json.dumps(_campaign(user))
+    if "Sales Copywriter" in system:
+        if "persuasion strategy" in system:
+            return json.dumps({"strategy_explanation": _pitch()["strategy_explanation"]})
+        variant = re.search(r"Write one '([^']+)' pitch", system)
+        return json.dumps(_pitch_variant(variant.group(1)) if variant else _pitch())
+    if "EACH numbered lead" in system:
+        indexes = [int(i) for i in re.findall(r"^\s*\[(\d+)\] Lead:", user, re.MULTILINE)]
+        return json.dumps({"results": [_lead(i) for i in indexes]})
+    return json.dumps(_lead())
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake LLM provider")
+    rng = random.Random(config.seed or None)
+    counters = {"requests": 0, "errors": 0, "throttled": 0, "streams": 0}
+
+    async def completions(request: Request):
+        body = await request.json()
+        counters["requests"] += 1
+        roll = rng.random()
+        if roll < config.rate_429:
+            counters["throttled"] += 1
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={"retry-after": str(config.retry_after), "x-ratelimit-remaining-requests": "0"},
+            )
+        await asyncio.sleep(sample_latency(config, rng))
+        if roll < config.rate_429 + config.error_rate:
+            counters["errors"] += 1
+            return JSONResponse({"error": {"message": "Internal error", "type": "server_error"}}, status_code=500)
+
+        content = canned_response(body.get("messages", []))
+        if config.ms_per_token > 0:
+            # Generation time grows with the output (~4 characters per token)
+            await asyncio.sleep(len(content) // 4 * config.ms_per_token / 1000.0)
+        model = body.get("model", "fake-model")
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+        headers = {"x-ratelimit-remaining-requests": "1000", "x-ratelimit-limit-requests": "1000"}
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": f"chatcmpl-{counters['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                          "total_tokens": prompt_tokens + len(content) // 4},
+            }, headers=headers)
+
+        counters["streams"] += 1
+
+        async def events():
+            for start in range(0, len(content), config.chunk_chars):
+                delta = {"choices": [{"index": 0, "delta": {"content": content[start:start + config.chunk_chars]}}]}
+                yield f"data: {json.dumps(delta)}\n\n"
+                if config.chunk_ms > 0:
+                    await asyncio.sleep(config.chunk_ms / 1000.0)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+    app.add_api_route("/v1/chat/completions", completions, methods=["POST"])
+    app.add_api_route("/openai/v1/chat/completions", completions, methods=["POST"])
+
+    @app.get("/stats")
+    async def stats():
+        return counters
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="mean response latency")
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "exponential", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="lognormal shape (larger = longer tail)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 500")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of requests answered with HTTP 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--chunk-chars", type=int, default=24, help="characters per streamed delta")
+    parser.add_argument("--chunk-ms", type=float, default=10.0, help="delay between streamed deltas")
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="extra latency per output token (~4 chars)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = FakeConfig(
+        latency_ms=args.latency_ms, latency_dist=args.latency_dist, latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate, rate_429=args.rate_429, retry_after=args.retry_after,
+        chunk_chars=args.chunk_chars, chunk_ms=args.chunk_ms, ms_per_token=args.ms_per_token, seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
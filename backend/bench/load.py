@@ -0,0 +1,364 @@
+"""
+Load generator for the MarketMind backend, run against the local fake provider so no
+Groq or Gemini quota is spent.
+
+    cd backend
+    python -m bench.load                                   # campaign, pitch, lead at 1, 8, 32
+    python -m bench.load --concurrency 16,64 --requests 500 --latency-ms 200
+    python -m bench.load --endpoints lead --rate-429 0.05  # exercise the rate limiter
+    python -m bench.load --backend-url http://127.0.0.1:8000   # drive an already running server
+    python -m bench.load --workers 4                       # multi-worker backend via serve.py
+
+By default it starts bench.fake_provider and a uvicorn backend wired to it, then for
+each endpoint and concurrency level sends --requests requests with that many in flight.
+Reports p50/p95/p99 latency, requests per second, errors and backend RSS, writes the
+run to bench/results/<timestamp>_<commit>.json and compares it with the previous run.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import subprocess
+from typing import Any, Callable, Dict, List, Optional
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "bench", "results")
+
+ENDPOINTS: Dict[str, str] = {
+    "campaign": "/api/v1/campaign/generate",
+    "pitch": "/api/v1/pitch/generate",
+    "lead": "/api/v1/lead/score",
+}
+
+# Metrics where a higher value is a regression (everything except throughput)
+HIGHER_IS_WORSE = ("p50_ms", "p95_ms", "p99_ms", "mean_ms", "errors", "rss_peak_mb")
+
+
+def request_body(endpoint: str, i: int, unique: bool) -> Dict[str, Any]:
+    """Sample payloads; `unique` varies them so single-flight and the cache do not collapse the load."""
+    tag = f" {i}" if unique else ""
+    if endpoint == "campaign":
+        return {
+            "product_name": f"Aurora Smartwatch{tag}",
+            "product_description": "A titanium smartwatch with a 14-day battery and on-device health coaching.",
+            "target_audience": "Urban professionals aged 25-40 who train before work",
+            "platforms": ["Instagram", "LinkedIn", "Poster"],
+        }
+    if endpoint == "pitch":
+        return {
+            "product_name": f"LedgerLoop{tag}",
+            "product_description": "Automated month-end close for mid-market finance teams.",
+            "persona": "CFO",
+            "industry": "Manufacturing",
+        }
+    return {
+        "name": f"Dana Reyes{tag}",
+        "company": "Northwind Logistics",
+        "budget": "$20k-$40k",
+        "urgency": "Medium",
+        "needs": "Replace spreadsheets for route planning",
+        "notes": "Asked for pricing",
+    }
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(q / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(c) for c in f.read().split()]
+    except OSError:
+        return []
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident set size of a process and its children (workers) from /proc (Linux); None where unavailable."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next((int(line.split()[1]) / 1024.0 for line in f if line.startswith("VmRSS:")), None)
+    except OSError:
+        return None
+    if rss is None:
+        return None
+    return rss + sum(rss_mb(child) or 0.0 for child in _children(pid))
+
+
+def git_commit() -> Dict[str, Any]:
+    def run(*args):
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip()
+    try:
+        return {"commit": run("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+    except OSError:
+        return {"commit": "unknown", "dirty": False}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class Servers:
+    """Starts the fake provider and a backend pointed at it; stops both on exit."""
+
+    def __init__(self, args):
+        self.args = args
+        self.procs: List[subprocess.Popen] = []
+        self.backend_pid: Optional[int] = None
+        self.backend_url = args.backend_url
+        self.ready_seconds: Optional[float] = None
+
+    def __enter__(self) -> "Servers":
+        if self.backend_url:
+            return self
+        args = self.args
+        provider_port, backend_port = free_port(), free_port()
+        self.procs.append(subprocess.Popen([
+            sys.executable, "-m", "bench.fake_provider", "--port", str(provider_port),
+            "--latency-ms", str(args.latency_ms), "--latency-dist", args.latency_dist,
+            "--error-rate", str(args.error_rate), "--rate-429", str(args.rate_429),
+            "--ms-per-token", str(args.ms_per_token), "--seed", str(args.seed),
+        ], cwd=BACKEND_DIR))
+        wait_until_up(f"http://127.0.0.1:{provider_port}/stats")
+
+        env = dict(os.environ)
+        env.update({
+            "GROQ_BASE_URL": f"http://127.0.0.1:{provider_port}/v1/chat/completions",
+            "GROQ_API_KEY": "bench",
+            "GROQ_API_KEYS": "",
+            # A key makes pitch and lead take the LLM path; no Gemini models keeps every call on the fake
+            "GEMINI_API_KEY": "bench",
+            "GEMINI_MODELS": "",
+            "GROQ_RPM": "1000000",
+            "GROQ_BURST": "100000",
+            "GROQ_CONCURRENCY": "1024",
+            "GROQ_MAX_CONCURRENCY": "1024",
+            "LEAD_CASCADE": "true" if args.lead_cascade else "false",
+            # Stored lead scores would turn every later run into lookups
+            "LEAD_INCREMENTAL": "false",
+            "LLM_CACHE_DB": "",
+            "JOBS_DB": os.path.join(RESULTS_DIR, "bench_jobs.db"),
+            "GENERATIONS_DB": os.path.join(RESULTS_DIR, "bench_generations.db"),
+            "MARKETMIND_LOG_LEVEL": "WARNING",
+        })
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        if args.workers > 1:
+            command = [
+                sys.executable, "serve.py", "--port", str(backend_port), "--workers", str(args.workers),
+                "--shared-state", os.path.join(RESULTS_DIR, "bench_shared.db"), "--log-level", "warning",
+            ]
+        else:
+            command = [
+                sys.executable, "-m", "uvicorn", "main:app", "--port", str(backend_port), "--log-level", "warning", "--no-access-log",
+            ]
+        started = time.perf_counter()
+        backend = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+        self.procs.append(backend)
+        self.backend_pid = backend.pid
+        self.backend_url = f"http://127.0.0.1:{backend_port}"
+        # /health answers 503 until the backend's startup warm-up is done
+        wait_until_up(f"{self.backend_url}/health")
+        self.ready_seconds = time.perf_counter() - started
+        return self
+
+    def __exit__(self, *exc):
+        for proc in reversed(self.procs):
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+async def run_level(client: httpx.AsyncClient, path: str, make_body: Callable[[int], Dict[str, Any]],
+                    concurrency: int, total: int, pid: Optional[int]) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    counter = {"next": 0}
+    rss_samples = [m for m in [rss_mb(pid)] if m is not None]
+
+    async def worker():
+        nonlocal errors
+        while counter["next"] < total:
+            i = counter["next"]
+            counter["next"] += 1
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=make_body(i))
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    async def sample_memory():
+        while True:
+            await asyncio.sleep(0.25)
+            value = rss_mb(pid)
+            if value is not None:
+                rss_samples.append(value)
+
+    sampler = asyncio.create_task(sample_memory())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    sampler.cancel()
+    end_rss = rss_mb(pid)
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "rss_peak_mb": round(max(rss_samples), 1) if rss_samples else None,
+        "rss_end_mb": round(end_rss, 1) if end_rss is not None else None,
+    }
+
+
+async def run_benchmark(args, servers: Servers) -> List[Dict[str, Any]]:
+    runs = []
+    limits = httpx.Limits(max_connections=max(args.concurrency) + 8, max_keepalive_connections=max(args.concurrency) + 8)
+    async with httpx.AsyncClient(base_url=servers.backend_url, limits=limits, timeout=args.timeout) as client:
+        for endpoint in args.endpoints:
+            path = ENDPOINTS[endpoint]
+            seq = {"n": 0}
+
+            def make_body(_: int) -> Dict[str, Any]:
+                seq["n"] += 1
+                return request_body(endpoint, seq["n"], not args.repeat)
+
+            if args.warmup:
+                await run_level(client, path, make_body, min(args.warmup, 8), args.warmup, None)
+            for concurrency in args.concurrency:
+                result = await run_level(client, path, make_body, concurrency, args.requests, servers.backend_pid)
+                result["endpoint"] = endpoint
+                runs.append(result)
+                print(format_row(result), flush=True)
+    return runs
+
+
+def format_row(r: Dict[str, Any]) -> str:
+    rss = f"{r['rss_peak_mb']:.1f}" if r.get("rss_peak_mb") is not None else "-"
+    return (f"{r['endpoint']:<9} c={r['concurrency']:<4} n={r['requests']:<5} err={r['errors']:<4} "
+            f"p50={r['p50_ms']:>8.1f}ms p95={r['p95_ms']:>8.1f}ms p99={r['p99_ms']:>8.1f}ms "
+            f"rps={r['rps']:>8.1f} rss_peak={rss}MB")
+
+
+def previous_result(exclude: str) -> Optional[str]:
+    if not os.path.isdir(RESULTS_DIR):
+        return None
+    files = sorted(f for f in os.listdir(RESULTS_DIR) if f.endswith(".json") and f != os.path.basename(exclude))
+    return os.path.join(RESULTS_DIR, files[-1]) if files else None
+
+
+def compare(current: Dict[str, Any], baseline_path: str, threshold: float) -> bool:
+    """Prints per-metric changes against a baseline run; returns True if any metric regressed past `threshold`."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {os.path.basename(baseline_path)} (commit {baseline.get('commit')}):")
+    before = {(r["endpoint"], r["concurrency"]): r for r in baseline.get("runs", [])}
+    regressed = False
+    for run in current["runs"]:
+        old = before.get((run["endpoint"], run["concurrency"]))
+        if old is None:
+            continue
+        parts = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "rps", "rss_peak_mb"):
+            new_value, old_value = run.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            worse = change > threshold if metric in HIGHER_IS_WORSE else change < -threshold
+            regressed = regressed or worse
+            parts.append(f"{metric} {change:+.1%}{' !' if worse else ''}")
+        print(f"  {run['endpoint']:<9} c={run['concurrency']:<4} " + ", ".join(parts))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default="campaign,pitch,lead", help="comma separated: " + ",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", default="1,8,32", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and level")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per endpoint")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--repeat", action="store_true", help="send identical bodies (measures coalescing/caching)")
+    parser.add_argument("--lead-cascade", action="store_true", help="keep the local lead-model cascade on")
+    parser.add_argument("--backend-url", help="use a running backend instead of starting one")
+    parser.add_argument("--workers", type=int, default=1, help="start the backend with serve.py and this many worker processes")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="fake provider mean latency")
+    parser.add_argument("--latency-dist", default="lognormal", choices=["fixed", "uniform", "exponential", "lognormal"])
+    parser.add_argument("--ms-per-token", type=float, default=0.0, help="fake provider latency per output token")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default="", help="free-form note stored with the results")
+    parser.add_argument("--compare", help="baseline results file (default: the previous run)")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change that counts as a regression")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+    args.endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    args.concurrency = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    unknown = [e for e in args.endpoints if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+
+    with Servers(args) as servers:
+        runs = asyncio.run(run_benchmark(args, servers))
+
+    result = {
+        **git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "label": args.label,
+        "config": {
+            "requests": args.requests, "workers": args.workers, "repeat": args.repeat, "lead_cascade": args.lead_cascade,
+            "latency_ms": args.latency_ms, "latency_dist": args.latency_dist, "ms_per_token": args.ms_per_token,
+            "error_rate": args.error_rate, "rate_429": args.rate_429, "external_backend": bool(args.backend_url),
+        },
+        "runs": runs,
+    }
+
+    path = os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}_{result['commit']}.json")
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved {os.path.relpath(path, BACKEND_DIR)}")
+
+    baseline = args.compare or previous_result(path)
+    if baseline and compare(result, baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Micro-benchmark for turning raw LLM output into response models: the shared
+extraction/validation layer (app.utils.llm_output) against the previous per-service
+path (fence split or brace slice, json.loads, hand-copied fields, model constructors).
+
+    cd backend
+    python -m bench.parse                     # 20000 iterations per case
+    python -m bench.parse --iterations 50000 --items 12
+
+Inputs are the fake provider's canned campaign, pitch and lead responses wrapped in
+a markdown fence with some chatter, plus malformed variants (trailing commas, a
+response truncated mid-array) that only the new path can recover. Also compares
+serializing the resulting models with json.dumps against Pydantic/orjson.
+"""
+import json
+import time
+import argparse
+from typing import Any, Callable, Dict, List, Optional
+from app.models.campaign import CampaignResponse, ContentItem
+from app.models.pitch import PitchResponse, PitchVariant
+from app.models.lead import LeadScoreResponse
+from app.services.campaign_service import ITEM_DEFAULTS, STRATEGY_DEFAULT as CAMPAIGN_STRATEGY
+from app.services.pitch_service import VARIANT_DEFAULTS, STRATEGY_DEFAULT as PITCH_STRATEGY
+from app.services.lead_service import _score_response
+from app.utils.llm_output import parse_json, validate, with_defaults, items_with_defaults, dumps
+from bench.fake_provider import _campaign, _pitch, _lead
+
+
+# --- previous path, as it was copied into each service ---
+
+def _legacy_clean(response_text: str) -> str:
+    clean_json = response_text
+    if "```json" in response_text:
+        clean_json = response_text.split("```json")[1].split("```")[0].strip()
+    elif "{" in response_text:
+        clean_json = response_text[response_text.find("{"):response_text.rfind("}")+1]
+    return clean_json
+
+
+def legacy_campaign(text: str) -> CampaignResponse:
+    content_dict = json.loads(_legacy_clean(text))
+    items = [i for i in content_dict.get("generated_content", []) if isinstance(i, dict)]
+    return CampaignResponse(
+        campaign_id="bench",
+        generated_content=[
+            ContentItem(
+                platform=i.get("platform", "Unknown"), content=i.get("content", ""),
+                hashtags=i.get("hashtags", []), visual_prompt=i.get("visual_prompt", ""),
+                xai_explanation=i.get("xai_explanation", ""),
+                media_url=i.get("media_url", None), media_status=i.get("media_status", None),
+            )
+            for i in items
+        ],
+        strategy_explanation=content_dict.get("strategy_explanation", CAMPAIGN_STRATEGY),
+    )
+
+
+def legacy_pitch(text: str) -> PitchResponse:
+    data = json.loads(_legacy_clean(text))
+    return PitchResponse(
+        pitch_id="bench",
+        variants=[
+            PitchVariant(
+                variant_type=i.get("variant_type", "Unknown"), subject_line=i.get("subject_line"),
+                content=i.get("content", "No content generated"), xai_explanation=i.get("xai_explanation", ""),
+            )
+            for i in data.get("variants", [])
+        ],
+        strategy_explanation=data.get("strategy_explanation", PITCH_STRATEGY),
+    )
+
+
+def legacy_lead(text: str) -> LeadScoreResponse:
+    data = json.loads(_legacy_clean(text))
+    return LeadScoreResponse(
+        lead_id="bench",
+        score=data.get("score", 50),
+        priority=data.get("priority", "Medium"),
+        conversion_probability=data.get("conversion_probability", "50%"),
+        qualification_summary=data.get("qualification_summary", "Analysis complete."),
+        recommended_actions=data.get("recommended_actions", ["Contact Lead"]),
+        xai_explanation=data.get("xai_explanation", "Score based on available data."),
+    )
+
+
+# --- shared layer, as the services use it now ---
+
+def current_campaign(text: str) -> CampaignResponse:
+    content_dict = with_defaults(parse_json(text), {"strategy_explanation": CAMPAIGN_STRATEGY})
+    return validate(CampaignResponse, {
+        "campaign_id": "bench",
+        "generated_content": items_with_defaults(content_dict.get("generated_content"), ITEM_DEFAULTS),
+        "strategy_explanation": content_dict["strategy_explanation"],
+    })
+
+
+def current_pitch(text: str) -> PitchResponse:
+    data = parse_json(text)
+    return validate(PitchResponse, {
+        "pitch_id": "bench",
+        "variants": items_with_defaults(data.get("variants"), VARIANT_DEFAULTS),
+        "strategy_explanation": data.get("strategy_explanation") or PITCH_STRATEGY,
+    })
+
+
+def current_lead(text: str) -> LeadScoreResponse:
+    return _score_response(parse_json(text), "bench")
+
+
+def _wrap(payload: Dict[str, Any]) -> str:
+    return "Here is the JSON you asked for:\n```json\n" + json.dumps(payload, indent=2) + "\n```\nLet me know if you need changes."
+
+
+def _trailing_commas(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, indent=2).replace("\n  ]", ",\n  ]").replace('"\n    }', '",\n    }')
+
+
+def _truncated(payload: Dict[str, Any]) -> str:
+    text = json.dumps(payload)
+    return text[:int(len(text) * 0.8)]
+
+
+def bench(fn: Callable[[str], Any], text: str, iterations: int) -> Optional[float]:
+    """Mean microseconds per call, or None if the path cannot parse this input."""
+    try:
+        fn(text)
+    except Exception:
+        return None
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(text)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def bench_serialize(model: Any, iterations: int) -> Dict[str, float]:
+    timings = {}
+    for name, fn in (
+        ("json.dumps", lambda: json.dumps(model.model_dump())),
+        ("orjson", lambda: dumps(model.model_dump())),
+        ("model_dump_json", lambda: model.model_dump_json()),
+    ):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        timings[name] = (time.perf_counter() - started) / iterations * 1e6
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--items", type=int, default=3, help="content items in the campaign payload")
+    args = parser.parse_args()
+
+    campaign = _campaign("Platforms: " + ", ".join(f"Platform{i}" for i in range(args.items)))
+    kinds = {
+        "campaign": (campaign, legacy_campaign, current_campaign),
+        "pitch": (_pitch(), legacy_pitch, current_pitch),
+        "lead": (_lead(), legacy_lead, current_lead),
+    }
+    rows: List[List[str]] = []
+    for kind, (payload, legacy, current) in kinds.items():
+        for variant, text in (
+            ("fenced", _wrap(payload)),
+            ("trailing-commas", _trailing_commas(payload)),
+            ("truncated", _truncated(payload)),
+        ):
+            old = bench(legacy, text, args.iterations)
+            new = bench(current, text, args.iterations)
+            speedup = f"{old / new:.2f}x" if old and new else "-"
+            rows.append([kind, variant, f"{old:.1f}" if old else "fails", f"{new:.1f}" if new else "fails", speedup])
+
+    print(f"{'kind':<10}{'input':<18}{'legacy us':>12}{'shared us':>12}{'speedup':>10}")
+    for row in rows:
+        print(f"{row[0]:<10}{row[1]:<18}{row[2]:>12}{row[3]:>12}{row[4]:>10}")
+
+    print()
+    print(f"{'serialize':<28}{'us/op':>10}")
+    for kind, (payload, _, current) in kinds.items():
+        for name, us in bench_serialize(current(_wrap(payload)), args.iterations).items():
+            print(f"{kind + ' ' + name:<28}{us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
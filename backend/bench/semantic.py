@@ -0,0 +1,85 @@
+"""
+Micro-benchmark for the semantic cache (app.utils.semantic_cache): lookup latency at a
+given number of stored entries, and how often a lightly reworded request finds the
+entry it was derived from.
+
+    cd backend
+    python -m bench.semantic                        # 100000 entries
+    python -m bench.semantic --entries 20000 --edits 3 --budget-ms 0.5
+
+Entries are synthetic product descriptions drawn from a fixed vocabulary, spread over
+--scopes scopes (requests that differ in their exact-match fields). Queries are stored
+descriptions with --edits words replaced. Exits with status 1 when the p99 lookup time
+is over --budget-ms.
+"""
+import sys
+import time
+import random
+import argparse
+from typing import List
+import numpy as np
+from app.utils.semantic_cache import SemanticCache
+
+_VOCAB = (
+    "smart lightweight titanium battery platform analytics cloud secure automated workflow "
+    "teams finance marketing sales outdoor fitness coaching wireless premium affordable fast "
+    "reliable modular scalable enterprise startup retail logistics health privacy realtime "
+    "dashboard mobile offline sync integration api planning forecasting inventory routes "
+    "design durable waterproof compact portable ergonomic sustainable organic local global"
+).split()
+
+
+def description(rng: random.Random, words: int) -> List[str]:
+    return [rng.choice(_VOCAB) for _ in range(words)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--scopes", type=int, default=20)
+    parser.add_argument("--words", type=int, default=40, help="words per description")
+    parser.add_argument("--edits", type=int, default=2, help="words replaced in each query")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--budget-ms", type=float, default=1.0, help="max p99 lookup time")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    cache = SemanticCache()
+    cache.enabled = True
+    cache.max_entries = args.entries
+
+    started = time.perf_counter()
+    texts = []
+    for i in range(args.entries):
+        words = description(rng, args.words)
+        scope = f"scope{i % args.scopes}"
+        texts.append((scope, words))
+        cache.put(scope, " ".join(words), str(i))
+    built = time.perf_counter() - started
+
+    timings = []
+    found = 0
+    for _ in range(args.queries):
+        target = rng.randrange(args.entries)
+        scope, words = texts[target]
+        words = list(words)
+        for _ in range(args.edits):
+            words[rng.randrange(len(words))] = rng.choice(_VOCAB)
+        text = " ".join(words)
+        t = time.perf_counter()
+        value = cache.lookup(scope, text)
+        timings.append((time.perf_counter() - t) * 1000.0)
+        found += value == str(target)
+
+    timings.sort()
+    p50, p99 = timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
+    print(f"entries {args.entries}  dim {cache.embedder.dim}  index {cache.index.stats()}")
+    print(f"build {built:.1f}s (including {cache.index.trainings} trainings)  threshold {cache.threshold}")
+    print(f"lookup p50 {p50:.3f}ms  p99 {p99:.3f}ms  mean {float(np.mean(timings)):.3f}ms  (budget {args.budget_ms}ms)")
+    print(f"reworded queries served their source entry: {found / args.queries:.1%}")
+    sys.exit(1 if p99 > args.budget_ms else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Startup check for the MarketMind backend: how long `import main` takes, how long a
+fresh backend takes until /health reports ready, and how long the first request after
+that takes. Exits with status 1 when a measurement is over its budget, so it can gate CI.
+
+    cd backend
+    python -m bench.startup
+    python -m bench.startup --import-budget 1.5 --ready-budget 5 --first-request-budget 2
+
+Import time is the median of --runs fresh interpreters. The backend runs against the
+local fake provider, as in bench.load, so no provider quota is spent.
+"""
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from typing import List
+import httpx
+from bench.load import BACKEND_DIR, ENDPOINTS, Servers, request_body
+
+_IMPORT_PROBE = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+
+
+def import_seconds(runs: int) -> List[float]:
+    timings = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _IMPORT_PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        timings.append(float(out.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time `import main` in")
+    parser.add_argument("--endpoint", default="lead", choices=list(ENDPOINTS), help="endpoint for the first request")
+    parser.add_argument("--import-budget", type=float, default=2.0, help="max seconds for `import main`")
+    parser.add_argument("--ready-budget", type=float, default=8.0, help="max seconds from launch until /health is ready")
+    parser.add_argument("--first-request-budget", type=float, default=2.0, help="max seconds for the first request")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="fake provider latency")
+    args = parser.parse_args()
+
+    imports = import_seconds(args.runs)
+    server_args = argparse.Namespace(
+        backend_url=None, workers=1, lead_cascade=False, latency_ms=args.latency_ms,
+        latency_dist="fixed", error_rate=0.0, rate_429=0.0, seed=1,
+    )
+    with Servers(server_args) as servers:
+        health = httpx.get(f"{servers.backend_url}/health", timeout=5.0).json()
+        started = time.perf_counter()
+        response = httpx.post(f"{servers.backend_url}{ENDPOINTS[args.endpoint]}", json=request_body(args.endpoint, 0, False), timeout=30.0)
+        first_request = time.perf_counter() - started
+        response.raise_for_status()
+
+    checks = [
+        ("import main (median)", statistics.median(imports), args.import_budget),
+        ("launch to ready", servers.ready_seconds, args.ready_budget),
+        (f"first {args.endpoint} request", first_request, args.first_request_budget),
+    ]
+    print(f"{'check':<28}{'seconds':>10}{'budget':>10}")
+    failed = False
+    for name, seconds, budget in checks:
+        over = seconds > budget
+        failed = failed or over
+        print(f"{name:<28}{seconds:>10.3f}{budget:>10.1f}{'  OVER' if over else ''}")
+    print(f"server startup: {health.get('startup')}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import os
 import google.generativeai as genai
-from dotenv import load_dotenv
+from app.utils.model_catalog import model_catalog
 
-load_dotenv()
+# Importing app.utils loads .env
 api_key = os.getenv("GEMINI_API_KEY")
 
 with open("model_list.txt", "w") as f:
@@ -11,8 +11,10 @@ with open("model_list.txt", "w") as f:
     else:
         genai.configure(api_key=api_key)
         try:
+            # Also refreshes the catalog the server reads at startup (MODEL_CATALOG_PATH)
+            model_catalog.fetch(genai)
             f.write("Available models:\n")
-            for m in genai.list_models():
-                f.write(f"- {m.name} (Methods: {m.supported_generation_methods})\n")
+            for name, methods in model_catalog.models.items():
+                f.write(f"- models/{name} (Methods: {methods})\n")
         except Exception as e:
             f.write(f"Error listing models: {e}\n")
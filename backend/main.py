@@ -1,15 +1,75 @@
-from fastapi import FastAPI
+import time
+STARTED = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-import os
+from app.utils.http_pool import http_pool
+from app.utils.llm_client import llm_client
+from app.services.campaign_service import campaign_jobs
+from app.services.media_service import media_resolver
+from app.utils.metrics import MetricsMiddleware, registry
+from app.utils.deadline import DeadlineMiddleware
+from app.utils.model_catalog import model_catalog
+from app.utils.model_health import model_health
+from app.utils.semantic_cache import semantic_cache
+from app.utils.config import env_float
+from app.utils.log import get_logger
+
+logger = get_logger("main")
+
+# /health reports ready once warm-up finishes or this many seconds pass, whichever is first
+STARTUP_WARMUP_TIMEOUT = env_float("STARTUP_WARMUP_TIMEOUT", 10.0)
+
+# Seconds from process start (main.py import) to each startup milestone
+startup: dict = {"ready": False}
+
 
-# Load environment variables from .env file
-load_dotenv()
+async def _warm_up():
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(llm_client.warm_up(), STARTUP_WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("Provider warm-up did not finish within %.0fs; serving anyway", STARTUP_WARMUP_TIMEOUT)
+    except Exception as e:
+        logger.warning("Provider warm-up failed: %s", e)
+    startup["warm_up"] = round(time.perf_counter() - started, 3)
+    startup["ready_at"] = round(time.perf_counter() - STARTED, 3)
+    startup["ready"] = True
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup["imported_at"] = round(IMPORTED - STARTED, 3)
+    # One pooled HTTP client for the whole app lifetime
+    await http_pool.start()
+    # Provider SDK import, model catalog and connection warm-up run in the background;
+    # /health answers 503 until they finish so load balancers hold traffic until then
+    warm_up = asyncio.create_task(_warm_up())
+    # Background workers for campaign job mode
+    await campaign_jobs.start()
+    # Picks up breakers opened or closed by other workers (under serve.py)
+    await model_health.start()
+    # Index of locally cached media (when MEDIA_PREFETCH is on)
+    await media_resolver.start()
+    # Near-duplicate generations saved by the previous run (when SEMANTIC_CACHE is on)
+    await semantic_cache.start()
+    yield
+    await semantic_cache.close()
+    warm_up.cancel()
+    await asyncio.gather(warm_up, return_exceptions=True)
+    await model_catalog.close()
+    await model_health.close()
+    await campaign_jobs.stop()
+    await media_resolver.close()
+    await http_pool.close()
 
 app = FastAPI(
     title="MarketMind API",
     description="Generative AI-Powered Sales & Marketing Intelligence Platform with Explainable AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS Middleware to allow requests from Frontend
@@ -21,6 +81,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stage timings and request latency for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Request deadline from the X-Request-Timeout header
+app.add_middleware(DeadlineMiddleware)
+
 @app.get("/")
 async def root():
     return {
@@ -31,9 +97,23 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    if not startup["ready"]:
+        return JSONResponse({"status": "starting"}, status_code=503)
+    return {"status": "healthy", "startup": startup}
 
-from app.routers import campaign, pitch, lead
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus scrape endpoint: stage and provider latency histograms, request latency,
+    and generation counts by provider, cache outcome and mock fallback.
+    """
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+from app.routers import campaign, pitch, lead, admin, media
 app.include_router(campaign.router)
 app.include_router(pitch.router)
 app.include_router(lead.router)
+app.include_router(admin.router)
+app.include_router(media.router)
+
+IMPORTED = time.perf_counter()
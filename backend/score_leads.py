@@ -0,0 +1,87 @@
+"""
+Stream a CRM export (CSV or JSONL) through lead scoring from the command line.
+
+    python score_leads.py leads.csv -o scores.ndjson
+    python score_leads.py leads.jsonl -o scores.csv --output-format csv --concurrency 16
+    python score_leads.py leads.csv -o scores.ndjson --resume   # continue after a crash
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+# Importing app.utils.config loads .env, once, before the services read their settings
+import app.utils.config
+from app.services.lead_import_service import import_and_score, LEAD_IMPORT_CONCURRENCY
+from app.utils.http_pool import http_pool
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def read_chunks(path):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def last_written_row(path, output_format):
+    """Finds the last row index in an existing output file (reads only its tail)."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, "rb") as f:
+        f.seek(max(0, os.path.getsize(path) - CHUNK_SIZE))
+        lines = [l for l in f.read().decode("utf-8", errors="replace").splitlines() if l.strip()]
+    for line in reversed(lines):
+        try:
+            if output_format == "csv":
+                return int(line.split(",", 1)[0])
+            return int(json.loads(line)["row"])
+        except (ValueError, KeyError):
+            continue
+    return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Score leads from a CSV/JSONL file as a stream")
+    parser.add_argument("input", help="CSV or JSONL file")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from extension)")
+    parser.add_argument("--output-format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--concurrency", type=int, default=LEAD_IMPORT_CONCURRENCY)
+    parser.add_argument("--start-row", type=int, default=0, help="First data row to score")
+    parser.add_argument("--resume", action="store_true", help="Continue after the last row already in --output")
+    args = parser.parse_args()
+
+    fmt = args.format or ("jsonl" if args.input.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    start_row = args.start_row
+    append = False
+    if args.resume and args.output:
+        last = last_written_row(args.output, args.output_format)
+        if last is not None:
+            start_row = last + 1
+            append = True
+            print(f"Resuming from row {start_row}", file=sys.stderr)
+
+    out = open(args.output, "a" if append else "w", encoding="utf-8") if args.output else sys.stdout
+    scored = 0
+    try:
+        async for line in import_and_score(read_chunks(args.input), fmt, args.output_format,
+                                           start_row, args.concurrency, header=not append):
+            out.write(line)
+            scored += 1
+            # Flush regularly so --resume sees progress after a crash
+            if scored % 100 == 0:
+                out.flush()
+    finally:
+        out.flush()
+        if out is not sys.stdout:
+            out.close()
+        await http_pool.close()
+    print(f"Wrote {scored} lines", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""
+Multi-worker launcher for the MarketMind backend.
+
+    cd backend
+    python serve.py                      # one worker per CPU core on port 8000
+    python serve.py --workers 4 --port 8000
+
+`uvicorn main:app` runs a single process. Each uvicorn worker started here is a
+separate process, so state the workers must agree on lives in a shared SQLite
+database in WAL mode (MARKETMIND_SHARED_STATE, default marketmind_shared.db):
+  - provider API key token buckets and Retry-After blocks
+  - model circuit breakers
+  - the response cache, through its SQLite tier
+Provider concurrency limits (<PROVIDER>_CONCURRENCY, <PROVIDER>_MAX_CONCURRENCY)
+are totals for the service and are split evenly across the workers.
+"""
+import os
+import argparse
+from app.utils.config import env_int, env_str
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=env_str("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=env_int("PORT", 8000))
+    parser.add_argument("--workers", type=int, default=env_int("MARKETMIND_WORKERS", 0) or os.cpu_count() or 1)
+    parser.add_argument("--shared-state", default=env_str("MARKETMIND_SHARED_STATE", "marketmind_shared.db"),
+                        help="SQLite file for state shared by the workers")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    # Read by the workers at import time (they inherit this environment)
+    os.environ["MARKETMIND_WORKERS"] = str(args.workers)
+    os.environ["MARKETMIND_SHARED_STATE"] = os.path.abspath(args.shared_state)
+
+    # Jobs left running by a previous run are requeued once here; a worker cannot tell
+    # them apart from jobs that another live worker is running
+    from app.utils.job_queue import JobStore, JOBS_DB
+    requeued = JobStore(JOBS_DB).requeue_running()
+    if requeued:
+        print(f"Requeued {requeued} interrupted jobs")
+
+    import uvicorn
+    uvicorn.run("main:app", host=args.host, port=args.port, workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
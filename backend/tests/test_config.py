@@ -0,0 +1,45 @@
+"""
+.env is loaded once per process, by app.utils.config; the entry points and modules that
+need configuration import it instead of calling load_dotenv() themselves.
+
+    cd backend
+    python -m pytest -q
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+# Counts load_dotenv() calls while importing the given modules in a fresh interpreter
+_COUNT_PROBE = """
+import sys
+import dotenv
+calls = []
+real = dotenv.load_dotenv
+dotenv.load_dotenv = lambda *args, **kwargs: calls.append(args) or real(*args, **kwargs)
+for name in sys.argv[1:]:
+    __import__(name)
+print(len(calls))
+"""
+
+
+def _load_dotenv_calls(*modules: str) -> int:
+    out = subprocess.run([sys.executable, "-c", _COUNT_PROBE, *modules], cwd=BACKEND_DIR,
+                         capture_output=True, text=True, check=True)
+    return int(out.stdout.strip().splitlines()[-1])
+
+
+def test_env_loaded_once_by_the_app():
+    assert _load_dotenv_calls("main") == 1
+
+
+def test_env_loaded_once_across_entry_points():
+    # The CLI entry points share the app's modules; importing them together still loads .env once
+    assert _load_dotenv_calls("main", "score_leads", "serve") == 1
+
+
+def test_only_config_reads_env_file():
+    sources = [p for p in BACKEND_DIR.rglob("*.py") if "tests" not in p.parts]
+    readers = sorted(str(p.relative_to(BACKEND_DIR)) for p in sources if "dotenv" in p.read_text(encoding="utf-8"))
+    assert readers == [str(Path("app", "utils", "config.py"))]